@@ -4,6 +4,14 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 
+class ScanScopeRequest(BaseModel):
+    """Périmètre d'un scan partiel (critères combinés; absents = pas de restriction)."""
+    media_types: Optional[List[str]] = None  # movie, series
+    tmdb_ids: Optional[List[int]] = None
+    tvdb_ids: Optional[List[int]] = None
+    path_prefix: Optional[str] = None
+
+
 class ScanResponse(BaseModel):
     plan_id: Optional[int] = None
     scan_id: Optional[str] = None
@@ -36,6 +44,16 @@ class PlanResponse(BaseModel):
     items: List[PlanItemResponse]
 
 
+class ScanProfileResponse(BaseModel):
+    id: int
+    plan_id: Optional[int]
+    scan_id: str
+    created_at: datetime
+    status: str
+    duration_ms: int
+    profile: Dict[str, Any]  # {stages, upstream, caches, peak_rss_bytes, ...}
+
+
 class UpdateItemsRequest(BaseModel):
     items: List[Dict[str, Any]]  # [{id, selected}]
     select_all: Optional[bool] = None
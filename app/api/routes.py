@@ -2,21 +2,25 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import logging
 import traceback
-import uuid
 import asyncio
 
 from app.db.database import get_db
-from app.db.models import Plan, PlanItem, Run, RunItem, Protection
+from app.db.models import Plan, PlanItem, Run, RunItem, Protection, ScanProfile
 from app.api.models import (
     ScanResponse, PlanResponse, PlanItemResponse, UpdateItemsRequest,
-    ApplyRequest, ApplyResponse, RunResponse, ProtectRequest, DiagnosticsResponse
+    ApplyRequest, ApplyResponse, RunResponse, ProtectRequest, DiagnosticsResponse, ScanScopeRequest,
+    ScanProfileResponse
 )
-from app.core.planner import Planner
 from app.core.executor import Executor
 from app.core.safety import SafetyChecker
+from app.core.protection_index import invalidate_protection_index
+from app.core.match_explain import match_explanation_store
+from app.core.revalidation import PlanNotRevalidatableError, PlanRevalidator
+from app.core.scan_coordinator import ScanInProgressError, scan_coordinator
+from app.core.scan_scope import ScanScope
 from app.services.radarr import RadarrService
 from app.services.sonarr import SonarrService
 from app.services.overseerr import OverseerrService
@@ -29,49 +33,24 @@ router = APIRouter()
 
 
 @router.post("/api/scan", response_model=ScanResponse)
-async def scan():
-    """Lance un scan et génère un plan."""
-    from app.main import scan_progress_store
-    
-    scan_id = str(uuid.uuid4())
-    logger.info(f"=== Starting scan {scan_id} ===")
-    
-    # Initialiser le store de progression
-    scan_progress_store[scan_id] = {
-        "status": "running",
-        "current_step": "initializing",
-        "progress": 0,
-        "total_steps": 10,
-        "logs": [],
-        "plan_id": None
-    }
-    
-    # Lancer le scan en arrière-plan
-    async def run_scan():
-        try:
-            planner = Planner(scan_id=scan_id)
-            plan_id = await planner.generate_plan()
-            logger.info(f"Scan {scan_id} completed successfully, plan_id: {plan_id}")
-            
-            scan_progress_store[scan_id].update({
-                "status": "completed",
-                "current_step": "completed",
-                "progress": 100,
-                "plan_id": plan_id
-            })
-        except Exception as e:
-            logger.exception(f"Scan {scan_id} failed with exception")
-            scan_progress_store[scan_id].update({
-                "status": "error",
-                "current_step": "error",
-                "error": str(e),
-                "error_type": e.__class__.__name__
-            })
-    
-    # Démarrer le scan en arrière-plan
-    asyncio.create_task(run_scan())
-    
-    return ScanResponse(plan_id=None, scan_id=scan_id, stats={"scan_id": scan_id})
+async def scan(resume: Optional[str] = None, scope: Optional[ScanScopeRequest] = None):
+    """Lance un scan et génère un plan (ou rattache la demande au scan en cours).
+
+    Args:
+        resume: scan_id d'un scan échoué dont les étapes sauvegardées sont réutilisées
+        scope: Périmètre d'un scan partiel (types de médias, IDs TMDb/TVDb, racine de chemin)
+    """
+    try:
+        scan_scope = ScanScope.from_request(**scope.model_dump()) if scope else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Un seul scan à la fois: une demande pendant un scan actif reçoit le scan_id de celui-ci
+    try:
+        scan_id, attached = scan_coordinator.request_scan(source="api", resume_from=resume, scope=scan_scope)
+    except ScanInProgressError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "scan_id": e.scan_id})
+    return ScanResponse(plan_id=None, scan_id=scan_id, stats={"scan_id": scan_id, "attached": attached})
 
 
 @router.websocket("/ws/scan/{scan_id}")
@@ -110,10 +89,30 @@ async def websocket_scan_progress(websocket: WebSocket, scan_id: str):
             pass
 
 
+@router.get("/api/scan/{scan_id}/matches")
+async def get_scan_matches(
+    scan_id: str,
+    title: Optional[str] = None,
+    matched: Optional[bool] = None,
+    limit: int = 100,
+    offset: int = 0,
+):
+    """Explications du matching torrents d'un scan ("latest" = dernier scan)."""
+    explanations = match_explanation_store.get(scan_id)
+    if explanations is None:
+        raise HTTPException(status_code=404, detail=f"No matching explanations for scan {scan_id}")
+
+    return {
+        "summary": explanations.summary(),
+        "items": explanations.query(title=title, matched=matched, limit=min(limit, 1000), offset=offset),
+    }
+
+
 @router.get("/api/plans/latest", response_model=PlanResponse)
 async def get_latest_plan(db: Session = Depends(get_db)):
     """Récupère le dernier plan créé."""
-    plan = db.query(Plan).order_by(Plan.id.desc()).first()
+    # Un plan BUILDING (scan par paquets en cours) n'est pas encore consultable
+    plan = db.query(Plan).filter(Plan.status != "BUILDING").order_by(Plan.id.desc()).first()
     if not plan:
         raise HTTPException(status_code=404, detail="No plan found")
     
@@ -147,7 +146,7 @@ async def get_latest_plan(db: Session = Depends(get_db)):
 @router.get("/api/plan/{plan_id}", response_model=PlanResponse)
 async def get_plan(plan_id: int, db: Session = Depends(get_db)):
     """Récupère un plan avec ses items."""
-    plan = db.query(Plan).filter(Plan.id == plan_id).first()
+    plan = db.query(Plan).filter(Plan.id == plan_id, Plan.status != "BUILDING").first()
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
 
@@ -182,10 +181,41 @@ async def get_plan(plan_id: int, db: Session = Depends(get_db)):
     )
 
 
+def _scan_profile_response(profile: ScanProfile) -> ScanProfileResponse:
+    return ScanProfileResponse(
+        id=profile.id,
+        plan_id=profile.plan_id,
+        scan_id=profile.scan_id,
+        created_at=profile.created_at,
+        status=profile.status,
+        duration_ms=profile.duration_ms,
+        profile=profile.profile_json or {},
+    )
+
+
+@router.get("/api/plan/{plan_id}/profile", response_model=ScanProfileResponse)
+async def get_plan_profile(plan_id: int, db: Session = Depends(get_db)):
+    """Profil de performance du scan qui a produit le plan."""
+    profile = db.query(ScanProfile).filter(ScanProfile.plan_id == plan_id).first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="Scan profile not found")
+    return _scan_profile_response(profile)
+
+
+@router.get("/api/scan-profiles", response_model=List[ScanProfileResponse])
+async def list_scan_profiles(limit: int = 30, status: Optional[str] = None, db: Session = Depends(get_db)):
+    """Profils des derniers scans (plus récent d'abord), pour comparer leur coût dans le temps."""
+    query = db.query(ScanProfile)
+    if status:
+        query = query.filter(ScanProfile.status == status)
+    profiles = query.order_by(ScanProfile.created_at.desc()).limit(max(1, min(limit, 500))).all()
+    return [_scan_profile_response(profile) for profile in profiles]
+
+
 @router.patch("/api/plan/{plan_id}/items")
 async def update_items(plan_id: int, request: UpdateItemsRequest, db: Session = Depends(get_db)):
     """Met à jour la sélection des items."""
-    plan = db.query(Plan).filter(Plan.id == plan_id).first()
+    plan = db.query(Plan).filter(Plan.id == plan_id, Plan.status != "BUILDING").first()
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
 
@@ -231,6 +261,25 @@ async def apply_plan(plan_id: int, request: ApplyRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/api/plan/{plan_id}/revalidate")
+async def revalidate_plan(plan_id: int):
+    """Revalide un plan avant application: désélectionne les items vus depuis sa création."""
+    config = get_config()
+    if not config.tautulli or not config.tautulli.enabled:
+        raise HTTPException(status_code=400, detail="Tautulli is not enabled")
+
+    try:
+        revalidator = PlanRevalidator()
+        return await revalidator.revalidate_plan(plan_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PlanNotRevalidatableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error revalidating plan {plan_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/api/runs/{run_id}", response_model=RunResponse)
 async def get_run(run_id: int, db: Session = Depends(get_db)):
     """Récupère le statut d'une exécution."""
@@ -286,6 +335,7 @@ async def protect_item(request: ProtectRequest, db: Session = Depends(get_db)):
     )
     db.add(protection)
     db.commit()
+    invalidate_protection_index()
     return {"message": "Item protected"}
 
 
@@ -19,12 +19,14 @@ class RadarrConfig(BaseModel):
     api_key: str
     delete_method: str = "api"  # api|filesystem
     protected_tags: List[str] = Field(default_factory=list)
+    db_path: Optional[str] = None  # radarr.db monté en lecture seule (lecture en masse, repli sur l'API)
 
 
 class SonarrConfig(BaseModel):
     url: str
     api_key: str
     protected_tags: List[str] = Field(default_factory=list)
+    db_path: Optional[str] = None  # sonarr.db monté en lecture seule (lecture en masse, repli sur l'API)
 
 
 class OverseerrConfig(BaseModel):
@@ -43,12 +45,30 @@ class QBittorrentConfig(BaseModel):
     remove_torrent_first: bool = True
     delete_data_with_qb: bool = False
     match_mode: str = "path"  # path|files
+    match_cache: bool = True  # Réutilise les matchs média ↔ torrent inchangés entre scans
+    match_trace: bool = False  # Logs détaillés par paire média/torrent (très verbeux, debug uniquement)
 
 
 class TautulliConfig(BaseModel):
     enabled: bool = True  # Activé par défaut, source de vérité pour watch history
     url: str
     api_key: str
+    revalidate_concurrency: int = 8  # Requêtes get_history simultanées lors de la revalidation d'un plan
+    watch_data_source: str = "history"  # history|library|database (repli sur history en cas d'erreur)
+    db_path: Optional[str] = None  # tautulli.db monté en lecture seule (watch_data_source: database)
+
+
+class RuleCondition(BaseModel):
+    field: str  # watch_age_days, added_age_days, size_gb, tags, monitored, request_status, watched_by...
+    op: str = "=="  # ==, !=, >, >=, <, <=, in, not_in, contains, contains_any, contains_all, not_contains, exists, missing
+    value: Any = None
+
+
+class CustomRule(BaseModel):
+    name: str
+    media_types: List[str] = Field(default_factory=lambda: ["movie", "series", "episode"])
+    action: str = "delete"  # delete|keep (la première règle correspondante décide)
+    conditions: List[RuleCondition] = Field(default_factory=list)
 
 
 class RulesConfig(BaseModel):
@@ -62,6 +82,7 @@ class RulesConfig(BaseModel):
         "keep_last_n_episodes": 0,
         "delete_entire_series_if_inactive_days": 120
     })
+    custom: List[CustomRule] = Field(default_factory=list)  # Règles déclaratives (voir app/core/rule_dsl.py)
 
 
 class SchedulerConfig(BaseModel):
@@ -77,6 +98,10 @@ class AppConfig(BaseModel):
     excluded_paths: List[str] = Field(default_factory=list)  # Chemins à exclure
     max_items_per_scan: Optional[int] = None  # Limite le nombre d'items par scan
     data_dir: str = "/data"
+    incremental_scan: bool = False  # Reporte les verdicts des médias inchangés depuis le scan précédent
+    scan_checkpoints: bool = True  # Sauvegarde les étapes du scan pour reprise (POST /api/scan?resume=<scan_id>)
+    evaluation_workers: int = 0  # > 1: règles et garde-fous des gros scans répartis sur N processus
+    scan_chunk_size: int = 0  # > 0: enrichissement/évaluation/écriture du plan par paquets de N items (0 = tout d'un bloc)
     log_level: str = "INFO"
 
 
@@ -131,6 +156,9 @@ class Config(BaseSettings):
 
 # Global config instance (will be initialized in main.py)
 config: Optional[Config] = None
+# Fichier chargé et sa date de modification (rechargement à chaud)
+_config_path: Optional[str] = None
+_config_mtime: Optional[float] = None
 
 
 def get_config() -> Config:
@@ -142,7 +170,49 @@ def get_config() -> Config:
 
 def init_config(config_path: str = "/config/config.yaml") -> Config:
     """Initialize global config from YAML file."""
-    global config
-    config = Config.load_from_yaml(config_path)
+    global config, _config_path, _config_mtime
+    new_config = Config.load_from_yaml(config_path)
+    _validate(new_config)
+    config = new_config
+    _config_path = config_path
+    _config_mtime = Path(config_path).stat().st_mtime
     return config
 
+
+def _validate(new_config: Config) -> None:
+    """Validations qui dépassent le schéma pydantic (compilation des règles personnalisées)."""
+    from app.core.rule_dsl import get_rule_program
+    get_rule_program(new_config.rules.custom)
+
+
+def reload_config_if_changed() -> bool:
+    """Recharge la config si le fichier YAML a été modifié (appelé au début de chaque scan).
+
+    Une config invalide est ignorée (la précédente reste active).
+
+    Returns:
+        True si la config a été rechargée
+    """
+    global config, _config_mtime
+    if not _config_path:
+        return False
+    try:
+        mtime = Path(_config_path).stat().st_mtime
+    except OSError:
+        return False
+    if mtime == _config_mtime:
+        return False
+    import logging
+    logger = logging.getLogger(__name__)
+    try:
+        new_config = Config.load_from_yaml(_config_path)
+        _validate(new_config)
+    except Exception as e:
+        logger.error(f"Config reload failed, keeping previous config: {e}")
+        _config_mtime = mtime  # Ne pas réessayer avant la prochaine modification
+        return False
+    config = new_config
+    _config_mtime = mtime
+    logger.info(f"Configuration reloaded from {_config_path}")
+    return True
+
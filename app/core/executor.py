@@ -1,7 +1,9 @@
 """Exécuteur sécurisé du plan de suppression."""
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set
 from datetime import datetime
 
+import structlog
+
 from app.db.models import Plan, PlanItem, Run, RunItem
 from app.db.database import get_db_sync
 from app.services.radarr import RadarrService
@@ -9,6 +11,8 @@ from app.services.sonarr import SonarrService
 from app.services.qbittorrent import QBittorrentService
 from app.config import get_config
 
+logger = structlog.get_logger(__name__)
+
 
 class Executor:
     """Exécute un plan de suppression de manière sécurisée."""
@@ -27,6 +31,8 @@ class Executor:
         plan = db.query(Plan).filter(Plan.id == plan_id).first()
         if not plan:
             raise ValueError(f"Plan {plan_id} not found")
+        if plan.status == "BUILDING":
+            raise ValueError(f"Plan {plan_id} is still being generated")
 
         # Récupérer les items sélectionnés
         plan_items = db.query(PlanItem).filter(
@@ -50,11 +56,13 @@ class Executor:
         success_count = 0
         failed_count = 0
         errors = []
+        # Médias supprimés par ce run: un torrent partagé n'est retiré que s'ils le couvrent tous
+        deleted_keys = {item.meta_json.get("item_key") for item in plan_items if (item.meta_json or {}).get("item_key")}
 
         # Exécuter chaque item
         for plan_item in plan_items:
             try:
-                await self._execute_item(plan_item, run, db)
+                await self._execute_item(plan_item, run, db, deleted_keys)
                 success_count += 1
             except Exception as e:
                 failed_count += 1
@@ -86,7 +94,25 @@ class Executor:
 
         return run.id
 
-    async def _execute_item(self, plan_item: PlanItem, run: Run, db) -> None:
+    def _removable_hashes(self, plan_item: PlanItem, deleted_keys: Set[str]) -> List[str]:
+        """Torrents de l'item à retirer de qBittorrent.
+
+        Un torrent partagé avec des médias qui ne sont pas supprimés par ce run (autres épisodes
+        d'un season pack, non candidats ou désélectionnés) est conservé: le retirer arrêterait
+        leur seed.
+        """
+        shared_with = (plan_item.meta_json or {}).get("qb_shared_with") or {}
+        removable = []
+        for torrent_hash in plan_item.qb_hashes_json or []:
+            kept_for = [key for key in shared_with.get(torrent_hash, []) if key not in deleted_keys]
+            if kept_for:
+                logger.info("shared_torrent_kept", plan_item_id=plan_item.id, torrent_hash=torrent_hash,
+                            still_used_by=len(kept_for))
+                continue
+            removable.append(torrent_hash)
+        return removable
+
+    async def _execute_item(self, plan_item: PlanItem, run: Run, db, deleted_keys: Set[str]) -> None:
         """Exécute un PlanItem selon l'ordre sécurisé."""
         run_item = RunItem(
             run_id=run.id,
@@ -100,7 +126,7 @@ class Executor:
             # 1. qBittorrent : Supprimer tous les torrents liés (cross-seed)
             # IMPORTANT: Toujours deleteFiles=false pour qBittorrent
             # Les fichiers seront supprimés par Radarr/Sonarr ensuite
-            qb_hashes = plan_item.qb_hashes_json or []
+            qb_hashes = self._removable_hashes(plan_item, deleted_keys)
             if qb_hashes and self.qb_service:
                 try:
                     # Toujours deleteFiles=false pour qBittorrent (sécurité)
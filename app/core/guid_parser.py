@@ -0,0 +1,61 @@
+"""Parser de GUIDs Plex/Tautulli avec cache LRU.
+
+Un GUID ("com.plexapp.agents.thetvdb://121361/6/1?lang=en", "tmdb://603", "imdb://tt0133093",
+"tmdb:603") est analysé en une seule passe regex. Les mêmes GUIDs reviennent des milliers de
+fois dans l'historique (grandparent_guid d'une série), le résultat est donc mémoïsé.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+import re
+
+_GUID_RE = re.compile(
+    r'^(?:com\.plexapp\.agents\.)?(?P<provider>[a-z0-9]+):(?://)?(?P<id>[^/?:]+)'
+    r'(?:/(?P<season>\d+)(?:/(?P<episode>\d+))?)?',
+    re.IGNORECASE,
+)
+
+# Agents legacy et nouveaux agents Plex -> fournisseur
+_PROVIDERS = {
+    "thetvdb": "tvdb",
+    "tvdb": "tvdb",
+    "themoviedb": "tmdb",
+    "tmdb": "tmdb",
+    "imdb": "imdb",
+}
+
+
+@dataclass(frozen=True)
+class ParsedGuid:
+    """IDs extraits d'un GUID (un seul fournisseur renseigné)."""
+    tvdb_id: Optional[int] = None
+    tmdb_id: Optional[int] = None
+    imdb_id: Optional[str] = None
+    season: Optional[int] = None
+    episode: Optional[int] = None
+
+
+_EMPTY_GUID = ParsedGuid()
+
+
+@lru_cache(maxsize=16384)
+def parse_guid(guid: str) -> ParsedGuid:
+    """Analyse un GUID (résultat mémoïsé par GUID)."""
+    if not isinstance(guid, str):
+        return _EMPTY_GUID
+    match = _GUID_RE.match(guid.strip())
+    if not match:
+        return _EMPTY_GUID
+
+    provider = _PROVIDERS.get(match.group("provider").lower())
+    value = match.group("id")
+    season = int(match.group("season")) if match.group("season") else None
+    episode = int(match.group("episode")) if match.group("episode") else None
+
+    if provider == "imdb":
+        return ParsedGuid(imdb_id=value, season=season, episode=episode)
+    if provider in ("tvdb", "tmdb") and value.isascii() and value.isdigit():
+        if provider == "tvdb":
+            return ParsedGuid(tvdb_id=int(value), season=season, episode=episode)
+        return ParsedGuid(tmdb_id=int(value), season=season, episode=episode)
+    return _EMPTY_GUID
@@ -0,0 +1,210 @@
+"""Scans incrémentaux: report des verdicts des médias inchangés.
+
+D'un scan quotidien à l'autre, seuls quelques médias changent (téléchargements, lectures,
+demandes). Pour chaque média on calcule un fingerprint de ses entrées (fiche *arr, stats de
+lecture, état Overseerr, torrents associés). Si le fingerprint, le contexte d'évaluation
+(règles, exclusions, tags/catégories protégés, protections en DB) et l'échéance temporelle du
+verdict sont inchangés, le verdict précédent (candidat/règle/raison de protection) est reporté
+sans réévaluer règles et garde-fous.
+
+Les règles dépendent du temps qui passe (jours depuis l'ajout ou la dernière lecture): chaque
+verdict expire au prochain franchissement d'un seuil en jours, après quoi il est réévalué.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+from sqlalchemy.orm import Session
+
+from app.config import Config
+from app.core.models import MediaItem
+from app.core.protection_index import get_protection_index
+from app.core.rule_dsl import get_rule_program
+from app.db.models import ScanVerdict
+
+logger = structlog.get_logger(__name__)
+
+# (candidat, règle, raison de protection)
+Verdict = Tuple[bool, Optional[str], Optional[str]]
+
+_ADDED_KEYS = ("added_at", "radarr_added", "sonarr_added")
+
+
+def _digest(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def verdict_key(item: MediaItem) -> str:
+    """Identifiant stable d'un média entre scans (ID *arr, sinon IDs externes)."""
+    metadata = item.metadata
+    if item.type == "movie" and metadata.get("radarr_id") is not None:
+        return f"movie:{metadata['radarr_id']}"
+    if item.type == "series" and metadata.get("sonarr_id") is not None:
+        return f"series:{metadata['sonarr_id']}"
+    if item.type == "episode" and metadata.get("sonarr_episode_id") is not None:
+        return f"episode:{metadata['sonarr_episode_id']}"
+    return f"{item.type}:{item.tmdb_id}:{item.tvdb_id}:{item.get_primary_path() or item.title}"
+
+
+def item_fingerprint(item: MediaItem) -> str:
+    """Fingerprint des entrées de l'évaluation d'un média."""
+    metadata = item.metadata
+    return _digest([
+        item.type, item.title, item.year, item.tmdb_id, item.tvdb_id, item.imdb_id,
+        item.get_primary_path(), item.size_bytes, item.monitored, sorted(item.tags),
+        # Stats de lecture
+        item.last_viewed_at, item.view_count, item.never_watched, metadata.get("last_watched_user"),
+        # État Overseerr
+        item.overseerr_request_id, item.overseerr_status, item.overseerr_requested_by,
+        item.overseerr_requested_at, metadata.get("overseerr_requester_names"),
+        # Torrents associés
+        sorted(item.qb_hashes), sorted(item.qb_categories),
+        [metadata.get(key) for key in _ADDED_KEYS],
+    ])
+
+
+# À incrémenter quand la sémantique des règles ou garde-fous change à config égale
+EVALUATION_VERSION = 2
+
+
+def evaluation_context_hash(config: Config, watch_index_available: bool) -> str:
+    """Hash de tout ce qui, hors média, influence un verdict: un changement invalide tous les verdicts."""
+    return _digest([
+        EVALUATION_VERSION,
+        config.rules.movies,
+        config.rules.series,
+        [rule.model_dump() for rule in config.rules.custom],
+        config.app.excluded_paths,
+        config.radarr.protected_tags if config.radarr else None,
+        config.sonarr.protected_tags if config.sonarr else None,
+        config.qbittorrent.protect_categories if config.qbittorrent else None,
+        config.overseerr.model_dump() if config.overseerr else None,
+        watch_index_available,
+        get_protection_index().digest,
+    ])
+
+
+def _to_utc(value: datetime) -> datetime:
+    """Datetime → UTC naïf (une date naïve est en heure locale, comme datetime.now())."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def verdict_expiry(item: MediaItem, thresholds_days: Iterable[float]) -> Optional[datetime]:
+    """Prochain instant (UTC) où un seuil en jours est franchi pour ce média, None si aucun.
+
+    Approximation prudente: tous les seuils configurés sont appliqués à toutes les dates du
+    média (ajout, dernière lecture, demande Overseerr); un verdict peut donc être réévalué
+    plus tôt que nécessaire, jamais plus tard.
+    """
+    dates: List[datetime] = []
+    for key in _ADDED_KEYS:
+        value = item.metadata.get(key)
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                continue
+        if isinstance(value, datetime):
+            dates.append(value)
+    for value in (item.last_viewed_at, item.overseerr_requested_at):
+        if isinstance(value, datetime):
+            dates.append(value)
+
+    now = datetime.utcnow()
+    expiry = None
+    for date in dates:
+        date_utc = _to_utc(date)
+        for days in thresholds_days:
+            crossing = date_utc + timedelta(days=days)
+            if crossing > now and (expiry is None or crossing < expiry):
+                expiry = crossing
+    return expiry
+
+
+def rule_thresholds(config: Config) -> List[float]:
+    """Seuils en jours des règles et de la protection des demandes Overseerr récentes."""
+    thresholds = {
+        value for rules in (config.rules.movies, config.rules.series)
+        for key, value in rules.items()
+        if key.endswith("_days") and isinstance(value, int)
+    }
+    if config.overseerr:
+        thresholds.add(config.overseerr.protect_if_request_younger_than_days)
+    thresholds.update(get_rule_program(config.rules.custom).day_thresholds())
+    return sorted(thresholds)
+
+
+class VerdictCache:
+    """Verdicts du scan précédent, chargés au début de l'évaluation et remplacés à la fin."""
+
+    def __init__(self, entries: List[ScanVerdict], context_hash: str, thresholds_days: List[float]):
+        self.context_hash = context_hash
+        self.thresholds_days = thresholds_days
+        self.now = datetime.utcnow()
+        self._previous: Dict[str, ScanVerdict] = {entry.item_key: entry for entry in entries}
+        self._current: Dict[str, Dict[str, Any]] = {}
+        self.carried = 0
+        self.evaluated = 0
+
+    @classmethod
+    def load(cls, db: Session, context_hash: str, thresholds_days: List[float]) -> "VerdictCache":
+        entries = db.query(ScanVerdict).all()
+        cache = cls(entries, context_hash, thresholds_days)
+        stale = sum(1 for entry in entries if entry.context_hash != context_hash)
+        logger.info("scan_verdicts_loaded", entries=len(entries), stale_context=stale)
+        return cache
+
+    def get(self, item: MediaItem) -> Tuple[str, str, Optional[Verdict]]:
+        """(clé, fingerprint, verdict reporté ou None si le média doit être réévalué)."""
+        key = verdict_key(item)
+        fingerprint = item_fingerprint(item)
+        previous = self._previous.get(key)
+        if previous and previous.fingerprint == fingerprint and previous.context_hash == self.context_hash \
+                and (previous.expires_at is None or previous.expires_at > self.now):
+            verdict = (previous.is_candidate, previous.rule, previous.protected_reason)
+            self._current[key] = {
+                "item_key": key,
+                "fingerprint": fingerprint,
+                "context_hash": self.context_hash,
+                "is_candidate": previous.is_candidate,
+                "rule": previous.rule,
+                "protected_reason": previous.protected_reason,
+                "expires_at": previous.expires_at,
+            }
+            self.carried += 1
+            return key, fingerprint, verdict
+        return key, fingerprint, None
+
+    def record(self, item: MediaItem, key: str, fingerprint: str, verdict: Verdict) -> None:
+        """Mémorise le verdict d'un média réévalué."""
+        is_candidate, rule, protected_reason = verdict
+        self._current[key] = {
+            "item_key": key,
+            "fingerprint": fingerprint,
+            "context_hash": self.context_hash,
+            "is_candidate": is_candidate,
+            "rule": rule,
+            "protected_reason": protected_reason,
+            "expires_at": verdict_expiry(item, self.thresholds_days),
+        }
+        self.evaluated += 1
+
+    def save(self, db: Session, partial: bool = False) -> None:
+        """Remplace les verdicts stockés par ceux du scan courant (les médias disparus sont purgés).
+
+        Args:
+            partial: Scan partiel (périmètre): seuls les verdicts des médias évalués sont remplacés
+        """
+        now = datetime.utcnow()
+        if partial:
+            keys = list(self._current)
+            for start in range(0, len(keys), 500):
+                db.query(ScanVerdict).filter(ScanVerdict.item_key.in_(keys[start:start + 500])).delete(synchronize_session=False)
+        else:
+            db.query(ScanVerdict).delete(synchronize_session=False)
+        db.bulk_insert_mappings(ScanVerdict, [dict(row, updated_at=now) for row in self._current.values()])
+        db.commit()
+        logger.info("scan_verdicts_saved", entries=len(self._current), carried=self.carried, evaluated=self.evaluated)
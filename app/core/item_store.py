@@ -0,0 +1,127 @@
+"""Stockage en colonnes des médias d'un scan (un tableau NumPy par champ scalaire).
+
+Les étapes qui parcourent tout le catalogue (règles, exclusions par chemin, résumé du plan)
+lisent ces colonnes au lieu de refaire une boucle Python sur les MediaItem à chaque fois:
+les dates sont converties une seule fois en microsecondes depuis l'epoch, les tailles et
+compteurs sont des int64. Les MediaItem restent la source de vérité (store.items[i]).
+"""
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.models import MediaItem
+
+# Codes de type (colonne type_code)
+MOVIE, SERIES, EPISODE = 1, 2, 3
+TYPE_CODES = {"movie": MOVIE, "series": SERIES, "episode": EPISODE}
+
+# Clés de date d'ajout consultées, par ordre de priorité
+MOVIE_ADDED_KEYS = ("added_at", "radarr_added", "sonarr_added")
+SERIES_ADDED_KEYS = ("added_at", "sonarr_added")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+@lru_cache(maxsize=65536)
+def parse_added(value: str) -> Optional[datetime]:
+    """Date ISO *arr ("2023-01-02T03:04:05Z"), None si invalide."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (ValueError, AttributeError):
+        return None
+
+
+def added_date(media_item: MediaItem, keys: Sequence[str]) -> Tuple[bool, Optional[datetime]]:
+    """(date d'ajout renseignée, date parsée ou None si invalide)."""
+    value = None
+    for key in keys:
+        value = media_item.metadata.get(key)
+        if value:
+            break
+    if not value:
+        return False, None
+    if isinstance(value, str):
+        return True, parse_added(value)
+    return True, value if isinstance(value, datetime) else None
+
+
+def to_us(date: datetime) -> Tuple[int, bool]:
+    """(microsecondes depuis l'epoch, date naïve).
+
+    Une date naïve est comparée à datetime.now() naïf, en heure murale: on la traite comme UTC
+    des deux côtés pour reproduire exactement la soustraction naïve (changements d'heure inclus).
+    """
+    naive = date.tzinfo is None
+    delta = (date.replace(tzinfo=timezone.utc) if naive else date) - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds, naive
+
+
+class MediaItemStore:
+    """Colonnes des médias d'un scan, dans l'ordre de `items`."""
+
+    def __init__(self, items: Sequence[MediaItem]):
+        self.items = items
+        count = self.count = len(items)
+
+        self.type_code = np.zeros(count, dtype=np.int8)
+        self.tmdb_id = np.zeros(count, dtype=np.int64)  # 0 = inconnu
+        self.tvdb_id = np.zeros(count, dtype=np.int64)
+        self.size_bytes = np.zeros(count, dtype=np.int64)
+        self.view_count = np.zeros(count, dtype=np.int64)
+        self.never_watched = np.zeros(count, dtype=bool)  # never_watched ou view_count == 0
+        self.monitored = np.zeros(count, dtype=bool)
+        self.has_added = np.zeros(count, dtype=bool)  # date d'ajout renseignée
+        self.added_valid = np.zeros(count, dtype=bool)  # ... et parsable
+        self.added_us = np.zeros(count, dtype=np.int64)
+        self.added_naive = np.zeros(count, dtype=bool)
+        self.has_viewed = np.zeros(count, dtype=bool)
+        self.viewed_us = np.zeros(count, dtype=np.int64)
+        self.viewed_naive = np.zeros(count, dtype=bool)
+        self.paths: List[Optional[str]] = [None] * count
+
+        for idx, item in enumerate(items):
+            code = TYPE_CODES.get(item.type, 0)
+            self.type_code[idx] = code
+            self.tmdb_id[idx] = item.tmdb_id or 0
+            self.tvdb_id[idx] = item.tvdb_id or 0
+            self.size_bytes[idx] = item.size_bytes or 0
+            self.view_count[idx] = item.view_count or 0
+            self.never_watched[idx] = item.never_watched or item.view_count == 0
+            self.monitored[idx] = bool(item.monitored)
+            present, added = added_date(item, SERIES_ADDED_KEYS if code == SERIES else MOVIE_ADDED_KEYS)
+            self.has_added[idx] = present
+            if added is not None:
+                self.added_valid[idx] = True
+                self.added_us[idx], self.added_naive[idx] = to_us(added)
+            if item.last_viewed_at:
+                self.has_viewed[idx] = True
+                self.viewed_us[idx], self.viewed_naive[idx] = to_us(item.last_viewed_at)
+            self.paths[idx] = item.get_primary_path()
+
+    @classmethod
+    def from_items(cls, items: Iterable[MediaItem]) -> "MediaItemStore":
+        return cls(items if isinstance(items, (list, tuple)) else list(items))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def ages_days(self, us: np.ndarray, naive: np.ndarray, now: Optional[datetime] = None) -> np.ndarray:
+        """Âge en jours entiers (comme timedelta.days) de chaque date, par rapport à `now`.
+
+        Deux références: l'instant courant (dates aware) et l'heure murale locale (dates naïves).
+        """
+        now = now or datetime.now(timezone.utc)
+        now_us, _ = to_us(now)
+        wall_us, _ = to_us(now.astimezone().replace(tzinfo=None))
+        return (np.where(naive, wall_us, now_us) - us) // (86_400 * 1_000_000)
+
+    def summary(self) -> Dict[str, int]:
+        """Compteurs par type et taille totale (résumé du plan)."""
+        return {
+            "movies_count": int(np.count_nonzero(self.type_code == MOVIE)),
+            "series_count": int(np.count_nonzero(self.type_code == SERIES)),
+            "episodes_count": int(np.count_nonzero(self.type_code == EPISODE)),
+            "total_size_bytes": int(self.size_bytes.sum()),
+        }
@@ -0,0 +1,198 @@
+"""Cache persistant des associations média ↔ torrent entre scans.
+
+Les associations torrents/médias changent très peu d'un scan à l'autre. Le cache mémorise,
+pour chaque média, le fingerprint de ses entrées (chemin + titre) et la date de sa dernière
+évaluation, et pour chaque torrent le fingerprint de ses entrées (save_path, name, nombre de
+fichiers, taille) et la date de son dernier changement. Lors d'un scan, un média inchangé
+réutilise ses associations et n'est re-matché que contre les torrents nouveaux ou modifiés
+depuis sa dernière évaluation.
+
+Les fingerprints incluent la version de l'algorithme de matching (MATCHER_VERSION) et la
+config qui l'influence (match_mode): un changement de l'un ou de l'autre invalide tout le
+cache au scan suivant.
+"""
+import bisect
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy.orm import Session
+
+from app.db.models import TorrentMatchCacheEntry
+
+logger = structlog.get_logger(__name__)
+
+# À incrémenter à chaque changement de TorrentMatcher qui modifie le résultat d'un match
+MATCHER_VERSION = 3
+
+
+def _digest(*parts: Any) -> str:
+    """Hash court et stable d'une liste de valeurs."""
+    raw = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def matcher_context(match_mode: Optional[str] = None) -> str:
+    """Version du matching et config qui l'influence (composante de tous les fingerprints)."""
+    return _digest(MATCHER_VERSION, match_mode or "path")
+
+
+def torrent_fingerprint(torrent: Dict[str, Any], context: str = "") -> str:
+    """Fingerprint des entrées d'un torrent utilisées par le matching."""
+    return _digest(
+        context,
+        torrent.get("save_path") or "",
+        torrent.get("name") or "",
+        len(torrent.get("files") or []),
+        torrent.get("size") or 0,
+    )
+
+
+def media_fingerprint(media_path: str, media_title: Optional[str], context: str = "") -> str:
+    """Fingerprint des entrées d'un média utilisées par le matching."""
+    return _digest(context, media_path, media_title or "")
+
+
+class TorrentMatchCache:
+    """Cache des matchs média ↔ torrent, chargé au début du scan et sauvegardé à la fin."""
+
+    def __init__(self, entries: List[TorrentMatchCacheEntry], torrents: List[Dict[str, Any]], context: str = ""):
+        self.scan_started_at = datetime.utcnow()
+        self.torrents = torrents
+        self.context = context
+        self.hits = 0
+        self.misses = 0
+        # Nombre d'associations réutilisées et de torrents re-matchés lors du dernier appel
+        self.last_reused = 0
+        self.last_candidates = 0
+
+        previous_torrents: Dict[str, Tuple[str, datetime]] = {}
+        previous_media: Dict[str, Tuple[str, datetime]] = {}
+        previous_pairs: Dict[str, Dict[str, str]] = {}
+        for entry in entries:
+            if not entry.media_path:
+                previous_torrents[entry.torrent_hash] = (entry.fingerprint, entry.updated_at)
+            elif not entry.torrent_hash:
+                previous_media[entry.media_path] = (entry.fingerprint, entry.updated_at)
+            else:
+                previous_pairs.setdefault(entry.media_path, {})[entry.torrent_hash] = entry.fingerprint
+
+        # Registre des torrents du scan courant: hash -> (fingerprint, date du dernier changement)
+        self._torrents: Dict[str, Tuple[str, datetime]] = {}
+        self._torrent_index: Dict[str, int] = {}
+        for idx, torrent in enumerate(torrents):
+            torrent_hash = torrent.get("hash")
+            if not torrent_hash:
+                continue
+            fingerprint = torrent_fingerprint(torrent, context)
+            previous = previous_torrents.get(torrent_hash)
+            if previous and previous[0] == fingerprint:
+                self._torrents[torrent_hash] = previous
+            else:
+                self._torrents[torrent_hash] = (fingerprint, self.scan_started_at)
+            self._torrent_index[torrent_hash] = idx
+
+        # Torrents triés par date de changement pour extraire en O(log T) ceux modifiés depuis une date
+        self._by_change = sorted(
+            ((changed_at, self._torrent_index[torrent_hash]) for torrent_hash, (_, changed_at) in self._torrents.items()),
+        )
+        self._change_dates = [changed_at for changed_at, _ in self._by_change]
+
+        self._previous_media = previous_media
+        self._previous_pairs = previous_pairs
+        self._previous_media_by_torrent: Optional[Dict[str, Set[str]]] = None
+        self._media: Dict[str, Tuple[str, datetime]] = {}
+        self._pairs: Dict[str, Dict[str, str]] = {}
+
+    def previous_media_paths(self, torrent_hash: str) -> Set[str]:
+        """Médias associés à ce torrent dans le cache chargé (scans précédents)."""
+        if self._previous_media_by_torrent is None:
+            index: Dict[str, Set[str]] = {}
+            for media_path, pairs in self._previous_pairs.items():
+                for pair_hash in pairs:
+                    index.setdefault(pair_hash, set()).add(media_path)
+            self._previous_media_by_torrent = index
+        return self._previous_media_by_torrent.get(torrent_hash, set())
+
+    @classmethod
+    def load(cls, db: Session, torrents: List[Dict[str, Any]], match_mode: Optional[str] = None) -> "TorrentMatchCache":
+        """Charge le cache depuis la DB pour la liste de torrents du scan courant."""
+        entries = db.query(TorrentMatchCacheEntry).all()
+        cache = cls(entries, torrents, matcher_context(match_mode))
+        logger.info("torrent_match_cache_loaded",
+                   entries=len(entries),
+                   torrents=len(cache._torrents),
+                   changed_torrents=sum(1 for _, changed_at in cache._torrents.values()
+                                        if changed_at == cache.scan_started_at))
+        return cache
+
+    def find_matching_torrents(
+        self,
+        matcher,
+        media_path: str,
+        media_title: Optional[str] = None,
+    ) -> List[str]:
+        """Trouve les torrents d'un média en ne matchant que ce qui a changé.
+
+        Args:
+            matcher: TorrentMatcher utilisé pour les paires à (re)calculer
+            media_path: Chemin du média
+            media_title: Titre du média (fait partie du fingerprint)
+        """
+        fingerprint = media_fingerprint(media_path, media_title, self.context)
+        previous = self._previous_media.get(media_path)
+
+        reused: List[str] = []
+        if previous and previous[0] == fingerprint:
+            evaluated_at = previous[1]
+            for torrent_hash, pair_fingerprint in self._previous_pairs.get(media_path, {}).items():
+                current = self._torrents.get(torrent_hash)
+                if current and current[1] <= evaluated_at and \
+                        pair_fingerprint == _digest(current[0], fingerprint):
+                    reused.append(torrent_hash)
+            start = bisect.bisect_right(self._change_dates, evaluated_at)
+            to_match = [self.torrents[idx] for _, idx in self._by_change[start:]]
+            self.hits += 1
+        else:
+            to_match = self.torrents
+            self.misses += 1
+
+        matched = []
+        matcher.last_match_reasons = {}
+        if to_match:
+            matched = matcher.find_matching_torrents(
+                media_path=media_path,
+                all_torrents=to_match,
+                media_title=media_title,
+            )
+        self.last_reused = len(reused)
+        self.last_candidates = len(to_match)
+
+        hashes = reused + [h for h in matched if h not in reused]
+        hashes.sort(key=lambda h: self._torrent_index.get(h, 0))
+
+        self._media[media_path] = (fingerprint, self.scan_started_at)
+        self._pairs[media_path] = {
+            h: _digest(self._torrents[h][0], fingerprint) for h in hashes if h in self._torrents
+        }
+        return hashes
+
+    def save(self, db: Session) -> None:
+        """Remplace le contenu de la table par l'état du scan courant."""
+        rows = []
+        for torrent_hash, (fingerprint, changed_at) in self._torrents.items():
+            rows.append({"media_path": "", "torrent_hash": torrent_hash,
+                         "fingerprint": fingerprint, "updated_at": changed_at})
+        for media_path, (fingerprint, evaluated_at) in self._media.items():
+            rows.append({"media_path": media_path, "torrent_hash": "",
+                         "fingerprint": fingerprint, "updated_at": evaluated_at})
+            for torrent_hash, pair_fingerprint in self._pairs.get(media_path, {}).items():
+                rows.append({"media_path": media_path, "torrent_hash": torrent_hash,
+                             "fingerprint": pair_fingerprint, "updated_at": evaluated_at})
+
+        db.query(TorrentMatchCacheEntry).delete(synchronize_session=False)
+        if rows:
+            db.bulk_insert_mappings(TorrentMatchCacheEntry, rows)
+        db.commit()
+        logger.info("torrent_match_cache_saved", rows=len(rows), hits=self.hits, misses=self.misses)
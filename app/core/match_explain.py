@@ -0,0 +1,135 @@
+"""Explications de matching média ↔ torrent, stockées par scan.
+
+Remplace les logs par paire du matching: chaque média évalué produit une entrée compacte
+(stratégies touchées, nombre de candidats, matchs, réutilisations du cache, durée) conservée
+en mémoire, bornée en nombre de scans et d'entrées par scan, et consultable via l'API.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+
+
+# Entrée compacte: (media_path, title, mode, candidates, matches, cached, strategies, elapsed_ms)
+ExplanationEntry = Tuple[str, Optional[str], str, int, int, int, Tuple[Tuple[str, int], ...], float]
+
+
+class ScanMatchExplanations:
+    """Explications de matching d'un scan."""
+
+    def __init__(self, scan_id: str, max_entries: int):
+        self.scan_id = scan_id
+        self.plan_id: Optional[int] = None
+        self.max_entries = max_entries
+        self.entries: List[ExplanationEntry] = []
+        self.dropped = 0
+
+    def record(
+        self,
+        media_path: Optional[str],
+        media_title: Optional[str],
+        mode: str,
+        candidates: int,
+        matches: int,
+        strategies: Dict[str, int],
+        elapsed_ms: float,
+        cached: int = 0,
+    ) -> None:
+        """Enregistre l'explication du matching d'un média."""
+        if len(self.entries) >= self.max_entries:
+            self.dropped += 1
+            return
+        self.entries.append((
+            media_path or "",
+            media_title,
+            mode,
+            candidates,
+            matches,
+            cached,
+            tuple(strategies.items()),
+            round(elapsed_ms, 3),
+        ))
+
+    def summary(self) -> Dict[str, Any]:
+        """Agrégats du scan: stratégies touchées, médias matchés, temps total."""
+        strategies: Dict[str, int] = {}
+        matched = 0
+        total_ms = 0.0
+        for entry in self.entries:
+            if entry[4]:
+                matched += 1
+            total_ms += entry[7]
+            for reason, count in entry[6]:
+                strategies[reason] = strategies.get(reason, 0) + count
+        return {
+            "scan_id": self.scan_id,
+            "plan_id": self.plan_id,
+            "items": len(self.entries),
+            "items_matched": matched,
+            "dropped": self.dropped,
+            "total_ms": round(total_ms, 3),
+            "strategies": strategies,
+        }
+
+    def query(
+        self,
+        title: Optional[str] = None,
+        matched: Optional[bool] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Retourne les explications filtrées (titre/chemin contenant `title`, matché ou non)."""
+        needle = title.lower() if title else None
+        results = []
+        skipped = 0
+        for media_path, media_title, mode, candidates, matches, cached, strategies, elapsed_ms in self.entries:
+            if needle and needle not in media_path.lower() and needle not in (media_title or "").lower():
+                continue
+            if matched is not None and bool(matches) != matched:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            results.append({
+                "media_path": media_path,
+                "title": media_title,
+                "mode": mode,
+                "candidates": candidates,
+                "matches": matches,
+                "cached": cached,
+                "strategies": dict(strategies),
+                "elapsed_ms": elapsed_ms,
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+
+class MatchExplanationStore:
+    """Store en mémoire des explications, borné aux `max_scans` derniers scans."""
+
+    def __init__(self, max_scans: int = 5, max_entries_per_scan: int = 100000):
+        self.max_scans = max_scans
+        self.max_entries_per_scan = max_entries_per_scan
+        self._scans: "OrderedDict[str, ScanMatchExplanations]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start_scan(self, scan_id: str) -> ScanMatchExplanations:
+        """Crée (ou remplace) le stockage d'un scan et évince les plus anciens."""
+        with self._lock:
+            explanations = ScanMatchExplanations(scan_id, self.max_entries_per_scan)
+            self._scans.pop(scan_id, None)
+            self._scans[scan_id] = explanations
+            while len(self._scans) > self.max_scans:
+                self._scans.popitem(last=False)
+            return explanations
+
+    def get(self, scan_id: str) -> Optional[ScanMatchExplanations]:
+        """Retourne les explications d'un scan ("latest" = dernier scan)."""
+        with self._lock:
+            if scan_id == "latest":
+                return next(reversed(self._scans.values()), None)
+            return self._scans.get(scan_id)
+
+
+# Instance globale (partagée entre le planner et l'API)
+match_explanation_store = MatchExplanationStore()
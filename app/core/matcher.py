@@ -4,7 +4,7 @@ from pathlib import Path
 import difflib
 import logging
 
-from app.core.models import MediaItem
+from app.core.models import MediaItem, intern_strings
 
 logger = logging.getLogger(__name__)
 
@@ -133,11 +133,11 @@ class MediaMatcher:
             target.never_watched = False
 
         # Merge qBittorrent hashes
-        target.qb_hashes.extend([h for h in source.qb_hashes if h not in target.qb_hashes])
-        target.qb_categories.extend([c for c in source.qb_categories if c not in target.qb_categories])
+        target.qb_hashes += intern_strings([h for h in source.qb_hashes if h not in target.qb_hashes])
+        target.qb_categories += intern_strings([c for c in source.qb_categories if c not in target.qb_categories])
 
         # Merge tags
-        target.tags.extend([t for t in source.tags if t not in target.tags])
+        target.tags += intern_strings([t for t in source.tags if t not in target.tags])
 
         # Merge metadata
         target.metadata.update(source.metadata)
@@ -216,51 +216,6 @@ class MediaMatcher:
             torrent_by_hash = {t["hash"]: t for t in qb_torrents if t.get("hash")}
             logger.info(f"Created torrent_by_hash mapping with {len(torrent_by_hash)} torrents")
             
-            # Log quelques exemples de chemins média et torrents pour debug
-            if len(unified) > 0 and len(qb_torrents) > 0:
-                sample_item = unified[0]
-                sample_torrent = qb_torrents[0]
-                primary_path = sample_item.get_primary_path()
-                media_path_str = primary_path[:100] if primary_path else "N/A"
-                media_title_str = sample_item.title[:50] if sample_item.title else "N/A"
-                radarr_path_str = sample_item.radarr_path[:80] if sample_item.radarr_path else "N/A"
-                sonarr_path_str = sample_item.sonarr_path[:80] if sample_item.sonarr_path else "N/A"
-                torrent_name_str = sample_torrent.get("name", "")[:50] if sample_torrent.get("name") else "N/A"
-                torrent_content_path_str = sample_torrent.get("content_path", "")[:100] if sample_torrent.get("content_path") else "N/A"
-                torrent_save_path_str = sample_torrent.get("save_path", "")[:80] if sample_torrent.get("save_path") else "N/A"
-                torrent_files_count = len(sample_torrent.get("files", []))
-                torrent_first_file_str = sample_torrent.get("files", [""])[0][:80] if sample_torrent.get("files") else "N/A"
-                logger.info(f"matching_debug_samples: media_path={media_path_str}, media_title={media_title_str}, "
-                          f"media_type={sample_item.type}, radarr_path={radarr_path_str}, sonarr_path={sonarr_path_str}, "
-                          f"torrent_name={torrent_name_str}, torrent_content_path={torrent_content_path_str}, "
-                          f"torrent_save_path={torrent_save_path_str}, torrent_files_count={torrent_files_count}, "
-                          f"torrent_first_file={torrent_first_file_str}")
-                
-                # Tester le matching pour le premier item avec TOUS les torrents
-                if primary_path:
-                    test_hashes = qb_service.find_torrents_for_path(
-                        primary_path,
-                        qb_torrents,  # Tester avec TOUS les torrents
-                        media_title=sample_item.title
-                    )
-                    matched_hashes_str = [h[:8] for h in test_hashes[:5]]
-                    logger.info(f"matching_test_first_item: media_path={primary_path[:100]}, "
-                              f"media_title={sample_item.title[:50]}, total_torrents_tested={len(qb_torrents)}, "
-                              f"matches={len(test_hashes)}, matched_hashes={matched_hashes_str}")
-                    
-                    # Si aucun match, logger les 5 premiers torrents pour comparaison
-                    if not test_hashes and len(qb_torrents) > 0:
-                        sample_torrents = [
-                            {
-                                "name": t.get("name", "")[:60],
-                                "content_path": t.get("content_path", "")[:80],
-                                "save_path": t.get("save_path", "")[:60],
-                            }
-                            for t in qb_torrents[:5]
-                        ]
-                        logger.warning(f"no_matches_for_first_item: media_path={primary_path[:100]}, "
-                                     f"sample_torrents={sample_torrents}")
-            
             for idx, item in enumerate(unified):
                 if idx > 0 and idx % 200 == 0:
                     logger.info(f"  Progress: {idx}/{len(unified)} items processed, {qb_matched_count} with torrents, {items_with_path} with paths")
@@ -273,7 +228,7 @@ class MediaMatcher:
                         qb_matched_count += 1
                         if idx < 10:  # Log first 10 matches for debugging
                             logger.info(f"  ✓ Matched {len(qb_hashes)} torrent(s) for '{item.title}' (path: {primary_path[:60]}...)")
-                        item.qb_hashes.extend(qb_hashes)
+                        item.qb_hashes += intern_strings(qb_hashes)
                         # Stocker les noms des torrents dans metadata
                         torrent_names = []
                         for hash_val in qb_hashes:
@@ -1,12 +1,28 @@
 """Core business models."""
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
+from typing import Optional, Tuple, Dict, Any
 from datetime import datetime
+import sys
 
+# Conteneur vide partagé par tous les items sans tags/torrents/catégories (tuples immuables:
+# on réassigne au lieu de muter, ex. item.qb_hashes += tuple(hashes))
+EMPTY: Tuple[str, ...] = ()
 
-@dataclass
+
+def intern_strings(values) -> Tuple[str, ...]:
+    """Tuple de chaînes internées (tags, catégories, hashes: très répétés d'un item à l'autre)."""
+    if not values:
+        return EMPTY
+    return tuple(sys.intern(value) if isinstance(value, str) else value for value in values)
+
+
+@dataclass(slots=True)
 class MediaItem:
-    """Item média unifié (film/série/épisode)."""
+    """Item média unifié (film/série/épisode).
+
+    Slotted (pas de __dict__ par instance) avec des tuples internés pour les listes: un scan
+    en matérialise un par épisode.
+    """
     type: str  # movie, series, episode
     title: str
     year: Optional[int] = None
@@ -34,17 +50,23 @@ class MediaItem:
     overseerr_request_id: Optional[int] = None
 
     # qBittorrent
-    qb_hashes: List[str] = field(default_factory=list)  # Liste des hash torrents
-    qb_categories: List[str] = field(default_factory=list)
+    qb_hashes: Tuple[str, ...] = EMPTY  # Hash des torrents
+    qb_categories: Tuple[str, ...] = EMPTY
 
     # Radarr/Sonarr
-    tags: List[str] = field(default_factory=list)
+    tags: Tuple[str, ...] = EMPTY
     monitored: bool = True
 
     # Metadata additionnelle
     size_bytes: int = 0
     metadata: Dict[str, Any] = field(default_factory=dict)
 
+    def __post_init__(self):
+        self.type = sys.intern(self.type)
+        self.qb_hashes = intern_strings(self.qb_hashes)
+        self.qb_categories = intern_strings(self.qb_categories)
+        self.tags = intern_strings(self.tags)
+
     def get_primary_path(self) -> Optional[str]:
         """Retourne le chemin principal (radarr ou sonarr)."""
         return self.radarr_path or self.sonarr_path
@@ -56,4 +78,3 @@ class MediaItem:
         elif self.type in ["series", "episode"]:
             return self.tvdb_id or self.tmdb_id
         return None
-
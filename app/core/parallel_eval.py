@@ -0,0 +1,143 @@
+"""Évaluation des règles et garde-fous, en processus ou répartie sur un pool de processus.
+
+Avec app.evaluation_workers > 1, les gros lots sont découpés en paquets contigus envoyés à
+des processus workers. Chaque worker reçoit une seule fois, à son démarrage, un instantané
+du contexte (config, index des protections, index utilisateur → médias vus) et reconstruit
+ses RulesEngine / SafetyChecker (règles personnalisées recompilées depuis la config). Les
+paquets ne transportent que des copies allégées des MediaItem (métadonnées utiles aux règles
+et garde-fous seulement) et une heure de référence commune: les verdicts sont identiques à
+une évaluation en processus, et renvoyés dans l'ordre des items.
+"""
+import dataclasses
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+
+import structlog
+
+from app.core.item_store import MediaItemStore
+from app.core.models import MediaItem
+from app.core.protection_index import ProtectionIndex, get_protection_index, set_protection_index
+from app.core.rules import RulesEngine
+from app.core.safety import SafetyChecker
+from app.core.watch_stats import UserWatchIndex
+from app.config import Config, get_config
+
+logger = structlog.get_logger(__name__)
+
+# (candidat, règle, raison de protection)
+Verdict = Tuple[bool, Optional[str], Optional[str]]
+
+# En dessous, l'envoi aux workers coûte plus que l'évaluation elle-même
+PARALLEL_MIN_ITEMS = 5000
+# Paquets par worker (équilibrage de charge entre paquets de coûts inégaux)
+BATCHES_PER_WORKER = 4
+
+# Clés de metadata lues par les règles et garde-fous (dates d'ajout, clé de l'index de
+# visionnage, demandeurs Overseerr); les autres restent dans le processus principal
+EVALUATION_METADATA_KEYS = (
+    "added_at", "radarr_added", "sonarr_added",
+    "season_number", "episode_number",
+    "overseerr_requester_names",
+)
+
+
+def evaluate_batch(
+    rules_engine: RulesEngine,
+    safety_checker: SafetyChecker,
+    items: Sequence[MediaItem],
+    watch_index: Optional[UserWatchIndex] = None,
+    now: Optional[datetime] = None,
+) -> List[Verdict]:
+    """Verdicts d'un lot: règles en bloc (vectorisé), puis garde-fous pour les seuls candidats."""
+    store = MediaItemStore.from_items(items)
+    rule_results = rules_engine.evaluate_many(store, now=now, watch_index=watch_index)
+    path_reasons = safety_checker.excluded_path_reasons(store)
+    verdicts: List[Verdict] = []
+    for item, (is_candidate, rule), path_reason in zip(store.items, rule_results, path_reasons):
+        if not is_candidate:
+            verdicts.append((False, None, None))
+            continue
+        is_protected, protected_reason = safety_checker.is_protected(item, path_reason, paths_checked=True)
+        verdicts.append((True, rule, protected_reason if is_protected else None))
+    return verdicts
+
+
+def _compact(item: MediaItem) -> MediaItem:
+    metadata = {key: item.metadata[key] for key in EVALUATION_METADATA_KEYS if key in item.metadata}
+    return dataclasses.replace(item, metadata=metadata)
+
+
+# --- Côté worker ------------------------------------------------------------------------------
+
+_worker: Optional[Tuple[RulesEngine, SafetyChecker, Optional[UserWatchIndex]]] = None
+
+
+def _init_worker(config: Config, protection_index: ProtectionIndex, watch_index: Optional[UserWatchIndex]) -> None:
+    global _worker
+    import app.config as config_module
+    config_module.config = config
+    set_protection_index(protection_index)
+    safety_checker = SafetyChecker()
+    safety_checker.watch_index = watch_index
+    _worker = (RulesEngine(), safety_checker, watch_index)
+
+
+def _evaluate_in_worker(items: List[MediaItem], now: datetime) -> List[Verdict]:
+    rules_engine, safety_checker, watch_index = _worker
+    return evaluate_batch(rules_engine, safety_checker, items, watch_index, now)
+
+
+# --- Côté planner -----------------------------------------------------------------------------
+
+class ParallelEvaluator:
+    """Pool de workers d'évaluation, démarré au premier gros lot et réutilisé jusqu'à close().
+
+    Args:
+        workers: Nombre de processus (borné au nombre de cœurs)
+        watch_index: Index utilisateur → médias vus du scan (instantané envoyé aux workers)
+    """
+
+    def __init__(self, workers: int, watch_index: Optional[UserWatchIndex] = None):
+        self.workers = max(1, min(workers, os.cpu_count() or 1))
+        self.watch_index = watch_index
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: le processus API a des threads actifs (fork les dupliquerait dans un état incohérent)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(get_config(), get_protection_index(), self.watch_index),
+            )
+            logger.info("evaluation_pool_started", workers=self.workers)
+        return self._pool
+
+    def evaluate(
+        self,
+        rules_engine: RulesEngine,
+        safety_checker: SafetyChecker,
+        items: Sequence[MediaItem],
+    ) -> List[Verdict]:
+        """Verdicts de `items`, dans l'ordre (en processus si le lot est petit ou un seul worker)."""
+        now = datetime.now(timezone.utc)
+        if self.workers < 2 or len(items) < PARALLEL_MIN_ITEMS:
+            return evaluate_batch(rules_engine, safety_checker, items, self.watch_index, now)
+
+        batch_size = -(-len(items) // (self.workers * BATCHES_PER_WORKER))
+        batches = [[_compact(item) for item in items[start:start + batch_size]]
+                   for start in range(0, len(items), batch_size)]
+        verdicts: List[Verdict] = []
+        # map() rend les résultats dans l'ordre des paquets, quel que soit l'ordre de fin
+        for batch_verdicts in self._get_pool().map(_evaluate_in_worker, batches, [now] * len(batches)):
+            verdicts.extend(batch_verdicts)
+        return verdicts
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,95 @@
+"""Matcher de préfixes de chemins précompilé (exclusions de config, protections en DB).
+
+Un chemin correspond à un préfixe si sa chaîne brute commence par celle du préfixe, ou si,
+une fois normalisés (Path: séparateurs doublés, "/" final et "." retirés), le préfixe en est
+un ancêtre au sens des composants (équivalent de Path.is_relative_to). Les préfixes sont
+normalisés une seule fois et rangés par longueur: tester un chemin coûte un lookup de
+dictionnaire par longueur de préfixe distincte, quel que soit le nombre de préfixes.
+"""
+from pathlib import PurePath
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# (priorité, valeur): la plus petite priorité l'emporte quand plusieurs préfixes correspondent
+_Entry = Tuple[int, T]
+
+
+def _normalize(path: str) -> str:
+    try:
+        return str(PurePath(path))
+    except (TypeError, ValueError):
+        return path
+
+
+class _LengthIndex(Generic[T]):
+    """Préfixes groupés par longueur."""
+
+    def __init__(self):
+        self._by_length: Dict[int, Dict[str, _Entry]] = {}
+        self._lengths: List[int] = []
+
+    def add(self, prefix: str, entry: _Entry) -> None:
+        bucket = self._by_length.setdefault(len(prefix), {})
+        if prefix not in bucket or entry[0] < bucket[prefix][0]:
+            bucket[prefix] = entry
+        self._lengths = sorted(self._by_length)
+
+    def matches(self, path: str, component_boundary: bool) -> Iterable[_Entry]:
+        for length in self._lengths:
+            if length > len(path):
+                break
+            entry = self._by_length[length].get(path[:length])
+            if entry is None:
+                continue
+            # Préfixe de composants: fin du chemin, séparateur après le préfixe, ou préfixe racine ("/")
+            if component_boundary and length < len(path) and path[length] != "/" and not path[:length].endswith("/"):
+                continue
+            yield entry
+
+
+class PathPrefixMatcher(Generic[T]):
+    """Associe une valeur (raison, préfixe d'origine...) à chaque préfixe de chemin."""
+
+    def __init__(self, prefixes: Iterable[Tuple[str, T]] = ()):
+        self._raw: _LengthIndex[T] = _LengthIndex()
+        self._normalized: _LengthIndex[T] = _LengthIndex()
+        self._size = 0
+        for prefix, value in prefixes:
+            self.add(prefix, value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, prefix: str, value: T, priority: Optional[int] = None) -> None:
+        """Ajoute un préfixe (priorité par défaut: ordre d'ajout)."""
+        if not prefix:
+            return
+        entry = (self._size if priority is None else priority, value)
+        self._raw.add(str(prefix), entry)
+        self._normalized.add(_normalize(str(prefix)), entry)
+        self._size += 1
+
+    def match(self, path: Optional[str]) -> Optional[T]:
+        """Valeur du préfixe prioritaire correspondant au chemin, None si aucun."""
+        if not path or not self._size:
+            return None
+        path = str(path)
+        best: Optional[_Entry] = None
+        for entry in self._raw.matches(path, component_boundary=False):
+            if best is None or entry[0] < best[0]:
+                best = entry
+        for entry in self._normalized.matches(_normalize(path), component_boundary=True):
+            if best is None or entry[0] < best[0]:
+                best = entry
+        return best[1] if best else None
+
+    def match_many(self, paths: Iterable[Optional[str]]) -> List[Optional[T]]:
+        """match() sur une liste de chemins (les chemins répétés ne sont évalués qu'une fois)."""
+        results: Dict[Optional[str], Optional[T]] = {}
+        matched = []
+        for path in paths:
+            if path not in results:
+                results[path] = self.match(path)
+            matched.append(results[path])
+        return matched
@@ -0,0 +1,342 @@
+"""Moteur de pipeline de scan par étapes (graphe de dépendances).
+
+Chaque étape déclare ses entrées et ses sorties (clés d'un contexte partagé). Les étapes dont
+les entrées sont disponibles s'exécutent en parallèle (les fonctions synchrones dans un thread).
+Pour chaque étape sont mesurés la durée, le nombre d'enregistrements produits et la variation
+de mémoire (RSS). Les sorties peuvent être sauvegardées (pickle) dans un répertoire de
+checkpoints: un scan relancé avec `resume_from` recharge les étapes déjà terminées au lieu de
+tout refaire. Les checkpoints d'un run portent l'empreinte de son contexte (config, périmètre):
+la reprise est refusée si elle a changé, pour ne pas mélanger des sorties produites sous
+d'anciennes règles avec une évaluation sous les nouvelles.
+"""
+import asyncio
+import inspect
+import os
+import pickle
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+StageResult = Dict[str, Any]
+StageFunc = Callable[[Dict[str, Any]], Union[StageResult, Awaitable[StageResult]]]
+
+
+def current_rss_bytes() -> int:
+    """RSS courant du process (Linux /proc), sinon pic RSS via getrusage."""
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except (ImportError, OSError):
+            return 0
+
+
+def _record_count(value: Any) -> Optional[int]:
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+@dataclass
+class Stage:
+    """Étape du pipeline.
+
+    Args:
+        name: Nom unique de l'étape
+        func: Reçoit le contexte (dict) et retourne un dict contenant ses `outputs`
+        inputs: Clés du contexte requises (sorties d'autres étapes ou contexte initial)
+        outputs: Clés produites
+        checkpoint: Sauvegarder les sorties pour reprise
+    """
+    name: str
+    func: StageFunc
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    checkpoint: bool = True
+
+
+@dataclass
+class StageMetrics:
+    """Mesures d'exécution d'une étape."""
+    name: str
+    status: str = "pending"  # pending, running, completed, resumed, failed
+    started_at: Optional[datetime] = None
+    duration_ms: float = 0.0
+    records: Dict[str, Optional[int]] = field(default_factory=dict)
+    # Variation du RSS de tout le process pendant l'étape: inclut les étapes exécutées en
+    # parallèle, c'est un ordre de grandeur, pas la mémoire propre de l'étape
+    rss_delta_bytes: int = 0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "duration_ms": round(self.duration_ms, 1),
+            "records": self.records,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "error": self.error,
+        }
+
+
+class PipelineError(RuntimeError):
+    """Échec d'une étape (le scan peut être repris depuis les checkpoints)."""
+
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class CheckpointMismatchError(RuntimeError):
+    """Les checkpoints du run repris ont été produits sous un autre contexte (config, périmètre)."""
+
+    def __init__(self, run_id: str):
+        super().__init__(f"Checkpoints of scan {run_id} were produced with a different configuration or scope; "
+                         f"start a new scan instead of resuming")
+        self.run_id = run_id
+
+
+class Pipeline:
+    """Exécute un graphe d'étapes.
+
+    Args:
+        stages: Étapes (ordre indifférent, les dépendances sont déduites des entrées/sorties)
+        run_id: Identifiant du run (nom du répertoire de checkpoints)
+        checkpoint_dir: Répertoire racine des checkpoints (None = pas de checkpoints)
+        on_stage_event: Callback (stage, event, metrics, done, total) appelé au début/fin de chaque étape
+        fingerprint: Empreinte du contexte du run, enregistrée avec ses checkpoints et comparée
+            à celle du run repris
+    """
+
+    # Nombre de runs non terminés dont les checkpoints sont conservés
+    MAX_CHECKPOINT_RUNS = 3
+    FINGERPRINT_FILE = "fingerprint"
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        run_id: str,
+        checkpoint_dir: Optional[str] = None,
+        on_stage_event: Optional[Callable[[Stage, str, StageMetrics, int, int], None]] = None,
+        fingerprint: str = "",
+    ):
+        self.stages = {stage.name: stage for stage in stages}
+        self.run_id = run_id
+        self.fingerprint = fingerprint
+        self.checkpoint_root = Path(checkpoint_dir) if checkpoint_dir else None
+        self.on_stage_event = on_stage_event
+        self.metrics: Dict[str, StageMetrics] = {stage.name: StageMetrics(stage.name) for stage in stages}
+        self._producers = self._validate()
+
+    def _validate(self) -> Dict[str, str]:
+        """Vérifie que chaque sortie a un seul producteur et que le graphe est acyclique."""
+        producers: Dict[str, str] = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"Output '{output}' produced by both '{producers[output]}' and '{stage.name}'")
+                producers[output] = stage.name
+
+        visiting, visited = set(), set()
+
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage '{name}'")
+            visiting.add(name)
+            for key in self.stages[name].inputs:
+                if key in producers:
+                    visit(producers[key])
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+        return producers
+
+    def _dependencies(self, stage: Stage) -> List[str]:
+        return [self._producers[key] for key in stage.inputs if key in self._producers]
+
+    def _checkpoint_path(self, run_id: str, stage: Stage) -> Optional[Path]:
+        if not self.checkpoint_root:
+            return None
+        return self.checkpoint_root / run_id / f"{stage.name}.pkl"
+
+    def _save_checkpoint(self, stage: Stage, outputs: StageResult) -> None:
+        path = self._checkpoint_path(self.run_id, stage)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fingerprint_path = path.parent / self.FINGERPRINT_FILE
+        if not fingerprint_path.is_file():
+            fingerprint_path.write_text(self.fingerprint, encoding="utf-8")
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as checkpoint:
+            pickle.dump(outputs, checkpoint, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+
+    def _load_checkpoint(self, run_id: str, stage: Stage) -> Optional[StageResult]:
+        path = self._checkpoint_path(run_id, stage)
+        if path is None or not path.is_file():
+            return None
+        try:
+            with open(path, "rb") as checkpoint:
+                return pickle.load(checkpoint)
+        except Exception as e:
+            logger.warning("pipeline_checkpoint_unreadable", stage=stage.name, path=str(path), error=str(e))
+            return None
+
+    def _check_resumable(self, run_id: str) -> None:
+        """Refuse la reprise de checkpoints produits sous une autre empreinte."""
+        run_dir = self.checkpoint_root / run_id if self.checkpoint_root else None
+        if run_dir is None or not run_dir.is_dir():
+            return  # Rien à reprendre: toutes les étapes seront exécutées
+        try:
+            fingerprint = (run_dir / self.FINGERPRINT_FILE).read_text(encoding="utf-8")
+        except OSError:
+            fingerprint = None  # Checkpoints antérieurs aux empreintes
+        if fingerprint != self.fingerprint:
+            logger.warning("pipeline_checkpoint_mismatch", run_id=self.run_id, resume_from=run_id)
+            raise CheckpointMismatchError(run_id)
+
+    def _adopt_checkpoint(self, run_id: str, stage: Stage) -> None:
+        source = self._checkpoint_path(run_id, stage)
+        target = self._checkpoint_path(self.run_id, stage)
+        if source is None or target is None or source == target:
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+    def _prune_checkpoints(self) -> None:
+        """Ne garde que les checkpoints des derniers runs non terminés."""
+        if not self.checkpoint_root or not self.checkpoint_root.is_dir():
+            return
+        runs = sorted(
+            (path for path in self.checkpoint_root.iterdir() if path.is_dir() and path.name != self.run_id),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+        for path in runs[self.MAX_CHECKPOINT_RUNS:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _emit(self, stage: Stage, event: str) -> None:
+        if not self.on_stage_event:
+            return
+        done = sum(1 for metrics in self.metrics.values() if metrics.status in ("completed", "resumed"))
+        try:
+            self.on_stage_event(stage, event, self.metrics[stage.name], done, len(self.stages))
+        except Exception as e:
+            logger.warning("pipeline_stage_callback_failed", stage=stage.name, error=str(e))
+
+    async def _run_stage(self, stage: Stage, context: Dict[str, Any], resume_from: Optional[str]) -> StageResult:
+        metrics = self.metrics[stage.name]
+        metrics.started_at = datetime.now()
+        started = time.perf_counter()
+        rss_before = current_rss_bytes()
+
+        outputs = None
+        if resume_from and stage.checkpoint:
+            outputs = await asyncio.to_thread(self._load_checkpoint, resume_from, stage)
+        if outputs is not None:
+            metrics.status = "resumed"
+            # Le run courant doit rester reprenable à son tour s'il échoue plus loin
+            await asyncio.to_thread(self._adopt_checkpoint, resume_from, stage)
+        else:
+            metrics.status = "running"
+            self._emit(stage, "started")
+            inputs = {key: context[key] for key in stage.inputs if key in context}
+            if inspect.iscoroutinefunction(stage.func):
+                outputs = await stage.func(inputs)
+            else:
+                outputs = await asyncio.to_thread(stage.func, inputs)
+            outputs = outputs or {}
+            missing = [key for key in stage.outputs if key not in outputs]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' did not produce {missing}")
+            if stage.checkpoint and self.checkpoint_root:
+                try:
+                    await asyncio.to_thread(self._save_checkpoint, stage, outputs)
+                except Exception as e:
+                    logger.warning("pipeline_checkpoint_failed", stage=stage.name, error=str(e))
+            metrics.status = "completed"
+
+        metrics.duration_ms = (time.perf_counter() - started) * 1000
+        metrics.rss_delta_bytes = current_rss_bytes() - rss_before
+        metrics.records = {key: _record_count(outputs.get(key)) for key in stage.outputs}
+        logger.info("pipeline_stage_done", run_id=self.run_id, **metrics.to_dict())
+        self._emit(stage, metrics.status)
+        return outputs
+
+    async def run(self, context: Optional[Dict[str, Any]] = None, resume_from: Optional[str] = None) -> Dict[str, Any]:
+        """Exécute toutes les étapes et retourne le contexte final.
+
+        Args:
+            context: Valeurs initiales du contexte
+            resume_from: run_id dont les checkpoints sont réutilisés
+
+        Raises:
+            CheckpointMismatchError: Si les checkpoints de `resume_from` ont une autre empreinte
+            PipelineError: Si une étape échoue (les étapes en cours sont annulées)
+        """
+        context = dict(context or {})
+        if resume_from:
+            self._check_resumable(resume_from)
+        self._prune_checkpoints()
+        pending = dict(self.stages)
+        running: Dict[asyncio.Task, Stage] = {}
+
+        try:
+            while pending or running:
+                for name in list(pending):
+                    stage = pending[name]
+                    if all(self.metrics[dep].status in ("completed", "resumed") for dep in self._dependencies(stage)):
+                        del pending[name]
+                        task = asyncio.create_task(self._run_stage(stage, context, resume_from))
+                        running[task] = stage
+                if not running:
+                    raise ValueError(f"Unresolvable stage inputs: {sorted(pending)}")
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage = running.pop(task)
+                    try:
+                        outputs = task.result()
+                    except Exception as e:
+                        metrics = self.metrics[stage.name]
+                        metrics.status = "failed"
+                        metrics.error = str(e)
+                        logger.error("pipeline_stage_failed", run_id=self.run_id, stage=stage.name, error=str(e), exc_info=True)
+                        self._emit(stage, "failed")
+                        raise PipelineError(stage.name, e) from e
+                    context.update({key: outputs[key] for key in stage.outputs})
+        finally:
+            for task in running:
+                task.cancel()
+
+        # Run terminé: ses checkpoints (et ceux du run repris) ne servent plus
+        if self.checkpoint_root:
+            for run_id in {self.run_id, resume_from} - {None}:
+                shutil.rmtree(self.checkpoint_root / run_id, ignore_errors=True)
+        return context
+
+    def metrics_summary(self) -> List[Dict[str, Any]]:
+        """Mesures de toutes les étapes (ordre de démarrage)."""
+        ordered = sorted(self.metrics.values(), key=lambda metrics: metrics.started_at or datetime.max)
+        return [metrics.to_dict() for metrics in ordered]
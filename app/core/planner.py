@@ -1,38 +1,260 @@
-"""Planificateur de suppression."""
-from typing import List, Dict, Any
+"""Planificateur de suppression.
+
+Le scan est un graphe d'étapes (voir app.core.pipeline):
+
+    fetch_tautulli, fetch_radarr, fetch_sonarr → fetch_episodes, fetch_overseerr, fetch_qbittorrent
+        → build_items → match → enrich → evaluate → persist
+
+Avec app.scan_chunk_size, enrich → evaluate → persist sont remplacés par une seule étape
+(process_chunks) qui les enchaîne paquet par paquet (série par série).
+
+Les collectes indépendantes s'exécutent en parallèle. Les sorties intermédiaires sont
+sauvegardées (app.scan_checkpoints) pour qu'un scan échoué puisse reprendre sans tout recollecter.
+"""
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime
-import logging
+import hashlib
+import json
+import os
+from pathlib import Path
 
-from app.core.models import MediaItem
+import structlog
+from sqlalchemy import insert
 
-logger = logging.getLogger(__name__)
+from app.core.item_store import MediaItemStore
+from app.core.models import MediaItem, intern_strings
 from app.core.matcher import MediaMatcher
 from app.core.rules import RulesEngine
 from app.core.safety import SafetyChecker
+from app.core.match_cache import TorrentMatchCache
+from app.core.match_explain import match_explanation_store
+from app.core.incremental import VerdictCache, evaluation_context_hash, rule_thresholds, verdict_key
+from app.core.scan_scope import ScanScope
+from app.core.scan_profile import ScanProfiler, hit_rate
+from app.core.protection_index import get_protection_index, invalidate_protection_index
+from app.core.parallel_eval import ParallelEvaluator
+from app.core.pipeline import Pipeline, Stage, StageMetrics
+from app.core.watch_stats import UserWatchIndex
 from app.services.radarr import RadarrService
 from app.services.sonarr import SonarrService
-from app.services.overseerr import OverseerrService
+from app.services.overseerr import OverseerrRequestIndex, OverseerrService
 from app.services.qbittorrent import QBittorrentService
 from app.services.tautulli import TautulliService
 from app.db.models import Plan, PlanItem
 from app.db.database import get_db_sync
-from app.config import get_config
+from app.utils.upstream_stats import collect_upstream_stats
+from app.config import get_config, reload_config_if_changed
+
+logger = structlog.get_logger(__name__)
+
+# Taille des paquets d'insertion des PlanItems
+PLAN_ITEMS_CHUNK_SIZE = 1000
+
+# Étape → (step de début, step de fin, libellé) affichés par le frontend
+STAGE_STEPS: Dict[str, Tuple[str, str, str]] = {
+    "fetch_tautulli": ("tautulli_fetching", "tautulli_fetched", "Historique Tautulli"),
+    "fetch_radarr": ("radarr_fetching", "radarr_fetched", "Radarr"),
+    "fetch_sonarr": ("sonarr_fetching", "sonarr_fetched", "Sonarr"),
+    "fetch_episodes": ("episodes_fetching", "episodes_fetched", "Épisodes Sonarr"),
+    "fetch_overseerr": ("overseerr_fetching", "overseerr_fetched", "Overseerr"),
+    "fetch_qbittorrent": ("qbittorrent_fetching", "qbittorrent_fetched", "qBittorrent"),
+    "build_items": ("items_building", "items_built", "Conversion des médias"),
+    "match": ("matching_started", "matching_completed", "Matching et unification"),
+    "enrich": ("enriching", "enriched", "Enrichissement Overseerr"),
+    "evaluate": ("rules_evaluating", "rules_evaluated", "Évaluation des règles et garde-fous"),
+    "persist": ("plan_creating", "plan_persisted", "Création du plan"),
+    "process_chunks": ("chunks_processing", "plan_persisted", "Évaluation et création du plan par paquets"),
+}
+
+
+def _apply_watch_stats(item: MediaItem, watch_stats: Optional[Dict[str, Any]], mark_unwatched: bool = True) -> None:
+    """Reporte les statistiques Tautulli sur un MediaItem (absence de données = jamais vu)."""
+    if watch_stats:
+        item.last_viewed_at = watch_stats.get("last_watched_at")
+        item.view_count = watch_stats.get("view_count", 0)
+        # Si on a des données avec last_watched_at ou view_count > 0, alors jamais vu = False
+        if item.last_viewed_at or item.view_count > 0:
+            item.never_watched = False
+        else:
+            item.never_watched = watch_stats.get("never_watched", True)
+        item.metadata["watch_source"] = "Tautulli"
+        item.metadata["last_watched_user"] = watch_stats.get("last_user")
+        item.metadata["tautulli_rating_key"] = watch_stats.get("rating_key")
+    elif mark_unwatched:
+        item.never_watched = True
+        item.view_count = 0
+        item.metadata["watch_source"] = "Tautulli (never watched)"
+
+
+def _plan_item_row(plan_id: int, item: MediaItem, rule: Optional[str]) -> Dict[str, Any]:
+    """Ligne plan_items d'un candidat (insertion groupée; JSON sérialisé une fois, à l'insertion)."""
+    meta = {
+        "plex_rating_key": item.plex_rating_key,
+        "overseerr_request_id": item.overseerr_request_id,
+        "overseerr_status": item.overseerr_status,
+        "overseerr_requested_by": item.overseerr_requested_by,
+        "tags": list(item.tags),
+        "monitored": item.monitored,
+    }
+    meta.update(item.metadata)
+    return {
+        "plan_id": plan_id,
+        "selected": True,  # Par défaut sélectionné
+        "media_type": item.type,
+        "title": item.title,
+        "year": item.year,
+        "ids_json": {"tmdb": item.tmdb_id, "tvdb": item.tvdb_id, "imdb": item.imdb_id},
+        "path": item.get_primary_path() or "",
+        "size_bytes": item.size_bytes,
+        "last_viewed_at": item.last_viewed_at,
+        "view_count": item.view_count,
+        "never_watched": item.never_watched,
+        "rule": rule,
+        "protected_reason": None,  # Items protégés ne sont pas dans candidates
+        "qb_hashes_json": list(item.qb_hashes),
+        "meta_json": meta,
+    }
+
+
+def _delete_building_plans() -> None:
+    """Supprime les plans BUILDING laissés par un scan par paquets interrompu (arrêt brutal).
+
+    Les scans sont exclusifs (app.core.scan_coordinator): au démarrage d'un scan, aucun
+    plan BUILDING n'est en cours d'écriture.
+    """
+    db = get_db_sync()
+    try:
+        plan_ids = [plan_id for (plan_id,) in db.query(Plan.id).filter(Plan.status == "BUILDING").all()]
+        if not plan_ids:
+            return
+        db.query(PlanItem).filter(PlanItem.plan_id.in_(plan_ids)).delete(synchronize_session=False)
+        db.query(Plan).filter(Plan.id.in_(plan_ids)).delete(synchronize_session=False)
+        db.commit()
+        logger.warning("orphan_building_plans_deleted", plan_ids=plan_ids)
+    except Exception as e:
+        db.rollback()
+        logger.warning("orphan_building_plans_delete_failed", error=str(e), exc_info=True)
+    finally:
+        db.close()
+
+
+# Référence d'un torrent à des médias inconnus d'un scan partiel (jamais supprimés par le run)
+OUTSIDE_SCOPE_KEY = "outside_scope"
+
+
+def _mark_shared_torrents(
+    items: List[MediaItem],
+    partial: bool = False,
+    match_cache: Optional[TorrentMatchCache] = None,
+) -> None:
+    """Note sur chaque média les torrents qu'il partage avec d'autres (season packs, cross-seed).
+
+    metadata["qb_shared_with"] = {hash: [clés des autres médias]}: l'exécuteur ne supprime un
+    torrent partagé que si tous ces médias sont supprimés avec lui. Une série dont les épisodes
+    sont évalués individuellement n'est jamais candidate et n'est pas comptée.
+
+    Scan partiel (`partial`): les médias hors périmètre n'ont pas été collectés. Un torrent
+    associé dans le cache de matching à un média absent du scan est partagé avec lui
+    ("path:<chemin>"); sans cache, tout torrent est considéré partagé (OUTSIDE_SCOPE_KEY) et
+    n'est jamais retiré de qBittorrent par un plan partiel.
+    """
+    series_with_episodes = {item.metadata.get("sonarr_id") for item in items if item.type == "episode"}
+    references: Dict[str, List[str]] = {}
+    for item in items:
+        if item.type == "series" and item.metadata.get("sonarr_id") in series_with_episodes:
+            continue
+        item.metadata["item_key"] = verdict_key(item)
+        for torrent_hash in item.qb_hashes:
+            references.setdefault(torrent_hash, []).append(item.metadata["item_key"])
+    if partial:
+        known_paths = {item.get_primary_path() for item in items}
+        for torrent_hash, keys in references.items():
+            if match_cache is None:
+                keys.append(OUTSIDE_SCOPE_KEY)
+            else:
+                keys.extend(f"path:{path}" for path in sorted(match_cache.previous_media_paths(torrent_hash) - known_paths))
+    for item in items:
+        key = item.metadata.get("item_key")
+        shared = {
+            torrent_hash: [other for other in references[torrent_hash] if other != key]
+            for torrent_hash in item.qb_hashes
+            if key is not None and len(references.get(torrent_hash, ())) > 1
+        }
+        if shared:
+            item.metadata["qb_shared_with"] = shared
+
+
+@dataclass
+class _Evaluation:
+    """État de l'évaluation d'un scan, partagé entre les paquets en mode streaming."""
+    watch_index: Optional[UserWatchIndex]
+    series_with_episodes: Set[int]
+    verdicts: Optional[VerdictCache]
+    max_items: Optional[int]
+    evaluator: ParallelEvaluator
+    candidates_count: int = 0
+    limit_reached: bool = False
+
+
+def _library_chunks(items: List[MediaItem], chunk_size: int) -> List[List[MediaItem]]:
+    """Découpe la bibliothèque en paquets d'environ `chunk_size` items, sans couper une série.
+
+    Une série et ses épisodes (même sonarr_id) restent dans le même paquet, quitte à le dépasser;
+    l'ordre de première apparition est conservé.
+    """
+    groups: Dict[Any, List[MediaItem]] = {}
+    for item in items:
+        sonarr_id = item.metadata.get("sonarr_id") if item.type in ("series", "episode") else None
+        key = ("sonarr", sonarr_id) if sonarr_id is not None else id(item)
+        groups.setdefault(key, []).append(item)
+
+    chunks: List[List[MediaItem]] = []
+    current: List[MediaItem] = []
+    for group in groups.values():
+        if current and len(current) + len(group) > chunk_size:
+            chunks.append(current)
+            current = []
+        current.extend(group)
+    if current:
+        chunks.append(current)
+    return chunks
 
 
 class Planner:
-    """Génère un plan de suppression."""
+    """Génère un plan de suppression.
 
-    def __init__(self, scan_id: str = None):
+    Args:
+        scan_id: Identifiant du scan (progression dans scan_progress_store, nom des checkpoints)
+        resume_from: scan_id d'un scan échoué dont les étapes sauvegardées sont réutilisées
+        scope: Périmètre d'un scan partiel (None = toute la bibliothèque)
+    """
+
+    def __init__(self, scan_id: str = None, resume_from: Optional[str] = None, scope: Optional[ScanScope] = None):
+        # Config (dont les règles) rechargée à chaud si le fichier a changé depuis le dernier scan
+        reload_config_if_changed()
+        self.config = get_config()
         self.matcher = MediaMatcher()
         self.rules_engine = RulesEngine()
         self.safety_checker = SafetyChecker()
         self.scan_id = scan_id
+        self.resume_from = resume_from
+        self.scope = scope
+        self.run_id = scan_id or f"scheduled-{datetime.now().strftime('%Y%m%dT%H%M%S')}"
+        # Services créés à la demande: une étape reprise depuis un checkpoint n'en a pas besoin
+        self._services: Dict[str, Any] = {}
+        self._explanations = None
+        self.stage_metrics: List[Dict[str, Any]] = []
+        self.evaluation_stats: Dict[str, Any] = {}
+        self.profile: Optional[Dict[str, Any]] = None
+        # Progression au démarrage de chaque étape (progression fine à l'intérieur d'une étape)
+        self._stage_progress: Dict[str, int] = {}
 
     def _emit_progress(self, step: str, progress: int, message: str = None, data: dict = None):
         """Émet un événement de progression si scan_id est défini."""
         if not self.scan_id:
             return
-        
+
         from app.main import scan_progress_store
         if self.scan_id in scan_progress_store:
             scan_progress_store[self.scan_id].update({
@@ -50,104 +272,260 @@ class Planner:
             if data:
                 scan_progress_store[self.scan_id].update(data)
 
+    def _service(self, name: str) -> Optional[Any]:
+        """Service `name` (créé une seule fois), None si non configuré ou en erreur."""
+        if name in self._services:
+            return self._services[name]
+
+        factories = {
+            "tautulli": (TautulliService, self.config.tautulli and self.config.tautulli.enabled),
+            "radarr": (RadarrService, self.config.radarr),
+            "sonarr": (SonarrService, self.config.sonarr),
+            "overseerr": (OverseerrService, self.config.overseerr),
+            "qbittorrent": (QBittorrentService, self.config.qbittorrent),
+        }
+        factory, configured = factories[name]
+        service = None
+        if configured:
+            try:
+                service = factory()
+            except Exception as e:
+                logger.warning("service_init_failed", service=name, error=str(e), exc_info=True)
+        self._services[name] = service
+        return service
+
+    def _on_stage_event(self, stage: Stage, event: str, metrics: StageMetrics, done: int, total: int) -> None:
+        """Traduit les événements du pipeline en progression (0-95%, 100% une fois le plan créé)."""
+        started_step, completed_step, label = STAGE_STEPS.get(stage.name, (stage.name, stage.name, stage.name))
+        progress = 5 + int(90 * done / total) if total else 5
+        if event == "started":
+            self._stage_progress[stage.name] = progress
+            self._emit_progress(started_step, progress, f"{label}...")
+            return
+
+        records = ", ".join(f"{key}: {count}" for key, count in metrics.records.items() if count is not None)
+        if event == "failed":
+            message = f"{label}: échec ({metrics.error})"
+            step = f"{stage.name}_failed"
+        elif event == "resumed":
+            message = f"{label}: repris depuis le checkpoint ({records})"
+            step = completed_step
+        else:
+            message = f"{label}: terminé en {metrics.duration_ms / 1000:.1f}s ({records})"
+            step = completed_step
+        self._emit_progress(step, progress, message, {"stages": self._pipeline.metrics_summary()})
+
+    def _build_pipeline(self) -> Pipeline:
+        checkpoint_dir = None
+        if self.config.app.scan_checkpoints:
+            data_dir = os.getenv("DATA_DIR", self.config.app.data_dir)
+            checkpoint_dir = str(Path(data_dir) / "scan_checkpoints")
+
+        stages = [
+            Stage("fetch_tautulli", self._fetch_tautulli,
+                  outputs=("tautulli_available", "movie_watch_map", "episode_watch_map",
+                           "series_watch_map", "user_watch_index")),
+            Stage("fetch_radarr", self._fetch_radarr, outputs=("radarr_movies",)),
+            Stage("fetch_sonarr", self._fetch_sonarr, outputs=("sonarr_series",)),
+            Stage("fetch_episodes", self._fetch_episodes, inputs=("sonarr_series",), outputs=("episodes_by_series",)),
+            Stage("fetch_overseerr", self._fetch_overseerr, outputs=("overseerr_requests",)),
+            Stage("fetch_qbittorrent", self._fetch_qbittorrent, outputs=("qb_torrents",)),
+            Stage("build_items", self._build_items,
+                  inputs=("radarr_movies", "sonarr_series", "episodes_by_series", "tautulli_available",
+                          "movie_watch_map", "episode_watch_map", "series_watch_map"),
+                  outputs=("radarr_items", "sonarr_items", "episode_items")),
+            Stage("match", self._match,
+                  inputs=("radarr_items", "sonarr_items", "episode_items", "qb_torrents"),
+                  outputs=("unified_items",)),
+        ]
+        if self.config.app.scan_chunk_size:
+            # Mode streaming: enrich → evaluate → persist enchaînés paquet par paquet
+            stages.append(Stage("process_chunks", self._process_chunks,
+                                inputs=("unified_items", "overseerr_requests", "user_watch_index"),
+                                outputs=("plan_id",), checkpoint=False))
+        else:
+            stages += [
+                Stage("enrich", self._enrich, inputs=("unified_items", "overseerr_requests"), outputs=("enriched_items",)),
+                Stage("evaluate", self._evaluate, inputs=("enriched_items", "user_watch_index"),
+                      outputs=("candidates", "evaluation_stats")),
+                # Dernière étape: rien à reprendre après elle
+                Stage("persist", self._persist, inputs=("candidates", "evaluation_stats"), outputs=("plan_id",), checkpoint=False),
+            ]
+        return Pipeline(stages, self.run_id, checkpoint_dir=checkpoint_dir, on_stage_event=self._on_stage_event,
+                        fingerprint=self._checkpoint_fingerprint())
+
+    def _checkpoint_fingerprint(self) -> str:
+        """Empreinte de la config et du périmètre du scan: un scan n'est repris que sous la même."""
+        raw = json.dumps({"config": self.config.model_dump(mode="json"),
+                          "scope": self.scope.to_dict() if self.scope else None},
+                         sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
     async def generate_plan(self) -> int:
         """Génère un plan de suppression et le sauvegarde en DB."""
-        logger.info("Starting plan generation...")
+        logger.info("plan_generation_started", run_id=self.run_id, resume_from=self.resume_from)
         self._emit_progress("initializing", 0, "Initialisation du scan...")
-        db = get_db_sync()
+        if self.resume_from:
+            self._emit_progress("initializing", 0, f"Reprise des étapes sauvegardées du scan {self.resume_from}")
+
+        _delete_building_plans()
+        self._pipeline = self._build_pipeline()
+        profiler = ScanProfiler(self.run_id)
+        context = None
+        error = None
+        try:
+            # Appels aux services amont comptés pour le profil (étapes en thread comprises)
+            with collect_upstream_stats(profiler.upstream):
+                context = await self._pipeline.run(resume_from=self.resume_from)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.stage_metrics = self._pipeline.metrics_summary()
+            logger.info("scan_pipeline_metrics", run_id=self.run_id, stages=self.stage_metrics)
+            self.profile = profiler.save(context["plan_id"] if context else None, self.stage_metrics,
+                                         self._cache_stats(), error)
+
+        plan_id = context["plan_id"]
+        self._emit_progress("plan_created", 100, f"Plan {plan_id} créé avec succès",
+                            {"plan_id": plan_id, "stages": self.stage_metrics})
+        return plan_id
+
+    def _cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Taux de hit des caches du scan (étapes exécutées seulement, pas celles reprises)."""
+        caches = {}
+        qb_service = self._services.get("qbittorrent")
+        if qb_service is not None and qb_service.match_cache is not None:
+            caches["torrent_match"] = hit_rate(qb_service.match_cache.hits, qb_service.match_cache.misses)
+        if self.evaluation_stats.get("incremental"):
+            caches["verdicts"] = hit_rate(self.evaluation_stats["carried_forward"], self.evaluation_stats["evaluated"])
+        return caches
+
+    # --- Collecte ---------------------------------------------------------------------------
+
+    def _fetch_tautulli(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Watch history Tautulli (source de vérité)."""
+        result = {
+            "tautulli_available": False,
+            "movie_watch_map": {},
+            "episode_watch_map": {},
+            "series_watch_map": {},
+            "user_watch_index": None,
+        }
+        tautulli_service = self._service("tautulli")
+        if not tautulli_service:
+            return result
+        # Service disponible: l'absence de données vaut "jamais vu", même si la collecte échoue
+        result["tautulli_available"] = True
+        try:
+            # Historique brut (récupéré une seule fois) ou agrégats selon watch_data_source
+            movie_watch_map, episode_watch_map, series_watch_map = tautulli_service.get_watch_maps()
+            logger.info("tautulli_fetched", movies=len(movie_watch_map), episodes=len(episode_watch_map),
+                        series=len(series_watch_map))
+            result.update({
+                "movie_watch_map": movie_watch_map,
+                "episode_watch_map": episode_watch_map,
+                "series_watch_map": series_watch_map,
+                # Pas d'index utilisateurs en mode "library" (agrégats sans utilisateurs)
+                "user_watch_index": tautulli_service.user_watch_index,
+            })
+        except Exception as e:
+            logger.warning("tautulli_fetch_failed", error=str(e), exc_info=True)
+            self._emit_progress("tautulli_error", 10, f"Erreur Tautulli: {str(e)}")
+        return result
 
-        config = get_config()
-
-        # Collecte des données depuis tous les services
-        logger.info("Initializing services...")
-        
-        # Tautulli watch history (source de vérité)
-        self._emit_progress("tautulli_fetching", 10, "Récupération de l'historique Tautulli...")
-        movie_watch_map = {}
-        episode_watch_map = {}
-        series_watch_map = {}
-        tautulli_service = None
-        if config.tautulli and config.tautulli.enabled:
+    async def _fetch_radarr(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        radarr_service = self._service("radarr")
+        radarr_movies = []
+        scope = self.scope
+        if radarr_service and (scope is None or scope.includes("movie")):
             try:
-                logger.info("Fetching Tautulli watch history...")
-                tautulli_service = TautulliService()
-                movie_watch_map = tautulli_service.get_movie_watch_map()
-                logger.info(f"Tautulli movie watch map: {len(movie_watch_map)} movies")
-                
-                episode_watch_map = tautulli_service.get_episode_watch_map()
-                logger.info(f"Tautulli episode watch map: {len(episode_watch_map)} episodes")
-                
-                series_watch_map = tautulli_service.get_series_watch_map()
-                logger.info(f"Tautulli series watch map: {len(series_watch_map)} series")
-                
-                total_matched = len(movie_watch_map) + len(episode_watch_map) + len(series_watch_map)
-                logger.info(f"Tautulli: {len(movie_watch_map)} movies, {len(episode_watch_map)} episodes, {len(series_watch_map)} series (total: {total_matched})")
-                self._emit_progress("tautulli_fetched", 15, f"Tautulli: {len(movie_watch_map)} films, {len(episode_watch_map)} épisodes")
+                if scope is not None and scope.tmdb_ids:
+                    # Scan partiel par IDs: appels par film plutôt que toute la bibliothèque
+                    radarr_movies = await radarr_service.get_movies_by_tmdb_ids(scope.tmdb_ids)
+                else:
+                    radarr_movies = await radarr_service.get_movies()
+                if scope is not None:
+                    radarr_movies = [movie for movie in radarr_movies if scope.match_movie(movie)]
+                logger.info("radarr_fetched", movies=len(radarr_movies))
             except Exception as e:
-                logger.warning(f"Error fetching from Tautulli: {e}", exc_info=True)
-                self._emit_progress("tautulli_error", 15, f"Erreur Tautulli: {str(e)}")
+                logger.warning("radarr_fetch_failed", error=str(e), exc_info=True)
+                self._emit_progress("radarr_error", 10, f"Erreur Radarr: {str(e)}")
+        return {"radarr_movies": radarr_movies}
 
-        self._emit_progress("radarr_fetching", 20, "Récupération des données Radarr...")
-        radarr_movies_data = []
-        radarr_service = None
-        if config.radarr:
+    async def _fetch_sonarr(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        sonarr_service = self._service("sonarr")
+        sonarr_series = []
+        scope = self.scope
+        if sonarr_service and (scope is None or scope.includes("series")):
             try:
-                logger.info("Fetching Radarr movies...")
-                radarr_service = RadarrService()
-                radarr_movies_data = await radarr_service.get_movies()
-                logger.info(f"Radarr: {len(radarr_movies_data)} movies")
-                self._emit_progress("radarr_fetched", 25, f"Radarr: {len(radarr_movies_data)} films")
+                if scope is not None and scope.tvdb_ids and not scope.tmdb_ids:
+                    # Scan partiel par IDs TVDb: appels par série (Sonarr ne filtre pas par TMDb)
+                    sonarr_series = await sonarr_service.get_series_by_tvdb_ids(scope.tvdb_ids)
+                else:
+                    sonarr_series = await sonarr_service.get_series()
+                if scope is not None:
+                    sonarr_series = [series for series in sonarr_series if scope.match_series(series)]
+                logger.info("sonarr_fetched", series=len(sonarr_series))
             except Exception as e:
-                logger.warning(f"Error fetching from Radarr: {e}", exc_info=True)
-                self._emit_progress("radarr_error", 25, f"Erreur Radarr: {str(e)}")
+                logger.warning("sonarr_fetch_failed", error=str(e), exc_info=True)
+                self._emit_progress("sonarr_error", 10, f"Erreur Sonarr: {str(e)}")
+        return {"sonarr_series": sonarr_series}
 
-        self._emit_progress("sonarr_fetching", 30, "Récupération des données Sonarr...")
-        sonarr_series_data = []
-        sonarr_service = None
-        if config.sonarr:
+    def _fetch_episodes(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Épisodes de chaque série (une requête en masse en mode db_path, sinon un appel par série)."""
+        sonarr_service = self._service("sonarr")
+        episodes_by_series: Dict[int, List[Dict[str, Any]]] = {}
+        if not sonarr_service:
+            return {"episodes_by_series": episodes_by_series}
+        for series_data in inputs["sonarr_series"]:
+            series_id = series_data.get("id")
+            if not series_id:
+                continue
             try:
-                logger.info("Fetching Sonarr series...")
-                sonarr_service = SonarrService()
-                sonarr_series_data = await sonarr_service.get_series()
-                logger.info(f"Sonarr: {len(sonarr_series_data)} series")
-                self._emit_progress("sonarr_fetched", 35, f"Sonarr: {len(sonarr_series_data)} séries")
+                episodes_by_series[series_id] = sonarr_service.get_episodes_sync(series_id)
             except Exception as e:
-                logger.warning(f"Error fetching from Sonarr: {e}", exc_info=True)
-                self._emit_progress("sonarr_error", 35, f"Erreur Sonarr: {str(e)}")
+                # Continuer avec la série même si les épisodes échouent
+                logger.warning("sonarr_episodes_fetch_failed", series=series_data.get("title", ""), error=str(e), exc_info=True)
+        return {"episodes_by_series": episodes_by_series}
 
-        self._emit_progress("overseerr_fetching", 40, "Récupération des données Overseerr...")
+    async def _fetch_overseerr(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        overseerr_service = self._service("overseerr")
         overseerr_requests = []
-        overseerr_service = None
-        if config.overseerr:
+        if overseerr_service:
             try:
-                logger.info("Fetching Overseerr requests...")
-                overseerr_service = OverseerrService()
                 overseerr_requests = await overseerr_service.get_requests()
-                logger.info(f"Overseerr: {len(overseerr_requests)} requests")
-                self._emit_progress("overseerr_fetched", 45, f"Overseerr: {len(overseerr_requests)} requêtes")
+                logger.info("overseerr_fetched", requests=len(overseerr_requests))
             except Exception as e:
-                logger.warning(f"Error fetching from Overseerr: {e}")
-                self._emit_progress("overseerr_error", 45, f"Erreur Overseerr: {str(e)}")
+                logger.warning("overseerr_fetch_failed", error=str(e))
+                self._emit_progress("overseerr_error", 10, f"Erreur Overseerr: {str(e)}")
+        return {"overseerr_requests": overseerr_requests}
 
-        self._emit_progress("qbittorrent_fetching", 50, "Récupération des données qBittorrent...")
+    def _fetch_qbittorrent(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        qb_service = self._service("qbittorrent")
         qb_torrents = []
-        qb_service = None
-        if config.qbittorrent:
+        if qb_service:
             try:
-                logger.info("Fetching qBittorrent torrents...")
-                qb_service = QBittorrentService()
                 qb_torrents = qb_service.get_torrents()
-                logger.info(f"qBittorrent: {len(qb_torrents)} torrents")
-                self._emit_progress("qbittorrent_fetched", 55, f"qBittorrent: {len(qb_torrents)} torrents")
+                logger.info("qbittorrent_fetched", torrents=len(qb_torrents))
             except Exception as e:
-                logger.warning(f"Error fetching from qBittorrent: {e}")
-                self._emit_progress("qbittorrent_error", 55, f"Erreur qBittorrent: {str(e)}")
+                logger.warning("qbittorrent_fetch_failed", error=str(e))
+                self._emit_progress("qbittorrent_error", 10, f"Erreur qBittorrent: {str(e)}")
+        return {"qb_torrents": qb_torrents}
+
+    # --- Construction des MediaItem ------------------------------------------------------------
+
+    def _build_items(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Conversion Radarr/Sonarr en MediaItem avec enrichissement Tautulli."""
+        tautulli_available = inputs["tautulli_available"]
+        movie_watch_map = inputs["movie_watch_map"]
+        series_watch_map = inputs["series_watch_map"]
+        episode_watch_map = inputs["episode_watch_map"]
 
-        # Conversion Radarr/Sonarr en MediaItem avec enrichissement Tautulli
-        logger.info("Converting Radarr/Sonarr data to MediaItems...")
         radarr_items = []
+        radarr_service = self._service("radarr") if inputs["radarr_movies"] else None
         if radarr_service:
-            for movie_data in radarr_movies_data:
+            for movie_data in inputs["radarr_movies"]:
                 item = MediaItem(
                     type="movie",
                     title=movie_data.get("title", ""),
@@ -155,42 +533,16 @@ class Planner:
                     tmdb_id=movie_data.get("tmdbId"),
                 )
                 radarr_service.enrich_media_item(item, movie_data)
-                
-                # Enrichir avec Tautulli watch history
-                if tautulli_service and item.tmdb_id:
-                    watch_stats = movie_watch_map.get(item.tmdb_id)
-                    if watch_stats:
-                        item.last_viewed_at = watch_stats.get("last_watched_at")
-                        item.view_count = watch_stats.get("view_count", 0)
-                        # Si on a des données avec last_watched_at ou view_count > 0, alors jamais vu = False
-                        if item.last_viewed_at or item.view_count > 0:
-                            item.never_watched = False
-                        else:
-                            item.never_watched = watch_stats.get("never_watched", True)
-                        item.metadata["watch_source"] = "Tautulli"
-                        item.metadata["last_watched_user"] = watch_stats.get("last_user")
-                        logger.debug("movie_enriched_tautulli",
-                                   title=item.title,
-                                   tmdb_id=item.tmdb_id,
-                                   view_count=item.view_count,
-                                   last_watched=item.last_viewed_at.isoformat() if item.last_viewed_at else None)
-                    else:
-                        # Pas de données Tautulli = jamais vu
-                        item.never_watched = True
-                        item.view_count = 0
-                        item.metadata["watch_source"] = "Tautulli (never watched)"
-                        logger.debug("movie_no_tautulli_data",
-                                   title=item.title,
-                                   tmdb_id=item.tmdb_id)
-                
+                if tautulli_available and item.tmdb_id:
+                    _apply_watch_stats(item, movie_watch_map.get(item.tmdb_id))
                 radarr_items.append(item)
-        logger.info(f"Converted {len(radarr_items)} Radarr movies to MediaItems")
+        logger.info("radarr_items_built", movies=len(radarr_items))
 
         sonarr_items = []
         episode_items = []
+        sonarr_service = self._service("sonarr") if inputs["sonarr_series"] else None
         if sonarr_service:
-            logger.info("Processing Sonarr series and episodes...")
-            for series_data in sonarr_series_data:
+            for series_data in inputs["sonarr_series"]:
                 series_item = MediaItem(
                     type="series",
                     title=series_data.get("title", ""),
@@ -199,258 +551,435 @@ class Planner:
                     tmdb_id=series_data.get("tmdbId"),
                 )
                 sonarr_service.enrich_media_item(series_item, series_data)
-                
-                # Enrichir avec Tautulli watch history (série entière)
-                if tautulli_service and series_item.tvdb_id:
-                    watch_stats = series_watch_map.get(series_item.tvdb_id)
-                    if watch_stats:
-                        series_item.last_viewed_at = watch_stats.get("last_watched_at")
-                        series_item.view_count = watch_stats.get("view_count", 0)
-                        if series_item.last_viewed_at or series_item.view_count > 0:
-                            series_item.never_watched = False
-                        else:
-                            series_item.never_watched = watch_stats.get("never_watched", True)
-                        series_item.metadata["watch_source"] = "Tautulli"
-                        series_item.metadata["last_watched_user"] = watch_stats.get("last_user")
-                
+                # Série entière: pas de marquage "jamais vu" sans données
+                if tautulli_available and series_item.tvdb_id:
+                    _apply_watch_stats(series_item, series_watch_map.get(series_item.tvdb_id), mark_unwatched=False)
                 sonarr_items.append(series_item)
-                
-                # Récupérer les épisodes de cette série pour traitement individuel
+
                 series_id = series_data.get("id")
-                if series_id:
-                    try:
-                        episodes_data = sonarr_service.get_episodes_sync(series_id)
-                        logger.debug(f"Retrieved {len(episodes_data)} episodes for series '{series_item.title}'")
-                        
-                        for episode_data in episodes_data:
-                            # Créer un MediaItem pour chaque épisode
-                            episode_item = MediaItem(
-                                type="episode",
-                                title=f"{series_item.title} - S{episode_data.get('seasonNumber', 0):02d}E{episode_data.get('episodeNumber', 0):02d}",
-                                year=series_item.year,
-                                tvdb_id=series_item.tvdb_id,  # TVDb ID de la série
-                                tmdb_id=series_item.tmdb_id,
+                for episode_data in inputs["episodes_by_series"].get(series_id, []):
+                    episode_item = MediaItem(
+                        type="episode",
+                        title=f"{series_item.title} - S{episode_data.get('seasonNumber', 0):02d}E{episode_data.get('episodeNumber', 0):02d}",
+                        year=series_item.year,
+                        tvdb_id=series_item.tvdb_id,  # TVDb ID de la série
+                        tmdb_id=series_item.tmdb_id,
+                    )
+
+                    # Enrichir avec les données Sonarr de l'épisode
+                    episode_item.sonarr_path = episode_data.get("path")
+                    episode_item.monitored = episode_data.get("monitored", True)
+                    episode_item.metadata["sonarr_id"] = series_id
+                    episode_item.metadata["sonarr_episode_id"] = episode_data.get("id")
+                    episode_item.metadata["sonarr_title"] = series_item.title
+                    episode_item.metadata["series_title"] = series_item.title
+                    episode_item.metadata["season_number"] = episode_data.get("seasonNumber")
+                    episode_item.metadata["episode_number"] = episode_data.get("episodeNumber")
+                    episode_item.metadata["episode_title"] = episode_data.get("title", "")
+                    episode_item.metadata["sonarr_added"] = episode_data.get("added")
+
+                    # Taille de l'épisode
+                    if episode_data.get("episodeFile"):
+                        episode_file = episode_data.get("episodeFile", {})
+                        episode_item.size_bytes = episode_file.get("size", 0)
+                        # Fichier de l'épisode: un season pack ne lui est associé que s'il le contient
+                        episode_item.metadata["episode_file_path"] = episode_file.get("path") or episode_file.get("relativePath")
+
+                    # Enrichir avec Tautulli watch history (épisode individuel)
+                    if tautulli_available and episode_item.tvdb_id:
+                        season_num = episode_data.get("seasonNumber")
+                        episode_num = episode_data.get("episodeNumber")
+                        if season_num is not None and episode_num is not None:
+                            _apply_watch_stats(
+                                episode_item,
+                                episode_watch_map.get((episode_item.tvdb_id, int(season_num), int(episode_num))),
                             )
-                            
-                            # Enrichir avec les données Sonarr de l'épisode
-                            episode_item.sonarr_path = episode_data.get("path")
-                            episode_item.monitored = episode_data.get("monitored", True)
-                            episode_item.metadata["sonarr_id"] = series_id
-                            episode_item.metadata["sonarr_episode_id"] = episode_data.get("id")
-                            episode_item.metadata["sonarr_title"] = series_item.title
-                            episode_item.metadata["series_title"] = series_item.title
-                            episode_item.metadata["season_number"] = episode_data.get("seasonNumber")
-                            episode_item.metadata["episode_number"] = episode_data.get("episodeNumber")
-                            episode_item.metadata["episode_title"] = episode_data.get("title", "")
-                            episode_item.metadata["sonarr_added"] = episode_data.get("added")
-                            
-                            # Taille de l'épisode
-                            if episode_data.get("episodeFile"):
-                                episode_file = episode_data.get("episodeFile", {})
-                                episode_item.size_bytes = episode_file.get("size", 0)
-                            
-                            # Enrichir avec Tautulli watch history (épisode individuel)
-                            if tautulli_service and episode_item.tvdb_id:
-                                season_num = episode_data.get("seasonNumber")
-                                episode_num = episode_data.get("episodeNumber")
-                                if season_num is not None and episode_num is not None:
-                                    watch_stats = episode_watch_map.get((episode_item.tvdb_id, int(season_num), int(episode_num)))
-                                    if watch_stats:
-                                        episode_item.last_viewed_at = watch_stats.get("last_watched_at")
-                                        episode_item.view_count = watch_stats.get("view_count", 0)
-                                        if episode_item.last_viewed_at or episode_item.view_count > 0:
-                                            episode_item.never_watched = False
-                                        else:
-                                            episode_item.never_watched = watch_stats.get("never_watched", True)
-                                        episode_item.metadata["watch_source"] = "Tautulli"
-                                        episode_item.metadata["last_watched_user"] = watch_stats.get("last_user")
-                                    else:
-                                        # Pas de données Tautulli = jamais vu
-                                        episode_item.never_watched = True
-                                        episode_item.view_count = 0
-                                        episode_item.metadata["watch_source"] = "Tautulli (never watched)"
-                            
-                            episode_items.append(episode_item)
-                    except Exception as e:
-                        logger.warning(f"Error fetching episodes for series '{series_item.title}': {e}", exc_info=True)
-                        # Continuer avec la série même si les épisodes échouent
-        
-        logger.info(f"Converted {len(sonarr_items)} Sonarr series and {len(episode_items)} episodes to MediaItems")
-
-        # Unification des médias (plus besoin de Plex)
-        self._emit_progress("matching_started", 60, "Matching et unification des médias...")
-        logger.info("Matching and unifying media items across services...")
-        unified_items = self.matcher.unify_media_items(
-            [],  # Plus de Plex items
-            radarr_items,
-            sonarr_items,
-            [],
-            qb_torrents,
-            qb_service
-        )
-        
-        # Ajouter les épisodes individuels (pas unifiés, traités séparément)
-        unified_items.extend(episode_items)
-        logger.info(f"Unified {len(unified_items)} media items")
-        self._emit_progress("matching_completed", 70, f"Unification terminée: {len(unified_items)} items")
-        
-        # Enrichir les épisodes avec qBittorrent aussi
-        if qb_service and episode_items:
-            logger.info(f"Enriching {len(episode_items)} episodes with qBittorrent data...")
-            torrent_by_hash = {t["hash"]: t for t in qb_torrents if t.get("hash")}
-            episode_matched_count = 0
-            for idx, episode in enumerate(episode_items):
-                primary_path = episode.get_primary_path()
-                if primary_path:
-                    qb_hashes = qb_service.find_torrents_for_path(primary_path, qb_torrents, media_title=episode.title)
-                    if qb_hashes:
-                        episode_matched_count += 1
-                        if idx < 5:  # Log first 5 matches
-                            logger.info(f"  ✓ Matched {len(qb_hashes)} torrent(s) for episode '{episode.title}'")
-                        episode.qb_hashes.extend(qb_hashes)
-                        # Stocker les noms des torrents dans metadata
-                        torrent_names = []
-                        for hash_val in qb_hashes:
-                            torrent = torrent_by_hash.get(hash_val)
-                            if torrent:
-                                torrent_names.append({
-                                    "hash": hash_val,
-                                    "name": torrent.get("name", ""),
-                                })
-                        if torrent_names:
-                            episode.metadata["qb_torrents"] = torrent_names
-                    elif idx < 3:  # Log first 3 non-matches
-                        logger.debug(f"  ✗ No torrents matched for episode '{episode.title}' (path: {primary_path[:60]}...)")
-            logger.info(f"Episode qBittorrent enrichment completed: {episode_matched_count}/{len(episode_items)} episodes have torrents")
-
-        # Enrichir avec Overseerr requests
-        if overseerr_service:
-            logger.info("Enriching with Overseerr requests...")
-            for item in unified_items:
-                overseerr_service.enrich_media_item(item, overseerr_requests)
-            logger.info("Overseerr enrichment completed")
-
-        # Évaluation des règles et garde-fous
-        self._emit_progress("rules_evaluating", 75, "Évaluation des règles et garde-fous...")
-        logger.info("Evaluating rules and safety checks...")
-        candidates = []
-        max_items = config.app.max_items_per_scan if config.app else None
-        
-        # Séparer les items par type pour traitement spécial
-        series_items = [item for item in unified_items if item.type == "series"]
-        episode_items_list = [item for item in unified_items if item.type == "episode"]
-        
-        # Pour les séries, on ne les inclut que si elles n'ont PAS d'épisodes candidats
+
+                    episode_items.append(episode_item)
+
+        logger.info("sonarr_items_built", series=len(sonarr_items), episodes=len(episode_items))
+
+        if self.scope is not None:
+            # Séries et épisodes gardés jusqu'au matching (torrents partagés entre saisons), filtrés après
+            radarr_items = [item for item in radarr_items if self.scope.match_item(item)]
+        return {"radarr_items": radarr_items, "sonarr_items": sonarr_items, "episode_items": episode_items}
+
+    # --- Matching ---------------------------------------------------------------------------
+
+    def _match(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Unification des médias et rattachement des torrents qBittorrent."""
+        qb_torrents = inputs["qb_torrents"]
+        sonarr_items = inputs["sonarr_items"]
+        episode_items = inputs["episode_items"]
+        qb_service = self._service("qbittorrent")
+
+        # Explications de matching du scan (consultables via /api/scan/{scan_id}/matches)
+        if qb_service:
+            self._explanations = match_explanation_store.start_scan(self.run_id)
+            qb_service.explanations = self._explanations
+
+        db = get_db_sync()
+        try:
+            # Cache persistant des matchs média ↔ torrent (seuls les nouveaux/modifiés sont recalculés)
+            if qb_service and qb_torrents and self.config.qbittorrent.match_cache:
+                try:
+                    qb_service.match_cache = TorrentMatchCache.load(db, qb_torrents, qb_service.match_mode)
+                except Exception as e:
+                    logger.warning("torrent_match_cache_load_failed", error=str(e), exc_info=True)
+
+            logger.info("media_matching_started")
+            unified_items = self.matcher.unify_media_items(
+                [],  # Plus de Plex items
+                inputs["radarr_items"],
+                sonarr_items,
+                [],
+                qb_torrents,
+                qb_service
+            )
+
+            # Ajouter les épisodes individuels (pas unifiés, traités séparément)
+            unified_items.extend(episode_items)
+            logger.info("media_items_unified", items=len(unified_items))
+
+            # Enrichir les épisodes avec qBittorrent aussi (matching hiérarchique par série)
+            if qb_service and episode_items:
+                self._match_episode_torrents(qb_service, qb_torrents, sonarr_items, episode_items)
+
+            if qb_service:
+                # Avant le filtre du périmètre: les épisodes hors périmètre des séries collectées comptent
+                _mark_shared_torrents(unified_items, partial=self.scope is not None, match_cache=qb_service.match_cache)
+
+            # Scan partiel: le cache ne couvre pas toute la bibliothèque, il n'est pas réécrit
+            if qb_service and qb_service.match_cache is not None and self.scope is None:
+                try:
+                    qb_service.match_cache.save(db)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning("torrent_match_cache_save_failed", error=str(e), exc_info=True)
+        finally:
+            db.close()
+
+        if self.scope is not None:
+            # Racine de chemin plus profonde qu'une série (dossier de saison): seuls ses épisodes restent;
+            # les épisodes des autres saisons ne servaient qu'au décompte des torrents partagés
+            unified_items = [item for item in unified_items if self.scope.match_item(item)]
+            logger.info("scan_scope_applied", items=len(unified_items), scope=self.scope.to_dict())
+        return {"unified_items": unified_items}
+
+    def _match_episode_torrents(
+        self,
+        qb_service: QBittorrentService,
+        qb_torrents: List[Dict[str, Any]],
+        sonarr_items: List[MediaItem],
+        episode_items: List[MediaItem],
+    ) -> None:
+        logger.info("episode_torrent_matching_started", episodes=len(episode_items))
+        torrent_by_hash = {t["hash"]: t for t in qb_torrents if t.get("hash")}
+        # Torrents candidats de chaque série, résolus une seule fois depuis son sonarr_path:
+        # un épisode ne peut appartenir qu'à un torrent de sa série (season pack ou épisode seul)
+        series_torrents: Dict[Any, List[Dict[str, Any]]] = {}
+        for series_item in sonarr_items:
+            sonarr_id = series_item.metadata.get("sonarr_id")
+            if sonarr_id is not None and series_item.qb_hashes:
+                series_torrents[sonarr_id] = [
+                    torrent_by_hash[h] for h in series_item.qb_hashes if h in torrent_by_hash
+                ]
+        episode_matched_count = 0
+        for idx, episode in enumerate(episode_items):
+            candidates = series_torrents.get(episode.metadata.get("sonarr_id"))
+            if not candidates:
+                continue
+            qb_hashes = qb_service.find_torrents_for_episode(
+                episode.get_primary_path() or episode.metadata.get("episode_file_path"),
+                episode.metadata.get("season_number"),
+                episode.metadata.get("episode_number"),
+                candidates,
+                media_title=episode.title
+            )
+            if qb_hashes:
+                episode_matched_count += 1
+                if idx < 5:  # Log first 5 matches
+                    logger.info("episode_torrents_matched", episode=episode.title, torrents=len(qb_hashes))
+                episode.qb_hashes += intern_strings(qb_hashes)
+                # Stocker les noms des torrents dans metadata
+                torrent_names = []
+                for hash_val in qb_hashes:
+                    torrent = torrent_by_hash.get(hash_val)
+                    if torrent:
+                        torrent_names.append({
+                            "hash": hash_val,
+                            "name": torrent.get("name", ""),
+                        })
+                if torrent_names:
+                    episode.metadata["qb_torrents"] = torrent_names
+        logger.info("episode_torrent_matching_done", matched=episode_matched_count, episodes=len(episode_items),
+                    series_with_torrents=len(series_torrents))
+
+    # --- Enrichissement et évaluation ---------------------------------------------------------------
+
+    def _request_index(self, overseerr_requests: List[Dict[str, Any]]) -> Optional[OverseerrRequestIndex]:
+        """Index des demandes Overseerr (construit une fois par scan), None si Overseerr n'est pas configuré."""
+        if not self._service("overseerr"):
+            return None
+        return OverseerrRequestIndex(overseerr_requests)
+
+    def _enrich_items(self, items: List[MediaItem], request_index: OverseerrRequestIndex) -> None:
+        """Reporte les demandes Overseerr sur les items (les épisodes héritent de leur série)."""
+        overseerr_service = self._service("overseerr")
+        series_by_sonarr_id = {}
+        episodes = []
+        for item in items:
+            if item.type == "episode":
+                episodes.append(item)
+                continue
+            overseerr_service.enrich_media_item(item, request_index)
+            if item.type == "series" and item.metadata.get("sonarr_id") is not None:
+                series_by_sonarr_id[item.metadata["sonarr_id"]] = item
+        # Les épisodes héritent de l'état de leur série (mêmes IDs TVDb/TMDb)
+        for episode in episodes:
+            series_item = series_by_sonarr_id.get(episode.metadata.get("sonarr_id"))
+            if series_item is not None:
+                overseerr_service.inherit_request_state(episode, series_item)
+            else:
+                overseerr_service.enrich_media_item(episode, request_index)
+
+    def _enrich(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Enrichir avec Overseerr requests."""
+        items = inputs["unified_items"]
+        request_index = self._request_index(inputs["overseerr_requests"])
+        if request_index is not None:
+            logger.info("overseerr_enrichment_started")
+            self._enrich_items(items, request_index)
+            logger.info("overseerr_enrichment_done", indexed_requests=len(request_index))
+        return {"enriched_items": items}
+
+    def _start_evaluation(self, unified_items: List[MediaItem], watch_index: Optional[UserWatchIndex], db) -> _Evaluation:
+        """Prépare l'évaluation d'un scan: garde-fous, séries avec épisodes, verdicts du scan précédent."""
+        self.safety_checker.watch_index = watch_index
+        # Protections DB rechargées une fois par scan (en plus des invalidations de /api/protect)
+        invalidate_protection_index()
+        get_protection_index()
+
+        # Pour les séries, on ne les inclut que si elles n'ont PAS d'épisodes
         # (car on préfère supprimer les épisodes individuellement)
-        series_with_episodes = set()
-        for episode in episode_items_list:
-            # Trouver la série parente de cet épisode
-            episode_tvdb_id = episode.tvdb_id
-            if episode_tvdb_id:
-                for series in series_items:
-                    if series.tvdb_id == episode_tvdb_id:
-                        series_with_episodes.add(series.tvdb_id)
-                        break
-        
-        logger.info(f"Found {len(episode_items_list)} episodes, {len(series_items)} series, {len(series_with_episodes)} series with episodes")
-        
-        for item in unified_items:
-            # Limite max_items_per_scan si configuré
-            if max_items and len(candidates) >= max_items:
-                logger.info(f"Reached max_items_per_scan limit: {max_items}")
-                break
-            
+        series_ids = {item.tvdb_id for item in unified_items if item.type == "series" and item.tvdb_id}
+        episode_series_ids = {item.tvdb_id for item in unified_items if item.type == "episode" and item.tvdb_id}
+        series_with_episodes = series_ids & episode_series_ids
+        episodes_count = sum(1 for item in unified_items if item.type == "episode")
+        series_count = sum(1 for item in unified_items if item.type == "series")
+        logger.info("evaluation_started", episodes=episodes_count, series=series_count,
+                    series_with_episodes=len(series_with_episodes))
+
+        verdicts = None
+        if self.config.app.incremental_scan:
+            try:
+                context_hash = evaluation_context_hash(self.config, watch_index is not None)
+                verdicts = VerdictCache.load(db, context_hash, rule_thresholds(self.config))
+            except Exception as e:
+                logger.warning("scan_verdicts_load_failed", error=str(e), exc_info=True)
+
+        max_items = self.config.app.max_items_per_scan if self.config.app else None
+        evaluator = ParallelEvaluator(self.config.app.evaluation_workers, watch_index)
+        return _Evaluation(watch_index, series_with_episodes, verdicts, max_items, evaluator)
+
+    def _evaluate_items(self, evaluation: _Evaluation, items: List[MediaItem]) -> List[Tuple[MediaItem, str]]:
+        """Candidats parmi `items` (règles en bloc, puis garde-fous pour les candidats)."""
+        verdicts = evaluation.verdicts
+        candidates = []
+
+        # Séries avec épisodes écartées, verdicts reportés (mode incrémental) pour les inchangés
+        evaluated_items = []
+        for item in items:
             # Pour les séries, exclure celles qui ont des épisodes candidats
-            if item.type == "series" and item.tvdb_id and item.tvdb_id in series_with_episodes:
-                logger.debug("skipping_series_with_episodes", 
+            if item.type == "series" and item.tvdb_id and item.tvdb_id in evaluation.series_with_episodes:
+                logger.debug("skipping_series_with_episodes",
                            title=item.title,
                            tvdb_id=item.tvdb_id)
                 continue
-                
-            # Évaluer règle
-            is_candidate, rule = self.rules_engine.evaluate(item)
+            key = fingerprint = verdict = None
+            if verdicts is not None:
+                key, fingerprint, verdict = verdicts.get(item)
+            evaluated_items.append((item, key, fingerprint, verdict))
+
+        # Règles et garde-fous évalués en bloc pour les items à réévaluer (pool de workers si configuré)
+        pending = [item for item, _, _, verdict in evaluated_items if verdict is None]
+        new_verdicts = iter(evaluation.evaluator.evaluate(self.rules_engine, self.safety_checker, pending))
+
+        for item, key, fingerprint, verdict in evaluated_items:
+            # Limite max_items_per_scan si configuré
+            if evaluation.max_items and evaluation.candidates_count >= evaluation.max_items:
+                logger.info("max_items_per_scan_reached", max_items=evaluation.max_items)
+                evaluation.limit_reached = True
+                break
+
+            if verdict is None:
+                verdict = next(new_verdicts)
+                if verdicts is not None:
+                    verdicts.record(item, key, fingerprint, verdict)
+
+            is_candidate, rule, protected_reason = verdict
             if not is_candidate:
                 continue
-
-            # Vérifier garde-fous
-            is_protected, protected_reason = self.safety_checker.is_protected(item)
-            if is_protected:
+            if protected_reason:
                 # Stocker la raison de protection pour affichage
                 item.metadata["protected_reason"] = protected_reason
                 continue
-
             candidates.append((item, rule))
-        logger.info(f"Found {len(candidates)} candidates for deletion (excluding series with episodes)")
-        self._emit_progress("rules_evaluated", 80, f"Évaluation terminée: {len(candidates)} candidats")
-
-        # Créer Plan en DB
-        self._emit_progress("plan_creating", 85, "Création du plan en base de données...")
-        logger.info("Creating plan in database...")
-        movies_count = sum(1 for item, _ in candidates if item.type == "movie")
-        series_count = sum(1 for item, _ in candidates if item.type == "series")
-        episodes_count = sum(1 for item, _ in candidates if item.type == "episode")
-        total_size = sum(item.size_bytes for item, _ in candidates)
-        
-        plan = Plan(
-            status="DRAFT",
-            summary_json={
-                "movies_count": movies_count,
-                "series_count": series_count,
-                "episodes_count": episodes_count,
-                "total_size_bytes": total_size,
-            }
-        )
-        db.add(plan)
-        db.commit()
-        db.refresh(plan)
-        logger.info(f"Plan {plan.id} created: {movies_count} movies, {series_count} series, {episodes_count} episodes, {total_size / 1024 / 1024 / 1024:.2f} GB")
+            evaluation.candidates_count += 1
+        return candidates
 
-        # Créer PlanItems
-        logger.info("Creating plan items...")
+    def _finish_evaluation(self, evaluation: _Evaluation, db) -> Dict[str, Any]:
+        """Sauvegarde les verdicts (mode incrémental) et retourne les statistiques d'évaluation."""
+        verdicts = evaluation.verdicts
+        evaluation_stats = {"incremental": verdicts is not None}
+        if verdicts is not None:
+            evaluation_stats.update({"carried_forward": verdicts.carried, "evaluated": verdicts.evaluated})
+            try:
+                verdicts.save(db, partial=self.scope is not None)
+            except Exception as e:
+                db.rollback()
+                logger.warning("scan_verdicts_save_failed", error=str(e), exc_info=True)
+        self.evaluation_stats = evaluation_stats
+        return evaluation_stats
+
+    def _evaluate(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Évaluation des règles et garde-fous (verdicts inchangés reportés en mode incrémental)."""
+        unified_items = inputs["enriched_items"]
+        db = get_db_sync()
+        evaluation = None
+        try:
+            evaluation = self._start_evaluation(unified_items, inputs["user_watch_index"], db)
+            candidates = self._evaluate_items(evaluation, unified_items)
+            evaluation_stats = self._finish_evaluation(evaluation, db)
+        finally:
+            if evaluation is not None:
+                evaluation.evaluator.close()
+            db.close()
+
+        logger.info("candidates_found", candidates=len(candidates), **evaluation_stats)
+        return {"candidates": candidates, "evaluation_stats": evaluation_stats}
+
+    # --- Persistance --------------------------------------------------------------------------
+
+    def _write_plan_items(
+        self,
+        db,
+        plan_id: int,
+        candidates: List[Tuple[MediaItem, str]],
+        report_progress: bool = True,
+    ) -> int:
+        """Insère les PlanItems des candidats (sans commit). Retourne le nombre de lignes écrites."""
         invalid_types = []
+        rows = []
         for item, rule in candidates:
             # Validation du type
             if item.type not in ["movie", "series", "episode"]:
                 invalid_types.append(f"{item.title} (type: {item.type})")
-                logger.warning(f"Invalid media type '{item.type}' for item '{item.title}', skipping")
+                logger.warning("plan_item_invalid_type", media_type=item.type, title=item.title)
                 continue
-            
-            plan_item = PlanItem(
-                plan_id=plan.id,
-                selected=True,  # Par défaut sélectionné
-                media_type=item.type,  # Validé ci-dessus
-                title=item.title,
-                year=item.year,
-                ids_json={
-                    "tmdb": item.tmdb_id,
-                    "tvdb": item.tvdb_id,
-                    "imdb": item.imdb_id,
-                },
-                path=item.get_primary_path() or "",
-                size_bytes=item.size_bytes,
-                last_viewed_at=item.last_viewed_at,
-                view_count=item.view_count,
-                never_watched=item.never_watched,
-                rule=rule,
-                protected_reason=None,  # Items protégés ne sont pas dans candidates
-                qb_hashes_json=item.qb_hashes,
-                meta_json={
-                    "plex_rating_key": item.plex_rating_key,
-                    "overseerr_request_id": item.overseerr_request_id,
-                    "overseerr_status": item.overseerr_status,
-                    "overseerr_requested_by": item.overseerr_requested_by,
-                    "tags": item.tags,
-                    "monitored": item.monitored,
-                    **item.metadata,
-                },
-            )
-            db.add(plan_item)
-        
+            rows.append(_plan_item_row(plan_id, item, rule))
+
         if invalid_types:
-            logger.error(f"Found {len(invalid_types)} items with invalid types: {', '.join(invalid_types[:5])}")
+            logger.error("plan_items_invalid_types", count=len(invalid_types), examples=invalid_types[:5])
 
-        db.commit()
-        logger.info(f"Plan {plan.id} completed with {len(candidates)} items")
-        self._emit_progress("plan_created", 100, f"Plan {plan.id} créé avec succès", {"plan_id": plan.id})
-        return plan.id
+        # Insertions groupées (executemany) par paquets, progression émise par paquet
+        start_progress = self._stage_progress.get("persist", 5)
+        for offset in range(0, len(rows), PLAN_ITEMS_CHUNK_SIZE):
+            chunk = rows[offset:offset + PLAN_ITEMS_CHUNK_SIZE]
+            db.execute(insert(PlanItem.__table__), chunk)
+            written = offset + len(chunk)
+            if report_progress:
+                self._emit_progress(
+                    "plan_items_writing",
+                    start_progress + int((95 - start_progress) * written / len(rows)),
+                    f"Enregistrement du plan: {written}/{len(rows)} items",
+                )
+        return len(rows)
+
+    def _persist(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Créer le Plan et ses PlanItems en DB."""
+        candidates = inputs["candidates"]
+        summary = MediaItemStore.from_items(item for item, _ in candidates).summary()
+
+        db = get_db_sync()
+        try:
+            plan = Plan(status="DRAFT", summary_json={**summary, "evaluation": inputs["evaluation_stats"],
+                                                      "scope": self.scope.to_dict() if self.scope else None})
+            db.add(plan)
+            db.flush()  # plan.id, sans commit: plan et items dans la même transaction
+            logger.info("plan_created", plan_id=plan.id, **summary)
+
+            written = self._write_plan_items(db, plan.id, candidates)
+            db.commit()
+            if self._explanations is not None:
+                self._explanations.plan_id = plan.id
+            logger.info("plan_items_written", plan_id=plan.id, items=written)
+            return {"plan_id": plan.id}
+        finally:
+            db.close()
+
+    # --- Mode streaming -----------------------------------------------------------------------
+
+    def _process_chunks(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Enrichissement → évaluation → persistance par paquets (app.scan_chunk_size).
+
+        Les items sont regroupés par série (série + épisodes dans le même paquet, pour l'héritage
+        des demandes Overseerr), puis chaque paquet est enrichi, évalué et écrit avant le suivant:
+        les candidats, colonnes et lignes du plan ne sont jamais matérialisés pour toute la bibliothèque.
+        Les MediaItem eux-mêmes restent tous en mémoire (sortie de l'étape match).
+        """
+        items = inputs["unified_items"]
+        chunks = _library_chunks(items, self.config.app.scan_chunk_size)
+        request_index = self._request_index(inputs["overseerr_requests"])
+        start_progress = self._stage_progress.get("process_chunks", 5)
+        summary = {"movies_count": 0, "series_count": 0, "episodes_count": 0, "total_size_bytes": 0}
+        logger.info("chunked_plan_generation_started", items=len(items), chunks=len(chunks))
+
+        db = get_db_sync()
+        evaluation = None
+        try:
+            evaluation = self._start_evaluation(items, inputs["user_watch_index"], db)
+            # Plan BUILDING (ni listé, ni modifiable, ni applicable) tant que tous les paquets ne sont
+            # pas écrits; commit par paquet: la transaction (et le journal SQLite) reste bornée à un paquet
+            plan = Plan(status="BUILDING", summary_json={})
+            db.add(plan)
+            db.commit()
+            try:
+                written = 0
+                for number, chunk in enumerate(chunks, 1):
+                    if request_index is not None:
+                        self._enrich_items(chunk, request_index)
+                    candidates = self._evaluate_items(evaluation, chunk)
+                    written += self._write_plan_items(db, plan.id, candidates, report_progress=False)
+                    db.commit()
+                    for key, value in MediaItemStore.from_items(item for item, _ in candidates).summary().items():
+                        summary[key] += value
+                    self._emit_progress(
+                        "chunks_processing",
+                        start_progress + int((95 - start_progress) * number / len(chunks)),
+                        f"Paquet {number}/{len(chunks)}: {written} items dans le plan",
+                    )
+                    if evaluation.limit_reached:
+                        break
+            except Exception:
+                # Pas de plan partiel: items déjà écrits supprimés avec le plan
+                db.rollback()
+                db.query(PlanItem).filter(PlanItem.plan_id == plan.id).delete(synchronize_session=False)
+                db.delete(plan)
+                db.commit()
+                raise
+
+            evaluation_stats = self._finish_evaluation(evaluation, db)
+            plan.status = "DRAFT"
+            plan.summary_json = {**summary, "evaluation": evaluation_stats, "chunks": len(chunks),
+                                 "scope": self.scope.to_dict() if self.scope else None}
+            db.commit()
+            if self._explanations is not None:
+                self._explanations.plan_id = plan.id
+            logger.info("plan_created", plan_id=plan.id, chunks=len(chunks), **summary, **evaluation_stats)
+            return {"plan_id": plan.id}
+        finally:
+            if evaluation is not None:
+                evaluation.evaluator.close()
+            db.close()
 
@@ -0,0 +1,126 @@
+"""Index compilé des protections persistées (table protections).
+
+Les protections sont chargées une seule fois (puis après chaque écriture via /api/protect)
+dans des ensembles d'IDs et un index de préfixes de chemins (PathPrefixMatcher): chaque vérification est une
+poignée de lookups de dictionnaire au lieu d'une requête et d'un parcours de toute la table.
+
+Les chemins protégés sont saisis librement (/api/protect): comme avant l'index, un chemin
+protège aussi tout média dont le chemin le contient (nom de dossier, autre racine de montage).
+Ce repli passe par une seule expression régulière; la table n'est parcourue que pour les
+médias effectivement protégés.
+"""
+import hashlib
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+from app.core.models import MediaItem
+from app.core.path_matcher import PathPrefixMatcher
+from app.db.database import get_db_sync
+from app.db.models import Protection
+
+logger = structlog.get_logger(__name__)
+
+# (id de la protection, raison affichée); la protection la plus ancienne l'emporte
+_Match = Tuple[int, str]
+
+
+def _reason(protection: Protection) -> str:
+    return f"Protected in DB: {protection.reason or 'Manual protection'}"
+
+
+class ProtectionIndex:
+    """Protections indexées par ID externe et par préfixe de chemin."""
+
+    def __init__(self, protections: Iterable[Protection]):
+        self._tmdb: Dict[int, _Match] = {}
+        self._tvdb: Dict[int, _Match] = {}
+        self._imdb: Dict[str, _Match] = {}
+        self._paths: PathPrefixMatcher[_Match] = PathPrefixMatcher()
+        self._substrings: Dict[str, _Match] = {}
+        rows = []
+        for protection in sorted(protections, key=lambda p: p.id):
+            match = (protection.id, _reason(protection))
+            if protection.tmdb_id:
+                self._tmdb.setdefault(protection.tmdb_id, match)
+            if protection.tvdb_id:
+                self._tvdb.setdefault(protection.tvdb_id, match)
+            if protection.imdb_id:
+                self._imdb.setdefault(protection.imdb_id, match)
+            if protection.path:
+                self._paths.add(protection.path, match, priority=protection.id)
+                self._substrings.setdefault(protection.path, match)
+            rows.append((protection.id, protection.tmdb_id, protection.tvdb_id, protection.imdb_id,
+                         protection.path, protection.reason))
+        self._substring_re = re.compile("|".join(map(re.escape, self._substrings))) if self._substrings else None
+        self.size = len(rows)
+        # Empreinte du contenu (contexte d'évaluation des scans incrémentaux)
+        self.digest = hashlib.sha1(repr(rows).encode("utf-8", "surrogatepass")).hexdigest()
+
+    @classmethod
+    def load(cls) -> "ProtectionIndex":
+        db = get_db_sync()
+        try:
+            index = cls(db.query(Protection).all())
+        finally:
+            db.close()
+        logger.info("protection_index_loaded", protections=index.size, path_prefixes=len(index._paths))
+        return index
+
+    def match(self, media_item: MediaItem, primary_path: Optional[str] = None) -> Optional[str]:
+        """Raison de protection du média, None s'il n'est pas protégé.
+
+        IDs: TMDb pour les films; TVDb ou TMDb pour les séries et épisodes; IMDb pour tous.
+        Chemins: le chemin principal du média commence par le chemin protégé, ou le contient.
+        """
+        matches: List[_Match] = []
+        if media_item.type == "movie":
+            if media_item.tmdb_id and media_item.tmdb_id in self._tmdb:
+                matches.append(self._tmdb[media_item.tmdb_id])
+        elif media_item.type in ("series", "episode"):
+            if media_item.tvdb_id and media_item.tvdb_id in self._tvdb:
+                matches.append(self._tvdb[media_item.tvdb_id])
+            if media_item.tmdb_id and media_item.tmdb_id in self._tmdb:
+                matches.append(self._tmdb[media_item.tmdb_id])
+        if media_item.imdb_id and media_item.imdb_id in self._imdb:
+            matches.append(self._imdb[media_item.imdb_id])
+
+        path_match = self._paths.match(primary_path)
+        if path_match:
+            matches.append(path_match)
+        if primary_path and self._substring_re is not None and self._substring_re.search(primary_path):
+            matches.extend(match for path, match in self._substrings.items() if path in primary_path)
+
+        return min(matches)[1] if matches else None
+
+
+_index: Optional[ProtectionIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_protection_index() -> ProtectionIndex:
+    """Index courant (chargé au premier appel puis après chaque invalidation)."""
+    global _index
+    index = _index
+    if index is not None:
+        return index
+    with _index_lock:
+        if _index is None:
+            _index = ProtectionIndex.load()
+        return _index
+
+
+def invalidate_protection_index() -> None:
+    """À appeler après toute écriture dans la table protections."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def set_protection_index(index: ProtectionIndex) -> None:
+    """Installe un index déjà construit (instantané transmis aux workers d'évaluation)."""
+    global _index
+    with _index_lock:
+        _index = index
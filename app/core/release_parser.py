@@ -0,0 +1,137 @@
+"""Parser de noms de release (torrents, fichiers, titres) avec cache LRU.
+
+Transforme un nom comme "The.Matrix.1999.1080p.BluRay.x264" ou "Show - S01E02 - Pilot.mkv"
+en champs structurés (tokens du titre, année, saisons/épisodes, tags qualité). Les résultats
+sont mémoïsés par nom: un même torrent ou fichier n'est analysé qu'une fois par processus,
+quel que soit le nombre de médias contre lesquels il est comparé.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Tuple
+import re
+
+# Marqueurs saison/épisode des noms de release (S01E02, S01E01-E03, S01, S01-S03, Season 1)
+_EPISODE_RE = re.compile(r'(?<![a-z0-9])s(\d{1,2})[ ._-]?e(\d{1,3})(?:(?:-e?|e)(\d{1,3})(?![\dp]))?(?!\d)', re.IGNORECASE)
+_SEASON_PACK_RE = re.compile(r'(?<![a-z0-9])s(\d{1,2})(?:[ ._]*-[ ._]*s?(\d{1,2}))?(?![\de])', re.IGNORECASE)
+_SEASON_WORD_RE = re.compile(r'\b(?:season|saison)[ ._-]?(\d{1,2})\b', re.IGNORECASE)
+
+_EXTENSION_RE = re.compile(r'\.(mkv|mp4|avi|mov|m4v|ts|wmv|iso|srt|nfo)$', re.IGNORECASE)
+_TOKEN_RE = re.compile(r'[^\W_]+')
+_BRACKETED_YEAR_RE = re.compile(r'[(\[]((?:19|20)\d{2})[)\]]')
+_YEAR_TOKEN_RE = re.compile(r'^(?:19|20)\d{2}$')
+_SE_TOKEN_RE = re.compile(r'^s\d{1,2}(?:e\d{1,3})?')
+
+QUALITY_TAGS = frozenset({
+    # Résolution
+    "480p", "576p", "720p", "1080p", "1080i", "2160p", "4k", "uhd",
+    # Source
+    "bluray", "bdrip", "brrip", "bdremux", "remux", "webrip", "web", "webdl", "hdtv", "dvdrip",
+    "dvd", "hdrip", "amzn", "nf", "dsnp", "hmax", "atvp",
+    # Codecs / HDR / audio
+    "x264", "x265", "h264", "h265", "hevc", "avc", "xvid", "10bit", "hdr", "hdr10", "dv",
+    "dts", "ac3", "aac", "atmos", "truehd", "ddp", "dd", "eac3",
+    # Divers
+    "proper", "repack", "multi", "vff", "vfq", "vostfr", "french", "truefrench", "complete", "integrale",
+})
+
+EpisodeCoverage = Dict[int, Optional[FrozenSet[int]]]
+
+
+@dataclass(frozen=True)
+class ParsedRelease:
+    """Nom de release analysé.
+
+    `title` contient les tokens du titre (avant l'année, le marqueur SxxEyy ou les tags
+    qualité) joints par des espaces; `clean` contient tous les tokens du nom sans extension.
+    """
+    name: str
+    title_tokens: Tuple[str, ...]
+    clean: str
+    year: Optional[int] = None
+    seasons: Tuple[int, ...] = ()
+    episodes: Tuple[int, ...] = ()
+    quality: Tuple[str, ...] = ()
+
+    @property
+    def title(self) -> str:
+        return " ".join(self.title_tokens)
+
+    @property
+    def season(self) -> Optional[int]:
+        return self.seasons[0] if self.seasons else None
+
+    @property
+    def is_season_pack(self) -> bool:
+        return bool(self.seasons) and not self.episodes
+
+    @property
+    def coverage(self) -> Optional[EpisodeCoverage]:
+        """Saisons/épisodes couverts: saison -> épisodes (None = saison complète)."""
+        if not self.seasons:
+            return None
+        if self.episodes:
+            return {self.seasons[0]: frozenset(self.episodes)}
+        return {season: None for season in self.seasons}
+
+
+def _parse_seasons_episodes(text: str) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    match = _EPISODE_RE.search(text)
+    if match:
+        first = int(match.group(2))
+        last = int(match.group(3)) if match.group(3) else first
+        return (int(match.group(1)),), tuple(range(first, max(first, last) + 1))
+    match = _SEASON_PACK_RE.search(text) or _SEASON_WORD_RE.search(text)
+    if match:
+        first = int(match.group(1))
+        last = int(match.group(2)) if match.lastindex and match.lastindex >= 2 and match.group(2) else first
+        return tuple(range(first, max(first, last) + 1)), ()
+    return (), ()
+
+
+@lru_cache(maxsize=65536)
+def parse_release_name(name: str) -> ParsedRelease:
+    """Analyse un nom de torrent, de fichier ou un titre (résultat mémoïsé par nom)."""
+    if not name:
+        return ParsedRelease(name="", title_tokens=(), clean="")
+
+    text = _EXTENSION_RE.sub("", str(name).strip())
+    tokens = _TOKEN_RE.findall(text.lower())
+    seasons, episodes = _parse_seasons_episodes(text)
+
+    # Premier marqueur hors titre: SxxEyy / "season N" / tag qualité
+    marker_index = len(tokens)
+    for idx, token in enumerate(tokens):
+        if token in QUALITY_TAGS or (idx > 0 and (_SE_TOKEN_RE.match(token) or token in ("season", "saison"))):
+            marker_index = idx
+            break
+
+    # Année: entre parenthèses/crochets en priorité, sinon la dernière année avant les marqueurs
+    # (jamais le premier token, pour les titres comme "2012" ou "1917")
+    year = None
+    year_index = None
+    bracketed = _BRACKETED_YEAR_RE.search(text)
+    if bracketed:
+        year = int(bracketed.group(1))
+        for idx in range(1, len(tokens)):
+            if tokens[idx] == bracketed.group(1):
+                year_index = idx
+                break
+    else:
+        for idx in range(1, marker_index):
+            if _YEAR_TOKEN_RE.match(tokens[idx]):
+                year = int(tokens[idx])
+                year_index = idx
+
+    title_end = marker_index
+    if year_index is not None and year_index < title_end:
+        title_end = year_index
+
+    return ParsedRelease(
+        name=name,
+        title_tokens=tuple(tokens[:title_end]),
+        clean=" ".join(tokens),
+        year=year,
+        seasons=seasons,
+        episodes=episodes,
+        quality=tuple(token for token in tokens[marker_index:] if token in QUALITY_TAGS),
+    )
@@ -0,0 +1,233 @@
+"""Revalidation ciblée d'un plan avant suppression.
+
+Un plan peut rester en DRAFT plusieurs jours avant d'être appliqué. Plutôt que de relancer un
+scan complet, on interroge Tautulli uniquement pour les items sélectionnés: par rating_key
+(requêtes concurrentes bornées) quand il est connu, sinon via un seul appel get_history limité
+aux lectures postérieures à la création du plan (paginé). Tout item vu depuis est désélectionné.
+
+La revalidation échoue fermée: un item dont l'historique n'a pas pu être lu est aussi
+désélectionné (protected_reason "Revalidation failed"). Seuls les plans DRAFT sont revalidés.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.config import get_config
+from app.db.database import get_db_sync
+from app.db.models import Plan, PlanItem
+from app.services.tautulli import TautulliService, parse_history_date
+
+logger = structlog.get_logger(__name__)
+
+# Lecture la plus récente depuis la création du plan: (date, utilisateur)
+WatchEvent = Tuple[datetime, Optional[str]]
+
+# Lignes par appel get_history (les pages suivantes sont demandées tant qu'une page est pleine)
+HISTORY_PAGE_SIZE = 10000
+
+
+class PlanNotRevalidatableError(Exception):
+    """Le plan n'est pas en DRAFT (déjà appliqué, annulé ou en cours de génération)."""
+
+
+class PlanRevalidator:
+    """Vérifie qu'aucun item sélectionné d'un plan n'a été vu depuis sa création."""
+
+    def __init__(self):
+        self.config = get_config()
+        self.tautulli_service = TautulliService()
+        self.concurrency = max(1, self.config.tautulli.revalidate_concurrency)
+
+    @staticmethod
+    def _latest_play(history: List[Dict[str, Any]], since_ts: float) -> Optional[WatchEvent]:
+        """Lecture la plus récente postérieure à `since_ts` (epoch)."""
+        latest: Optional[WatchEvent] = None
+        for entry in history:
+            watched_at = parse_history_date(entry.get("date"))
+            if not watched_at or watched_at.timestamp() <= since_ts:
+                continue
+            if latest is None or watched_at.timestamp() > latest[0].timestamp():
+                latest = (watched_at, entry.get("user"))
+        return latest
+
+    async def _get_history(self, **filters: Any) -> List[Dict[str, Any]]:
+        """Historique complet pour ces filtres, page par page."""
+        history: List[Dict[str, Any]] = []
+        while True:
+            page = await self.tautulli_service.get_history(start=len(history), length=HISTORY_PAGE_SIZE, **filters)
+            history.extend(page)
+            if len(page) < HISTORY_PAGE_SIZE:
+                return history
+            logger.info("revalidation_history_next_page", rows=len(history), **filters)
+
+    async def _check_by_rating_key(
+        self,
+        items: List[PlanItem],
+        after: str,
+        since_ts: float,
+    ) -> Tuple[Dict[int, WatchEvent], Dict[int, str]]:
+        """Requêtes get_history par rating_key, au plus `concurrency` en parallèle.
+
+        Returns:
+            (items vus: id -> lecture, items en échec: id -> erreur)
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(item: PlanItem) -> Tuple[PlanItem, Optional[List[Dict[str, Any]]], Optional[str]]:
+            rating_key = str(item.meta_json["tautulli_rating_key"])
+            async with semaphore:
+                try:
+                    if item.media_type == "series":
+                        # Pour une série, la clé stockée est celle de la série (grandparent des épisodes)
+                        history = await self._get_history(grandparent_rating_key=rating_key, after=after)
+                    else:
+                        history = await self._get_history(rating_key=rating_key, after=after)
+                    return item, history, None
+                except Exception as e:
+                    logger.warning("revalidation_history_failed", plan_item_id=item.id, rating_key=rating_key, error=str(e))
+                    return item, None, str(e)
+
+        watched: Dict[int, WatchEvent] = {}
+        failed: Dict[int, str] = {}
+        for item, history, error in await asyncio.gather(*(fetch(item) for item in items)):
+            if history is None:
+                failed[item.id] = error
+                continue
+            latest = self._latest_play(history, since_ts)
+            if latest:
+                watched[item.id] = latest
+        return watched, failed
+
+    async def _check_by_date(
+        self,
+        items: List[PlanItem],
+        after: str,
+        since_ts: float,
+    ) -> Dict[int, WatchEvent]:
+        """Un seul get_history (paginé) limité aux lectures récentes, rapproché par IDs TMDb/TVDb."""
+        history = await self._get_history(after=after)
+        recent = []
+        for entry in history:
+            watched_at = parse_history_date(entry.get("date"))
+            if watched_at and watched_at.timestamp() > since_ts:
+                recent.append(entry)
+        if not recent:
+            return {}
+
+        # Les watch maps peuvent appeler get_metadata (synchrone) pour les entrées sans GUID
+        movie_map = await asyncio.to_thread(self.tautulli_service.get_movie_watch_map, recent)
+        series_map = await asyncio.to_thread(self.tautulli_service.get_series_watch_map, recent)
+        episode_map = await asyncio.to_thread(self.tautulli_service.get_episode_watch_map, recent)
+
+        watched: Dict[int, WatchEvent] = {}
+        for item in items:
+            ids = item.ids_json or {}
+            meta = item.meta_json or {}
+            watch_stats = None
+            if item.media_type == "movie" and ids.get("tmdb"):
+                watch_stats = movie_map.get(ids["tmdb"])
+            elif item.media_type == "series" and ids.get("tvdb"):
+                watch_stats = series_map.get(ids["tvdb"])
+            elif item.media_type == "episode" and ids.get("tvdb") and \
+                    meta.get("season_number") is not None and meta.get("episode_number") is not None:
+                watch_stats = episode_map.get((ids["tvdb"], int(meta["season_number"]), int(meta["episode_number"])))
+            if watch_stats and watch_stats.get("last_watched_at"):
+                watched[item.id] = (watch_stats["last_watched_at"], watch_stats.get("last_user"))
+        return watched
+
+    async def revalidate_plan(self, plan_id: int) -> Dict[str, Any]:
+        """Revalide les items sélectionnés d'un plan et désélectionne ceux vus depuis sa création."""
+        started = time.perf_counter()
+        db = get_db_sync()
+        try:
+            plan = db.query(Plan).filter(Plan.id == plan_id).first()
+            if not plan:
+                raise ValueError(f"Plan {plan_id} not found")
+            if plan.status != "DRAFT":
+                raise PlanNotRevalidatableError(f"Plan {plan_id} is {plan.status}, only DRAFT plans can be revalidated")
+
+            items = db.query(PlanItem).filter(
+                PlanItem.plan_id == plan_id,
+                PlanItem.selected == True
+            ).all()
+
+            # created_at est en UTC naïf; `after` est à la journée, on prend une marge d'un jour
+            since_ts = plan.created_at.replace(tzinfo=timezone.utc).timestamp()
+            after = (plan.created_at - timedelta(days=1)).strftime("%Y-%m-%d")
+
+            keyed = [item for item in items if (item.meta_json or {}).get("tautulli_rating_key")]
+            unkeyed = [item for item in items if not (item.meta_json or {}).get("tautulli_rating_key")]
+
+            watched, failed = await self._check_by_rating_key(keyed, after, since_ts)
+            if unkeyed:
+                try:
+                    watched.update(await self._check_by_date(unkeyed, after, since_ts))
+                except Exception as e:
+                    logger.warning("revalidation_date_history_failed", plan_id=plan_id, items=len(unkeyed), error=str(e))
+                    failed.update({item.id: str(e) for item in unkeyed})
+
+            checked_at = datetime.utcnow()
+            flagged = []
+            unverified = []
+            for item in items:
+                if item.id in failed:
+                    # Échec fermé: un item non vérifié n'est pas supprimé
+                    item.selected = False
+                    item.protected_reason = "Revalidation failed"
+                    meta = dict(item.meta_json or {})
+                    meta["revalidation"] = {
+                        "failed": True,
+                        "error": failed[item.id],
+                        "checked_at": checked_at.isoformat(),
+                    }
+                    item.meta_json = meta
+                    unverified.append({"id": item.id, "title": item.title, "media_type": item.media_type,
+                                       "error": failed[item.id]})
+                    continue
+                event = watched.get(item.id)
+                if not event:
+                    continue
+                watched_at, user = event
+                item.selected = False
+                item.protected_reason = f"Watched since plan creation ({user or 'unknown'})"
+                item.last_viewed_at = watched_at
+                item.never_watched = False
+                meta = dict(item.meta_json or {})
+                meta["revalidation"] = {
+                    "watched_since_plan": True,
+                    "watched_at": watched_at.isoformat(),
+                    "user": user,
+                    "checked_at": checked_at.isoformat(),
+                }
+                item.meta_json = meta
+                flagged.append({
+                    "id": item.id,
+                    "title": item.title,
+                    "media_type": item.media_type,
+                    "watched_at": watched_at.isoformat(),
+                    "user": user,
+                })
+
+            summary = dict(plan.summary_json or {})
+            summary["last_revalidated_at"] = checked_at.isoformat()
+            plan.summary_json = summary
+            db.commit()
+
+            result = {
+                "plan_id": plan_id,
+                "checked": len(items),
+                "rating_key_queries": len(keyed),
+                "date_queries": 1 if unkeyed else 0,
+                "errors": len(unverified),
+                "watched": flagged,
+                "failed": unverified,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            logger.info("plan_revalidated", **{k: v for k, v in result.items() if k not in ("watched", "failed")},
+                        watched_count=len(flagged))
+            return result
+        finally:
+            db.close()
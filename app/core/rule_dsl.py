@@ -0,0 +1,297 @@
+"""Règles personnalisées déclarées en config (rules.custom), compilées en expressions vectorisées.
+
+Exemple:
+
+    rules:
+      custom:
+        - name: "big_movies_unwatched_180d"
+          media_types: ["movie"]
+          conditions:
+            - {field: watch_age_days, op: ">=", value: 180}
+            - {field: size_gb, op: ">", value: 20}
+            - {field: tags, op: "not_contains", value: "keep"}
+        - name: "kids_keep"
+          action: keep
+          conditions:
+            - {field: watched_by, op: "contains", value: "kid"}
+
+Une règle correspond si toutes ses conditions sont vraies. Les règles sont testées dans
+l'ordre et la première qui correspond décide: `delete` rend le média candidat (règle
+"custom_<name>"), `keep` le conserve. Sans règle correspondante, les règles intégrées
+(rules.movies / rules.series) s'appliquent.
+
+Chaque condition est compilée une seule fois en fonction (colonnes → masque booléen NumPy):
+l'évaluation d'un scan est un passage vectorisé par condition, pas une boucle par média et
+par règle. Les programmes compilés sont mis en cache par hash de la config des règles.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.item_store import MediaItemStore
+from app.core.models import MediaItem
+from app.core.watch_stats import UserWatchIndex, watch_index_key
+
+# Champs numériques (NaN = inconnu: aucune comparaison n'est vraie)
+NUMERIC_FIELDS = ("watch_age_days", "added_age_days", "size_bytes", "size_gb", "view_count", "year")
+# Champs booléens
+BOOLEAN_FIELDS = ("never_watched", "monitored", "requested", "requester_watched")
+# Champs texte
+TEXT_FIELDS = ("request_status", "title", "media_type")
+# Champs ensemble (tags Radarr/Sonarr, utilisateurs Tautulli ayant vu le média)
+SET_FIELDS = ("tags", "watched_by")
+
+_NUMERIC_OPS = {
+    "==": np.equal, "!=": np.not_equal,
+    ">": np.greater, ">=": np.greater_equal,
+    "<": np.less, "<=": np.less_equal,
+}
+_ACTIONS = ("delete", "keep")
+_MEDIA_TYPES = ("movie", "series", "episode")
+
+Mask = np.ndarray
+Condition = Callable[["RuleColumns"], Mask]
+
+
+class RuleColumns:
+    """Colonnes calculées une fois par évaluation, partagées par toutes les conditions.
+
+    Args:
+        store: Médias évalués, en colonnes
+        watch_age_days: Jours depuis la dernière lecture (NaN si jamais vu)
+        added_age_days: Jours depuis l'ajout (NaN si inconnu)
+        watch_index: Index utilisateur → médias vus (champs watched_by / requester_watched)
+    """
+
+    def __init__(
+        self,
+        store: MediaItemStore,
+        watch_age_days: np.ndarray,
+        added_age_days: np.ndarray,
+        watch_index: Optional[UserWatchIndex] = None,
+    ):
+        self.store = store
+        self.items = store.items
+        self.count = store.count
+        self.watch_index = watch_index
+        self._columns: Dict[str, Any] = {
+            "watch_age_days": watch_age_days,
+            "added_age_days": added_age_days,
+        }
+
+    def column(self, field: str) -> Any:
+        """Colonne `field`, construite à la première utilisation."""
+        if field not in self._columns:
+            self._columns[field] = self._build(field)
+        return self._columns[field]
+
+    def _build(self, field: str) -> Any:
+        items = self.items
+        if field == "size_bytes":
+            return self.store.size_bytes.astype(np.float64)
+        if field == "size_gb":
+            return self.column("size_bytes") / (1024 ** 3)
+        if field == "view_count":
+            return self.store.view_count.astype(np.float64)
+        if field == "year":
+            return np.fromiter((item.year if item.year else np.nan for item in items), dtype=np.float64, count=self.count)
+        if field == "never_watched":
+            return self.store.never_watched
+        if field == "monitored":
+            return self.store.monitored
+        if field == "requested":
+            return np.fromiter((item.overseerr_request_id is not None for item in items), dtype=bool, count=self.count)
+        if field == "requester_watched":
+            return np.fromiter((self._requester_watched(item) for item in items), dtype=bool, count=self.count)
+        if field == "request_status":
+            return [item.overseerr_status or None for item in items]
+        if field == "title":
+            return [item.title for item in items]
+        if field == "media_type":
+            return [item.type for item in items]
+        if field == "tags":
+            return [frozenset(tag.lower() for tag in item.tags) for item in items]
+        if field == "watched_by":
+            return [self._watchers(item) for item in items]
+        raise ValueError(f"Unknown rule field: {field}")
+
+    def _watchers(self, item: MediaItem) -> frozenset:
+        if self.watch_index is None:
+            return frozenset()
+        return frozenset(user.lower() for user in self.watch_index.watchers(watch_index_key(item)))
+
+    def _requester_watched(self, item: MediaItem) -> bool:
+        if self.watch_index is None or item.overseerr_request_id is None:
+            return False
+        names = item.metadata.get("overseerr_requester_names") or [item.overseerr_requested_by]
+        key = watch_index_key(item)
+        return any(self.watch_index.has_watched(name, key) for name in names)
+
+
+def _values(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _compile_condition(field: str, op: str, value: Any) -> Condition:
+    """Condition → fonction (colonnes → masque). Lève ValueError si invalide."""
+    if op in ("exists", "missing"):
+        def presence(columns: RuleColumns) -> Mask:
+            column = columns.column(field)
+            if isinstance(column, np.ndarray):
+                present = ~np.isnan(column) if column.dtype.kind == "f" else np.ones(columns.count, dtype=bool)
+            else:
+                present = np.fromiter((bool(v) for v in column), dtype=bool, count=columns.count)
+            return present if op == "exists" else ~present
+        if field not in NUMERIC_FIELDS + BOOLEAN_FIELDS + TEXT_FIELDS + SET_FIELDS:
+            raise ValueError(f"Unknown rule field: {field}")
+        return presence
+
+    if field in NUMERIC_FIELDS:
+        if op not in _NUMERIC_OPS:
+            raise ValueError(f"Operator '{op}' not supported for numeric field '{field}'")
+        compare = _NUMERIC_OPS[op]
+        threshold = float(value)
+
+        def numeric_match(columns: RuleColumns) -> Mask:
+            column = columns.column(field)
+            mask = compare(column, threshold)
+            # NaN != x est vrai: une valeur inconnue ne satisfait aucune comparaison, "!=" compris
+            return mask & ~np.isnan(column) if column.dtype.kind == "f" else mask
+        return numeric_match
+
+    if field in BOOLEAN_FIELDS:
+        if op not in ("==", "!="):
+            raise ValueError(f"Operator '{op}' not supported for boolean field '{field}'")
+        expected = bool(value) if op == "==" else not bool(value)
+        return lambda columns: columns.column(field) == expected
+
+    if field in TEXT_FIELDS:
+        if op in ("==", "!=", "in", "not_in"):
+            accepted = frozenset(str(v).lower() for v in _values(value))
+            negate = op in ("!=", "not_in")
+
+            def text_match(columns: RuleColumns) -> Mask:
+                mask = np.fromiter(
+                    (v is not None and str(v).lower() in accepted for v in columns.column(field)),
+                    dtype=bool, count=columns.count,
+                )
+                return ~mask if negate else mask
+            return text_match
+        if op == "contains":
+            needle = str(value).lower()
+            return lambda columns: np.fromiter(
+                (v is not None and needle in str(v).lower() for v in columns.column(field)),
+                dtype=bool, count=columns.count,
+            )
+        raise ValueError(f"Operator '{op}' not supported for text field '{field}'")
+
+    if field in SET_FIELDS:
+        wanted = frozenset(str(v).lower() for v in _values(value))
+        if op in ("contains", "contains_any", "not_contains"):
+            def set_match(columns: RuleColumns) -> Mask:
+                mask = np.fromiter((not wanted.isdisjoint(v) for v in columns.column(field)), dtype=bool, count=columns.count)
+                return ~mask if op == "not_contains" else mask
+            return set_match
+        if op == "contains_all":
+            return lambda columns: np.fromiter((wanted <= v for v in columns.column(field)), dtype=bool, count=columns.count)
+        raise ValueError(f"Operator '{op}' not supported for set field '{field}'")
+
+    raise ValueError(f"Unknown rule field: {field}")
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    name: str
+    action: str
+    media_types: Tuple[str, ...]
+    conditions: Tuple[Condition, ...]
+    # Seuils en jours (échéance des verdicts des scans incrémentaux)
+    day_thresholds: Tuple[float, ...]
+
+    @property
+    def label(self) -> str:
+        return f"custom_{self.name}"
+
+
+class RuleProgram:
+    """Règles personnalisées compilées, évaluées dans l'ordre (première correspondance)."""
+
+    def __init__(self, rules: Sequence[CompiledRule]):
+        self.rules = tuple(rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def day_thresholds(self) -> List[float]:
+        return sorted({days for rule in self.rules for days in rule.day_thresholds})
+
+    def evaluate(self, columns: RuleColumns) -> np.ndarray:
+        """Index de la première règle correspondante par média (-1 si aucune)."""
+        decided = np.full(columns.count, -1, dtype=np.int32)
+        media_types = columns.column("media_type")
+        type_masks = {
+            media_type: np.fromiter((t == media_type for t in media_types), dtype=bool, count=columns.count)
+            for media_type in _MEDIA_TYPES
+        }
+        for index, rule in enumerate(self.rules):
+            mask = decided < 0
+            if not mask.any():
+                break
+            mask &= np.logical_or.reduce([type_masks[t] for t in rule.media_types])
+            for condition in rule.conditions:
+                if not mask.any():
+                    break
+                mask &= condition(columns)
+            decided[mask] = index
+        return decided
+
+
+def compile_rules(custom_rules: Sequence[Any]) -> RuleProgram:
+    """Compile rules.custom (dicts ou modèles pydantic). Lève ValueError si une règle est invalide."""
+    compiled = []
+    for position, raw in enumerate(custom_rules):
+        rule = raw.model_dump() if hasattr(raw, "model_dump") else dict(raw)
+        name = rule.get("name") or f"rule_{position + 1}"
+        action = rule.get("action", "delete")
+        if action not in _ACTIONS:
+            raise ValueError(f"Rule '{name}': unknown action '{action}' (expected one of {_ACTIONS})")
+        media_types = tuple(rule.get("media_types") or _MEDIA_TYPES)
+        unknown_types = set(media_types) - set(_MEDIA_TYPES)
+        if unknown_types:
+            raise ValueError(f"Rule '{name}': unknown media types {sorted(unknown_types)}")
+        conditions = []
+        thresholds = []
+        for condition in rule.get("conditions") or []:
+            field, op, value = condition.get("field"), condition.get("op", "=="), condition.get("value")
+            try:
+                conditions.append(_compile_condition(field, op, value))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Rule '{name}': {e}") from e
+            if field in ("watch_age_days", "added_age_days") and op in _NUMERIC_OPS:
+                thresholds.append(float(value))
+        if not conditions:
+            raise ValueError(f"Rule '{name}': at least one condition is required")
+        compiled.append(CompiledRule(name, action, media_types, tuple(conditions), tuple(thresholds)))
+    return RuleProgram(compiled)
+
+
+_programs: Dict[str, RuleProgram] = {}
+
+
+def rules_digest(custom_rules: Sequence[Any]) -> str:
+    raw = [rule.model_dump() if hasattr(rule, "model_dump") else rule for rule in custom_rules]
+    return hashlib.sha1(json.dumps(raw, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def get_rule_program(custom_rules: Sequence[Any]) -> RuleProgram:
+    """Programme compilé pour cette config de règles (compilé une seule fois par contenu)."""
+    digest = rules_digest(custom_rules)
+    program = _programs.get(digest)
+    if program is None:
+        program = compile_rules(custom_rules)
+        _programs.clear()  # Une seule config active à la fois
+        _programs[digest] = program
+    return program
@@ -1,16 +1,29 @@
 """Moteur de règles pour déterminer les candidats à la suppression."""
-from typing import Optional, Tuple
-from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple, Union
+from datetime import datetime
 
+import numpy as np
+
+from app.core.item_store import (
+    EPISODE, MOVIE, MOVIE_ADDED_KEYS, SERIES, SERIES_ADDED_KEYS, MediaItemStore, added_date as _added_date,
+)
 from app.core.models import MediaItem
+from app.core.rule_dsl import RuleColumns, get_rule_program
+from app.core.watch_stats import UserWatchIndex
 from app.config import get_config
 
 
+def _days_since(date: datetime) -> int:
+    return (datetime.now(date.tzinfo) - date).days
+
+
 class RulesEngine:
     """Moteur d'évaluation des règles."""
 
     def __init__(self):
         self.config = get_config()
+        # Règles personnalisées (rules.custom), compilées une fois par contenu de config
+        self.custom_rules = get_rule_program(self.config.rules.custom)
 
     def evaluate_movie(self, media_item: MediaItem) -> Tuple[bool, Optional[str]]:
         """Évalue si un film est candidat à la suppression."""
@@ -25,15 +38,11 @@ class RulesEngine:
         # Si jamais regardé
         if media_item.never_watched or media_item.view_count == 0:
             # Utiliser date d'ajout si disponible (depuis Radarr/Sonarr)
-            added_date = media_item.metadata.get("added_at") or media_item.metadata.get("radarr_added") or media_item.metadata.get("sonarr_added")
-            if added_date:
-                if isinstance(added_date, str):
-                    try:
-                        added_date = datetime.fromisoformat(added_date.replace("Z", "+00:00"))
-                    except (ValueError, AttributeError):
-                        return False, None
-                days_since_added = (datetime.now(added_date.tzinfo) - added_date).days
-                if days_since_added >= if_never_watched_use_added_days:
+            has_added, added_date = _added_date(media_item, MOVIE_ADDED_KEYS)
+            if has_added:
+                if added_date is None:
+                    return False, None
+                if _days_since(added_date) >= if_never_watched_use_added_days:
                     return True, f"never_watched_{if_never_watched_use_added_days}d"
             # Si strategy = "never_watched_only", on retourne True même sans date d'ajout
             if strategy == "never_watched_only":
@@ -46,32 +55,15 @@ class RulesEngine:
 
         # Si regardé, vérifier last_viewed_at (strategy = "not_watched_days")
         if media_item.last_viewed_at:
-            days_since_watched = (datetime.now(media_item.last_viewed_at.tzinfo) - media_item.last_viewed_at).days
-            if days_since_watched >= delete_if_not_watched_days:
+            if _days_since(media_item.last_viewed_at) >= delete_if_not_watched_days:
                 return True, f"not_watched_{delete_if_not_watched_days}d"
-            else:
-                # Vu récemment (moins de X jours) = ne pas supprimer
-                return False, None
-        
-        # Si jamais regardé mais pas de last_viewed_at, utiliser date d'ajout
-        if media_item.never_watched or media_item.view_count == 0:
-            added_date = media_item.metadata.get("added_at") or media_item.metadata.get("radarr_added") or media_item.metadata.get("sonarr_added")
-            if added_date:
-                if isinstance(added_date, str):
-                    try:
-                        added_date = datetime.fromisoformat(added_date.replace("Z", "+00:00"))
-                    except (ValueError, AttributeError):
-                        return False, None
-                days_since_added = (datetime.now(added_date.tzinfo) - added_date).days
-                if days_since_added >= if_never_watched_use_added_days:
-                    return True, f"never_watched_{if_never_watched_use_added_days}d"
-        
+
         # Par défaut, ne pas supprimer (film récemment vu ou jamais vu mais récemment ajouté)
         return False, None
 
     def evaluate_series(self, media_item: MediaItem) -> Tuple[bool, Optional[str]]:
         """Évalue si une série est candidate à la suppression (série entière).
-        
+
         NOTE: Pour les séries avec épisodes réguliers, préférer la suppression d'épisodes individuels
         plutôt que de la série entière. Cette méthode ne devrait être utilisée que pour les séries
         complètement inactives depuis longtemps.
@@ -84,22 +76,15 @@ class RulesEngine:
 
         # Si jamais regardée, utiliser date d'ajout
         if media_item.never_watched or media_item.view_count == 0:
-            added_date = media_item.metadata.get("added_at") or media_item.metadata.get("sonarr_added")
-            if added_date:
-                if isinstance(added_date, str):
-                    try:
-                        added_date = datetime.fromisoformat(added_date.replace("Z", "+00:00"))
-                    except (ValueError, AttributeError):
-                        return False, None
-                days_since_added = (datetime.now(added_date.tzinfo) - added_date).days
-                if days_since_added >= delete_entire_series_if_inactive_days:
-                    return True, f"series_never_watched_{delete_entire_series_if_inactive_days}d"
+            has_added, added_date = _added_date(media_item, SERIES_ADDED_KEYS)
+            if has_added and added_date is not None and \
+                    _days_since(added_date) >= delete_entire_series_if_inactive_days:
+                return True, f"series_never_watched_{delete_entire_series_if_inactive_days}d"
             return False, None
 
         # Vérifier si aucun épisode n'a été vu depuis X jours (série complètement inactive)
         if media_item.last_viewed_at:
-            days_since_watched = (datetime.now(media_item.last_viewed_at.tzinfo) - media_item.last_viewed_at).days
-            if days_since_watched >= delete_entire_series_if_inactive_days:
+            if _days_since(media_item.last_viewed_at) >= delete_entire_series_if_inactive_days:
                 return True, f"series_inactive_{delete_entire_series_if_inactive_days}d"
 
         return False, None
@@ -115,28 +100,23 @@ class RulesEngine:
         # Si jamais regardé
         if media_item.never_watched or media_item.view_count == 0:
             # Utiliser date d'ajout si disponible (depuis Radarr/Sonarr)
-            added_date = media_item.metadata.get("added_at") or media_item.metadata.get("radarr_added") or media_item.metadata.get("sonarr_added")
-            if added_date:
-                if isinstance(added_date, str):
-                    try:
-                        added_date = datetime.fromisoformat(added_date.replace("Z", "+00:00"))
-                    except (ValueError, AttributeError):
-                        return False, None
-                days_since_added = (datetime.now(added_date.tzinfo) - added_date).days
-                if days_since_added >= delete_episodes_not_watched_days:
-                    return True, f"episode_never_watched_{delete_episodes_not_watched_days}d"
+            has_added, added_date = _added_date(media_item, MOVIE_ADDED_KEYS)
+            if has_added and added_date is not None and \
+                    _days_since(added_date) >= delete_episodes_not_watched_days:
+                return True, f"episode_never_watched_{delete_episodes_not_watched_days}d"
             return False, None
 
         # Si regardé, vérifier last_viewed_at
         if media_item.last_viewed_at:
-            days_since_watched = (datetime.now(media_item.last_viewed_at.tzinfo) - media_item.last_viewed_at).days
-            if days_since_watched >= delete_episodes_not_watched_days:
+            if _days_since(media_item.last_viewed_at) >= delete_episodes_not_watched_days:
                 return True, f"episode_not_watched_{delete_episodes_not_watched_days}d"
 
         return False, None
 
-    def evaluate(self, media_item: MediaItem) -> Tuple[bool, Optional[str]]:
-        """Évalue un média selon son type."""
+    def evaluate(self, media_item: MediaItem, watch_index: Optional[UserWatchIndex] = None) -> Tuple[bool, Optional[str]]:
+        """Évalue un média selon son type (règles personnalisées d'abord, si configurées)."""
+        if len(self.custom_rules):
+            return self.evaluate_many([media_item], watch_index=watch_index)[0]
         if media_item.type == "movie":
             return self.evaluate_movie(media_item)
         elif media_item.type == "series":
@@ -145,3 +125,87 @@ class RulesEngine:
             return self.evaluate_episode(media_item)
         return False, None
 
+    def evaluate_many(
+        self,
+        media_items: Union[MediaItemStore, Iterable[MediaItem]],
+        now: Optional[datetime] = None,
+        watch_index: Optional[UserWatchIndex] = None,
+    ) -> List[Tuple[bool, Optional[str]]]:
+        """Évalue tous les médias en une passe (mêmes verdicts que evaluate, item par item).
+
+        Les âges sont calculés sur les colonnes du MediaItemStore (dates déjà converties en
+        microsecondes) et comparés aux seuils de façon vectorisée, par rapport à une seule heure
+        de référence. La première règle personnalisée correspondante l'emporte sur les règles intégrées.
+
+        Args:
+            media_items: Store en colonnes, ou médias à évaluer (store construit à la volée)
+            now: Heure de référence (aware; défaut: maintenant)
+            watch_index: Index utilisateur → médias vus (conditions watched_by / requester_watched)
+        """
+        store = media_items if isinstance(media_items, MediaItemStore) else MediaItemStore.from_items(media_items)
+        if not store.count:
+            return []
+
+        movie_rules = self.config.rules.movies
+        series_rules = self.config.rules.series
+        never_watched_only = movie_rules.get("strategy", "not_watched_days") == "never_watched_only"
+        movie_watched_days = movie_rules.get("delete_if_not_watched_days", 60)
+        movie_added_days = movie_rules.get("if_never_watched_use_added_days", 60)
+        series_days = series_rules.get("delete_entire_series_if_inactive_days", 120)
+        episode_days = series_rules.get("delete_episodes_not_watched_days", 60)
+
+        added_days = store.ages_days(store.added_us, store.added_naive, now)
+        viewed_days = store.ages_days(store.viewed_us, store.viewed_naive, now)
+
+        never_watched = store.never_watched
+        has_added = store.has_added
+        added_valid = store.added_valid
+        has_viewed = store.has_viewed
+        added_known = has_added & added_valid
+        watched = ~never_watched
+
+        movie = store.type_code == MOVIE
+        # Jamais vu: date d'ajout invalide → non candidat; ajout ancien → règle; sinon never_watched_only
+        movie_added_hit = movie & never_watched & added_known & (added_days >= movie_added_days)
+        movie_fallback = movie & never_watched & ~(has_added & ~added_valid) & ~movie_added_hit & never_watched_only
+        movie_viewed_hit = movie & watched & has_viewed & (viewed_days >= movie_watched_days) & (not never_watched_only)
+
+        series = store.type_code == SERIES
+        series_added_hit = series & never_watched & added_known & (added_days >= series_days)
+        series_viewed_hit = series & watched & has_viewed & (viewed_days >= series_days)
+
+        episode = store.type_code == EPISODE
+        episode_added_hit = episode & never_watched & added_known & (added_days >= episode_days)
+        episode_viewed_hit = episode & watched & has_viewed & (viewed_days >= episode_days)
+
+        labels = [
+            None,
+            f"never_watched_{movie_added_days}d",
+            "never_watched",
+            f"not_watched_{movie_watched_days}d",
+            f"series_never_watched_{series_days}d",
+            f"series_inactive_{series_days}d",
+            f"episode_never_watched_{episode_days}d",
+            f"episode_not_watched_{episode_days}d",
+        ]
+        label_code = np.select(
+            [movie_added_hit, movie_fallback, movie_viewed_hit, series_added_hit,
+             series_viewed_hit, episode_added_hit, episode_viewed_hit],
+            [1, 2, 3, 4, 5, 6, 7],
+            default=0,
+        )
+        verdicts = [(code != 0, labels[code]) for code in label_code.tolist()]
+
+        if len(self.custom_rules):
+            columns = RuleColumns(
+                store,
+                watch_age_days=np.where(has_viewed, viewed_days, np.nan),
+                added_age_days=np.where(added_known, added_days, np.nan),
+                watch_index=watch_index,
+            )
+            rules = self.custom_rules.rules
+            decided = self.custom_rules.evaluate(columns)
+            for idx in np.flatnonzero(decided >= 0).tolist():
+                rule = rules[decided[idx]]
+                verdicts[idx] = (True, rule.label) if rule.action == "delete" else (False, None)
+        return verdicts
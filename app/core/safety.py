@@ -1,8 +1,11 @@
 """Garde-fous et exclusions."""
-from typing import List, Tuple, Optional
-from pathlib import Path
+from typing import List, Tuple, Optional, Union
 
+from app.core.item_store import MediaItemStore
 from app.core.models import MediaItem
+from app.core.path_matcher import PathPrefixMatcher
+from app.core.protection_index import get_protection_index
+from app.core.watch_stats import UserWatchIndex
 from app.services.overseerr import OverseerrService
 from app.services.qbittorrent import QBittorrentService
 from app.config import get_config
@@ -17,26 +20,41 @@ class SafetyChecker:
         self.qb_service = QBittorrentService() if self.config.qbittorrent else None
         # Charger les exclusions depuis la config
         self.excluded_paths: List[str] = self.config.app.excluded_paths if self.config.app else []
+        self._compile_excluded_paths()
+        # Index utilisateur → médias vus du scan courant (renseigné par le planner si Tautulli est actif)
+        self.watch_index: Optional[UserWatchIndex] = None
 
-    def is_protected(self, media_item: MediaItem) -> Tuple[bool, Optional[str]]:
-        """Vérifie si un média est protégé (ne doit pas être supprimé)."""
+    def _compile_excluded_paths(self) -> None:
+        # Exclusions normalisées une seule fois; la première exclusion correspondante l'emporte
+        self._excluded_matcher: PathPrefixMatcher[str] = PathPrefixMatcher(
+            (excluded_path, f"Path excluded: {excluded_path}") for excluded_path in self.excluded_paths
+        )
+
+    def excluded_path_reasons(self, media_items: Union[MediaItemStore, List[MediaItem]]) -> List[Optional[str]]:
+        """Raisons d'exclusion par chemin de tous les médias en une passe (None = non exclu)."""
+        if isinstance(media_items, MediaItemStore):
+            return self._excluded_matcher.match_many(media_items.paths)
+        return self._excluded_matcher.match_many(item.get_primary_path() for item in media_items)
+
+    def is_protected(
+        self,
+        media_item: MediaItem,
+        path_reason: Optional[str] = None,
+        paths_checked: bool = False,
+    ) -> Tuple[bool, Optional[str]]:
+        """Vérifie si un média est protégé (ne doit pas être supprimé).
+
+        Args:
+            media_item: Média à vérifier
+            path_reason: Raison d'exclusion par chemin précalculée (excluded_path_reasons)
+            paths_checked: True si path_reason a été précalculé
+        """
         # Check path exclusions
         primary_path = media_item.get_primary_path()
-        if primary_path:
-            for excluded_path in self.excluded_paths:
-                try:
-                    excluded_path_obj = Path(excluded_path)
-                    primary_path_obj = Path(primary_path)
-                    # Vérifier si le chemin est dans l'exclusion ou l'inverse
-                    if (primary_path_obj.is_relative_to(excluded_path_obj) or
-                        excluded_path_obj in primary_path_obj.parents or
-                        str(primary_path).startswith(str(excluded_path))):
-                        return True, f"Path excluded: {excluded_path}"
-                except (OSError, ValueError):
-                    # Si is_relative_to n'est pas disponible (Python < 3.9), utiliser startswith
-                    if str(primary_path).startswith(str(excluded_path)):
-                        return True, f"Path excluded: {excluded_path}"
-                    pass
+        if not paths_checked:
+            path_reason = self._excluded_matcher.match(primary_path)
+        if path_reason:
+            return True, path_reason
 
         # Check Radarr/Sonarr protected tags
         if media_item.type == "movie" and self.config.radarr:
@@ -56,29 +74,14 @@ class SafetyChecker:
 
         # Check Overseerr protection
         if self.overseerr_service:
-            protected, reason = self.overseerr_service.is_protected(media_item)
+            protected, reason = self.overseerr_service.is_protected(media_item, self.watch_index)
             if protected:
                 return True, reason
 
-        # Check DB protections (exclusions persistées)
-        from app.db.database import get_db_sync
-        from app.db.models import Protection
-        db = get_db_sync()
-        protections = db.query(Protection).all()
-        for protection in protections:
-            # Match par ID
-            if media_item.type == "movie" and protection.tmdb_id:
-                if media_item.tmdb_id == protection.tmdb_id:
-                    return True, f"Protected in DB: {protection.reason or 'Manual protection'}"
-            elif media_item.type in ["series", "episode"]:
-                if protection.tvdb_id and media_item.tvdb_id == protection.tvdb_id:
-                    return True, f"Protected in DB: {protection.reason or 'Manual protection'}"
-                if protection.tmdb_id and media_item.tmdb_id == protection.tmdb_id:
-                    return True, f"Protected in DB: {protection.reason or 'Manual protection'}"
-            # Match par path
-            if protection.path and primary_path:
-                if str(primary_path).startswith(protection.path) or protection.path in str(primary_path):
-                    return True, f"Protected in DB: {protection.reason or 'Manual protection'}"
+        # Check DB protections (exclusions persistées, index compilé partagé entre les vérifications)
+        reason = get_protection_index().match(media_item, primary_path)
+        if reason:
+            return True, reason
 
         return False, None
 
@@ -86,9 +89,11 @@ class SafetyChecker:
         """Ajoute un chemin à exclure."""
         if path not in self.excluded_paths:
             self.excluded_paths.append(path)
+            self._compile_excluded_paths()
 
     def remove_excluded_path(self, path: str) -> None:
         """Retire un chemin des exclusions."""
         if path in self.excluded_paths:
             self.excluded_paths.remove(path)
+            self._compile_excluded_paths()
 
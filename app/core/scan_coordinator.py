@@ -0,0 +1,162 @@
+"""Coordination des scans: un seul scan à la fois (single-flight).
+
+Un scan demandé (POST /api/scan) pendant qu'un autre tourne ne démarre pas de nouveau
+Planner: la demande est rattachée au scan en cours et reçoit le même scan_id, donc le même
+flux de progression (/ws/scan/{scan_id}). Les demandes redondantes sont ainsi fusionnées
+(compteur coalesced_requests). Une demande n'est rattachée que si le scan en cours a le même
+périmètre (app.core.scan_scope) et, pour une reprise (resume_from), reprend le même scan;
+sinon elle est refusée (ScanInProgressError). Un scan planifié qui tombe pendant un scan actif est sauté:
+le plan produit par le scan en cours le remplace.
+
+Tout s'exécute dans la boucle asyncio de l'application (API et APScheduler): entre la
+vérification du scan actif et son enregistrement il n'y a pas de point d'attente, aucun
+verrou n'est nécessaire.
+"""
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+import structlog
+
+from app.core.planner import Planner
+from app.core.scan_scope import ScanScope
+
+logger = structlog.get_logger(__name__)
+
+
+class ScanInProgressError(Exception):
+    """Un scan incompatible avec la demande (autre périmètre, autre reprise) est en cours."""
+
+    def __init__(self, scan_id: str, reason: str = "with a different scope"):
+        super().__init__(f"Scan {scan_id} is already running {reason}")
+        self.scan_id = scan_id
+
+
+class ScanCoordinator:
+    """Démarre les scans et rattache les demandes concurrentes au scan actif."""
+
+    def __init__(self):
+        self._active_scan_id: Optional[str] = None
+        self._active_scope: Optional[ScanScope] = None
+        self._active_resume_from: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def active_scan_id(self) -> Optional[str]:
+        """scan_id du scan en cours, None si aucun."""
+        return self._active_scan_id
+
+    def request_scan(
+        self,
+        source: str = "api",
+        resume_from: Optional[str] = None,
+        scope: Optional[ScanScope] = None,
+    ) -> Tuple[str, bool]:
+        """Démarre un scan, ou rattache la demande au scan en cours.
+
+        Args:
+            source: Origine de la demande ("api", "scheduler")
+            resume_from: scan_id d'un scan échoué dont les étapes sauvegardées sont réutilisées
+                (son périmètre est repris si `scope` n'est pas précisé)
+            scope: Périmètre d'un scan partiel (None = toute la bibliothèque)
+
+        Returns:
+            (scan_id, True si la demande a été rattachée à un scan déjà en cours)
+
+        Raises:
+            ScanInProgressError: Un scan d'un autre périmètre est en cours, ou une reprise est
+                demandée pendant un scan qui ne reprend pas ce même scan (elle serait ignorée)
+        """
+        from app.main import scan_progress_store
+
+        if resume_from and scope is None and resume_from in scan_progress_store:
+            scope = ScanScope.from_dict(scan_progress_store[resume_from].get("scope"))
+
+        if self._active_scan_id is not None:
+            scan_id = self._active_scan_id
+            if scope != self._active_scope:
+                raise ScanInProgressError(scan_id)
+            if resume_from and resume_from != self._active_resume_from:
+                raise ScanInProgressError(scan_id, f"(resume of scan {resume_from} would be ignored; retry once it ends)")
+            progress = scan_progress_store.get(scan_id)
+            if progress is not None:
+                progress["coalesced_requests"] = progress.get("coalesced_requests", 0) + 1
+                progress["logs"].append({
+                    "timestamp": datetime.now().isoformat(),
+                    "level": "info",
+                    "message": f"Demande de scan ({source}) rattachée au scan en cours",
+                })
+            logger.info("scan_request_coalesced", scan_id=scan_id, source=source, resume_from=resume_from)
+            return scan_id, True
+
+        scan_id = str(uuid.uuid4())
+        logger.info("scan_started", scan_id=scan_id, source=source, resume_from=resume_from,
+                    scope=scope.to_dict() if scope else None)
+        scan_progress_store[scan_id] = {
+            "status": "running",
+            "current_step": "initializing",
+            "progress": 0,
+            "total_steps": 10,
+            "logs": [],
+            "plan_id": None,
+            "stages": [],
+            "resumed_from": resume_from,
+            "source": source,
+            "coalesced_requests": 0,
+            "scope": scope.to_dict() if scope else None,
+        }
+        self._active_scan_id = scan_id
+        self._active_scope = scope
+        self._active_resume_from = resume_from
+        self._task = asyncio.create_task(self._run(scan_id, resume_from, scope))
+        return scan_id, False
+
+    async def _run(self, scan_id: str, resume_from: Optional[str], scope: Optional[ScanScope]) -> None:
+        from app.main import scan_progress_store
+
+        try:
+            planner = Planner(scan_id=scan_id, resume_from=resume_from, scope=scope)
+            plan_id = await planner.generate_plan()
+            logger.info("scan_completed", scan_id=scan_id, plan_id=plan_id)
+            scan_progress_store[scan_id].update({
+                "status": "completed",
+                "current_step": "completed",
+                "progress": 100,
+                "plan_id": plan_id
+            })
+        except Exception as e:
+            logger.exception("scan_failed", scan_id=scan_id)
+            scan_progress_store[scan_id].update({
+                "status": "error",
+                "current_step": "error",
+                "error": str(e),
+                "error_type": e.__class__.__name__,
+                # Étape en échec: relancer avec ?resume=<scan_id> réutilise les étapes précédentes
+                "failed_stage": getattr(e, "stage", None),
+            })
+        finally:
+            self._active_scan_id = None
+            self._active_scope = None
+            self._active_resume_from = None
+            self._task = None
+
+    async def run_scheduled_scan(self) -> Optional[int]:
+        """Scan planifié: sauté si un scan est en cours, sinon exécuté jusqu'au bout.
+
+        Returns:
+            ID du plan créé, None si le scan a été sauté ou a échoué
+        """
+        if self._active_scan_id is not None:
+            logger.info("scheduled_scan_skipped", active_scan_id=self._active_scan_id)
+            return None
+        scan_id, _ = self.request_scan(source="scheduler")
+        # shield: l'annulation du job planifié n'interrompt pas le scan (d'autres demandes peuvent y être rattachées)
+        await asyncio.shield(self._task)
+
+        from app.main import scan_progress_store
+        return scan_progress_store[scan_id].get("plan_id")
+
+
+# Instance globale (partagée entre l'API et le scheduler)
+scan_coordinator = ScanCoordinator()
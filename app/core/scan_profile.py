@@ -0,0 +1,126 @@
+"""Profil de performance d'un scan, persisté avec le plan (table scan_profiles).
+
+Pour chaque scan (réussi ou non) sont enregistrés:
+    - la durée de chaque étape du pipeline (et ses enregistrements / variation de RSS)
+    - les appels aux services amont: nombre, octets reçus, retries, échecs (app.utils.upstream_stats)
+    - les taux de hit des caches (matchs torrents, verdicts incrémentaux, dates parsées)
+    - le pic de RSS du process pendant le scan
+
+Consultable via GET /api/plan/{plan_id}/profile et GET /api/scan-profiles (comparaison des scans
+dans le temps, repérage des régressions quand la bibliothèque ou les services amont grossissent).
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.core.item_store import parse_added
+from app.db.database import get_db_sync
+from app.db.models import ScanProfile
+from app.utils.upstream_stats import UpstreamStats
+
+logger = structlog.get_logger(__name__)
+
+
+def hit_rate(hits: int, misses: int) -> Dict[str, Any]:
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else None}
+
+
+def _reset_peak_rss() -> bool:
+    """Remet à zéro le pic RSS du process (Linux >= 4.0), False si impossible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Pic RSS du process: VmHWM (Linux /proc), sinon getrusage (pic depuis le démarrage)."""
+    try:
+        with open("/proc/self/status", "r") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class ScanProfiler:
+    """Mesures d'un scan, de sa création à save().
+
+    Le pic RSS couvre le process API seulement (pas les workers d'évaluation). Il est remis à
+    zéro au début du scan quand le noyau le permet; sinon c'est le pic depuis le démarrage
+    (peak_rss_scope = "process").
+    """
+
+    def __init__(self, scan_id: str):
+        self.scan_id = scan_id
+        self.upstream = UpstreamStats()
+        self._started = time.perf_counter()
+        self._peak_rss_scope = "scan" if _reset_peak_rss() else "process"
+        self._parse_cache_start = parse_added.cache_info()
+
+    def _parse_cache_stats(self) -> Dict[str, Any]:
+        info = parse_added.cache_info()
+        return hit_rate(info.hits - self._parse_cache_start.hits, info.misses - self._parse_cache_start.misses)
+
+    def build(
+        self,
+        stages: List[Dict[str, Any]],
+        caches: Dict[str, Dict[str, Any]],
+        error: Optional[BaseException] = None,
+    ) -> Tuple[int, Dict[str, Any]]:
+        """(durée totale en ms, profil)."""
+        duration_ms = int((time.perf_counter() - self._started) * 1000)
+        profile = {
+            "duration_ms": duration_ms,
+            "stages": [
+                {key: stage[key] for key in ("name", "status", "duration_ms", "records", "rss_delta_bytes")}
+                for stage in stages
+            ],
+            "upstream": self.upstream.to_dict(),
+            "caches": {**caches, "added_dates": self._parse_cache_stats()},
+            "peak_rss_bytes": peak_rss_bytes(),
+            "peak_rss_scope": self._peak_rss_scope,
+        }
+        if error is not None:
+            profile["error"] = f"{error.__class__.__name__}: {error}"
+        return duration_ms, profile
+
+    def save(
+        self,
+        plan_id: Optional[int],
+        stages: List[Dict[str, Any]],
+        caches: Dict[str, Dict[str, Any]],
+        error: Optional[BaseException] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Enregistre le profil (un échec d'écriture ne fait pas échouer le scan)."""
+        duration_ms, profile = self.build(stages, caches, error)
+        logger.info("scan_profile", scan_id=self.scan_id, plan_id=plan_id, duration_ms=duration_ms,
+                    upstream=profile["upstream"]["totals"], peak_rss_bytes=profile["peak_rss_bytes"])
+        db = get_db_sync()
+        try:
+            db.add(ScanProfile(
+                plan_id=plan_id,
+                scan_id=self.scan_id,
+                created_at=datetime.utcnow(),
+                status="error" if plan_id is None else "completed",
+                duration_ms=duration_ms,
+                profile_json=profile,
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Error saving scan profile: {e}", exc_info=True)
+        finally:
+            db.close()
+        return profile
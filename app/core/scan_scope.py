@@ -0,0 +1,105 @@
+"""Périmètre d'un scan partiel (POST /api/scan avec un corps `scope`).
+
+Un périmètre combine, tous optionnels:
+    - media_types: "movie" et/ou "series" (les épisodes suivent leur série)
+    - tmdb_ids / tvdb_ids: un média correspond si l'un de ses IDs est listé
+    - path_prefix: racine de chemin (bibliothèque, série, dossier de saison)
+
+Les critères renseignés doivent tous être satisfaits. Seul ce sous-ensemble est collecté
+(Radarr/Sonarr, épisodes), évalué et écrit dans le plan, qui porte le périmètre dans son
+résumé (summary_json["scope"]).
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from app.core.models import MediaItem
+from app.core.path_matcher import PathPrefixMatcher
+
+MEDIA_TYPES = ("movie", "series")
+
+
+@dataclass(frozen=True)
+class ScanScope:
+    media_types: Tuple[str, ...] = MEDIA_TYPES
+    tmdb_ids: FrozenSet[int] = frozenset()
+    tvdb_ids: FrozenSet[int] = frozenset()
+    path_prefix: Optional[str] = None
+    _paths: PathPrefixMatcher = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        unknown = set(self.media_types) - set(MEDIA_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown media types in scan scope: {sorted(unknown)} (expected {MEDIA_TYPES})")
+        if not self.media_types:
+            raise ValueError("Scan scope must include at least one media type")
+        object.__setattr__(self, "_paths", PathPrefixMatcher([(self.path_prefix, True)] if self.path_prefix else []))
+
+    @classmethod
+    def from_request(
+        cls,
+        media_types: Optional[Iterable[str]] = None,
+        tmdb_ids: Optional[Iterable[int]] = None,
+        tvdb_ids: Optional[Iterable[int]] = None,
+        path_prefix: Optional[str] = None,
+    ) -> Optional["ScanScope"]:
+        """Périmètre de la requête, None si aucun critère (scan complet). Lève ValueError si invalide."""
+        scope = cls(
+            media_types=tuple(dict.fromkeys(media_types)) if media_types else MEDIA_TYPES,
+            tmdb_ids=frozenset(tmdb_ids or ()),
+            tvdb_ids=frozenset(tvdb_ids or ()),
+            path_prefix=path_prefix or None,
+        )
+        return None if scope == cls() else scope
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["ScanScope"]:
+        if not data:
+            return None
+        return cls.from_request(**data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "media_types": list(self.media_types),
+            "tmdb_ids": sorted(self.tmdb_ids),
+            "tvdb_ids": sorted(self.tvdb_ids),
+            "path_prefix": self.path_prefix,
+        }
+
+    @property
+    def has_ids(self) -> bool:
+        return bool(self.tmdb_ids or self.tvdb_ids)
+
+    def includes(self, media_type: str) -> bool:
+        return media_type in self.media_types
+
+    def _ids_match(self, tmdb_id: Optional[int], tvdb_id: Optional[int]) -> bool:
+        if not self.has_ids:
+            return True
+        return (tmdb_id is not None and tmdb_id in self.tmdb_ids) or (tvdb_id is not None and tvdb_id in self.tvdb_ids)
+
+    def _under_prefix(self, path: Optional[str]) -> bool:
+        return not self.path_prefix or self._paths.match(path) is not None
+
+    def match_movie(self, movie: Dict[str, Any]) -> bool:
+        """Film Radarr (dict brut) dans le périmètre."""
+        return self.includes("movie") and self._ids_match(movie.get("tmdbId"), None) \
+            and self._under_prefix(movie.get("path"))
+
+    def match_series(self, series: Dict[str, Any]) -> bool:
+        """Série Sonarr (dict brut) à collecter: sous la racine, ou contenant la racine (dossier de saison)."""
+        if not self.includes("series") or not self._ids_match(series.get("tmdbId"), series.get("tvdbId")):
+            return False
+        if not self.path_prefix:
+            return True
+        path = series.get("path")
+        return self._under_prefix(path) or (bool(path) and PathPrefixMatcher([(path, True)]).match(self.path_prefix) is not None)
+
+    def match_item(self, item: MediaItem) -> bool:
+        """MediaItem construit dans le périmètre.
+
+        Avec une racine de chemin, une série n'est retenue que si son dossier entier est sous la
+        racine: un scan limité à un dossier de saison ne doit pas proposer la série complète.
+        """
+        media_type = "series" if item.type == "episode" else item.type
+        return self.includes(media_type) and self._ids_match(item.tmdb_id, item.tvdb_id) \
+            and self._under_prefix(item.get_primary_path())
@@ -6,14 +6,22 @@ from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import structlog
 
-logger = structlog.get_logger(__name__)
+from app.core.release_parser import EpisodeCoverage, parse_release_name
+
+# Année entre parenthèses ("Titre (1999)"), seule forme reconnue avant le parsing des releases
+_BRACKETED_YEAR = re.compile(r"\((\d{4})\)")
 
+logger = structlog.get_logger(__name__)
 
 class TorrentMatcher:
     """Matcher avancé pour associer torrents qBittorrent aux médias."""
     
     def __init__(self, debug: bool = False):
         self.debug = debug
+        # Raisons de match du dernier appel à find_matching_torrents (raison -> nombre de torrents)
+        self.last_match_reasons: Dict[str, int] = {}
+        # Couverture saison/épisode par torrent, calculée une fois par hash
+        self._coverage_cache: Dict[Tuple[str, str], Optional[EpisodeCoverage]] = {}
     
     def normalize_path(self, path: str) -> str:
         """Normalise un chemin pour comparaison.
@@ -36,25 +44,121 @@ class TorrentMatcher:
         return normalized
     
     def extract_title_clean(self, title: str) -> str:
-        """Extrait un titre nettoyé pour matching."""
+        """Extrait un nom nettoyé pour matching (tous les tokens, sans extension)."""
         if not title:
             return ""
-        # Enlever caractères spéciaux, années, extensions
-        clean = re.sub(r'[^\w\s]', '', title.lower())
-        clean = re.sub(r'\.(mkv|mp4|avi|mov|m4v)$', '', clean, flags=re.IGNORECASE)
-        clean = re.sub(r'\s+\(\d{4}\)', '', clean)
-        return clean.strip()
+        return parse_release_name(title).clean
+    
+    def extract_match_title(self, title: str) -> str:
+        """Extrait le titre seul (sans année, SxxEyy ni tags qualité) pour matching par nom."""
+        if not title:
+            return ""
+        parsed = parse_release_name(title)
+        return parsed.title or parsed.clean
     
     def extract_year(self, text: str) -> Optional[int]:
         """Extrait l'année d'un texte."""
-        match = re.search(r'\((\d{4})\)', text)
-        if match:
-            try:
-                return int(match.group(1))
-            except ValueError:
-                pass
-        return None
+        if not text:
+            return None
+        return parse_release_name(text).year
     
+    def extract_season_episode(self, text: str) -> Optional[EpisodeCoverage]:
+        """Extrait les saisons/épisodes couverts par un nom de release.
+
+        Returns:
+            Dict saison -> épisodes (None = saison complète), ou None si aucun marqueur
+        """
+        if not text:
+            return None
+        return parse_release_name(text).coverage
+
+    def get_episode_coverage(self, torrent: Dict[str, Any]) -> Optional[EpisodeCoverage]:
+        """Saisons/épisodes couverts par un torrent (nom du torrent, sinon ses fichiers).
+
+        Un season pack couvre tous les épisodes de sa saison. None si le torrent ne porte
+        aucun marqueur exploitable (ex: intégrale sans SxxEyy).
+        """
+        cache_key = (torrent.get("hash", ""), torrent.get("name", ""))
+        if cache_key in self._coverage_cache:
+            return self._coverage_cache[cache_key]
+
+        coverage = self.extract_season_episode(torrent.get("name", ""))
+        if coverage is None:
+            for torrent_file in torrent.get("files", []) or []:
+                file_coverage = self.extract_season_episode(os.path.basename(str(torrent_file)))
+                if not file_coverage:
+                    continue
+                if coverage is None:
+                    coverage = {}
+                for season, episodes in file_coverage.items():
+                    if season in coverage and coverage[season] is None:
+                        continue
+                    if episodes is None:
+                        coverage[season] = None
+                    else:
+                        coverage[season] = coverage.get(season, frozenset()) | episodes
+
+        self._coverage_cache[cache_key] = coverage
+        return coverage
+
+    def find_episode_torrents(
+        self,
+        media_path: Optional[str],
+        season_number: Optional[int],
+        episode_number: Optional[int],
+        candidate_torrents: List[Dict[str, Any]],
+        media_title: Optional[str] = None
+    ) -> List[str]:
+        """Trouve les torrents d'un épisode parmi les torrents candidats de sa série.
+
+        Les torrents dont le nom (ou les fichiers) indique une saison/un épisode sont associés
+        par couverture. Un torrent qui couvre cet épisode seul lui est associé directement; un
+        torrent qui couvre plusieurs épisodes (season pack) n'est associé que s'il contient le
+        fichier de l'épisode: il est partagé avec les autres épisodes, et le supprimer arrête
+        leur seed. Les autres torrents passent par les stratégies classiques, limitées aux
+        candidats de la série.
+        """
+        matching_hashes = []
+        match_reasons: Dict[str, int] = {}
+        remaining = []
+        file_name = os.path.basename(self.normalize_path(media_path)) if media_path else None
+        for torrent in candidate_torrents:
+            torrent_hash = torrent.get("hash")
+            if not torrent_hash:
+                continue
+            coverage = self.get_episode_coverage(torrent) if season_number is not None else None
+            if coverage is None:
+                remaining.append(torrent)
+                continue
+            episodes = coverage.get(season_number, frozenset())
+            if episodes is not None and episode_number not in episodes:
+                continue
+            if len(coverage) == 1 and episodes == {episode_number}:
+                reason = "episode_coverage"
+            elif file_name and self._contains_file(torrent, file_name):
+                reason = "season_pack_file"
+            else:
+                continue
+            matching_hashes.append(torrent_hash)
+            match_reasons[reason] = match_reasons.get(reason, 0) + 1
+
+        if remaining and media_path:
+            for torrent_hash in self.find_matching_torrents(media_path, remaining, media_title=media_title):
+                if torrent_hash not in matching_hashes:
+                    matching_hashes.append(torrent_hash)
+            for reason, count in self.last_match_reasons.items():
+                match_reasons[reason] = match_reasons.get(reason, 0) + count
+
+        self.last_match_reasons = match_reasons
+        return matching_hashes
+
+    def _contains_file(self, torrent: Dict[str, Any], file_name: str) -> bool:
+        """Le torrent contient un fichier de ce nom (comparaison sur le nom de fichier normalisé)."""
+        return any(
+            os.path.basename(self.normalize_path(str(torrent_file))) == file_name
+            for torrent_file in torrent.get("files", []) or []
+        )
+
     def match_by_exact_path(
         self,
         media_path: str,
@@ -231,12 +335,14 @@ class TorrentMatcher:
         
         # Utiliser le titre du média si disponible
         title_to_match = media_title if media_title else os.path.basename(media_path)
-        title_clean = self.extract_title_clean(title_to_match)
+        title_clean = self.extract_match_title(title_to_match)
         
         if not title_clean or len(title_clean) < 3:
             return False, None
         
-        torrent_name_clean = self.extract_title_clean(torrent_name)
+        torrent_name_clean = self.extract_match_title(torrent_name)
+        if not torrent_name_clean:
+            return False, None
         
         # Comparaison directe (titre contenu dans le nom du torrent ou vice versa)
         if title_clean in torrent_name_clean or torrent_name_clean in title_clean:
@@ -296,7 +402,20 @@ class TorrentMatcher:
         media_title: Optional[str],
         torrent: Dict[str, Any]
     ) -> Tuple[bool, Optional[str]]:
-        """Stratégie 4: Matching par année + titre."""
+        """Stratégie 4: Matching par année + titre.
+
+        Stratégie faible (un faux match fait supprimer le torrent d'un autre média): la
+        comparaison sur les 5 premiers caractères du titre n'est gardée que si l'année du
+        torrent est entre parenthèses, comme avant le parsing des noms de release. Pour une
+        année nue (nom de scène), le titre doit être identique.
+
+        >>> TorrentMatcher().match_by_year_and_title(
+        ...     "/movies/The Matrix (1999)", "The Matrix (1999)", {"name": "The.Mummy.1999.1080p.BluRay.x264"})
+        (False, None)
+        >>> TorrentMatcher().match_by_year_and_title(
+        ...     "/movies/The Matrix (1999)", "The Matrix (1999)", {"name": "The.Matrix.1999.1080p.BluRay.x264"})
+        (True, 'year_and_title_match')
+        """
         title_to_match = media_title if media_title else os.path.basename(media_path)
         media_year = self.extract_year(title_to_match) or self.extract_year(media_path)
         
@@ -308,12 +427,15 @@ class TorrentMatcher:
         
         # Même année (tolérance ±1)
         if abs(media_year - torrent_year) <= 1:
-            title_clean = self.extract_title_clean(title_to_match)
-            torrent_name_clean = self.extract_title_clean(torrent_name)
+            title_clean = self.extract_match_title(title_to_match)
+            torrent_name_clean = self.extract_match_title(torrent_name)
             
-            if title_clean and len(title_clean) > 5:
+            if title_clean and torrent_name_clean and len(title_clean) > 5:
+                if not _BRACKETED_YEAR.search(torrent_name):
+                    if title_clean == torrent_name_clean:
+                        return True, "year_and_title_match"
                 # Vérifier que les premiers caractères du titre correspondent
-                if title_clean[:5] in torrent_name_clean or torrent_name_clean[:5] in title_clean:
+                elif title_clean[:5] in torrent_name_clean or torrent_name_clean[:5] in title_clean:
                     return True, "year_and_title_match"
         
         return False, None
@@ -363,6 +485,9 @@ class TorrentMatcher:
     ) -> List[str]:
         """Trouve tous les torrents correspondant à un média avec stratégies multi-niveaux.
         
+        Les stratégies touchées sont comptées dans `last_match_reasons` (raison -> nombre de
+        torrents) pour l'explication du matching; aucun log n'est émis sauf si `debug` est actif.
+        
         Args:
             media_path: Chemin du média (fichier ou dossier)
             all_torrents: Liste de tous les torrents
@@ -371,6 +496,7 @@ class TorrentMatcher:
         Returns:
             Liste des hash des torrents correspondants
         """
+        self.last_match_reasons = {}
         if not media_path or not all_torrents:
             if self.debug:
                 logger.debug("torrent_matching_skipped", 
@@ -380,119 +506,53 @@ class TorrentMatcher:
             return []
         
         matching_hashes = []
-        media_path_norm = self.normalize_path(media_path)
+        match_reasons: Dict[str, int] = {}
         
         if self.debug:
             logger.info(
                 "torrent_matching_start",
-                media_path=media_path_norm[:100],
+                media_path=self.normalize_path(media_path)[:100],
                 media_title=media_title,
-                total_torrents=len(all_torrents),
-                media_path_original=media_path[:100] if media_path else None
+                total_torrents=len(all_torrents)
             )
-            
-            # Log quelques exemples de torrents pour debug
-            sample_torrents = all_torrents[:3]
-            for idx, t in enumerate(sample_torrents):
-                logger.debug("sample_torrent_for_matching",
-                           index=idx,
-                           hash=t.get("hash", "")[:8] if t.get("hash") else "N/A",
-                           name=t.get("name", "")[:50] if t.get("name") else "N/A",
-                           content_path=t.get("content_path", "")[:80] if t.get("content_path") else "N/A",
-                           save_path=t.get("save_path", "")[:80] if t.get("save_path") else "N/A",
-                           files_count=len(t.get("files", [])))
-        
-        for idx, torrent in enumerate(all_torrents):
-            matched = False
-            match_reason = None
-            
+        
+        for torrent in all_torrents:
             # Vérifier que le torrent a un hash valide
             torrent_hash = torrent.get("hash")
             if not torrent_hash:
-                if self.debug and idx < 5:
-                    logger.debug(f"Torrent {idx} has no hash, keys: {list(torrent.keys())}")
                 continue
             
-            # Stratégie 1: Chemin exact (le plus fiable)
+            # Stratégies du plus fiable au dernier recours: chemin exact, fichiers du torrent,
+            # nom du torrent, année + titre, parties du chemin
             matched, match_reason = self.match_by_exact_path(media_path, torrent)
-            if matched:
-                matching_hashes.append(torrent_hash)
-                if self.debug and len(matching_hashes) <= 10:
-                    logger.info(
-                        "torrent_matched",
-                        hash=torrent_hash[:8],
-                        reason=match_reason,
-                        torrent_name=torrent.get("name", "")[:50],
-                        content_path=torrent.get("content_path", "")[:100],
-                        save_path=torrent.get("save_path", "")[:100],
-                        media_path_norm=media_path_norm[:100]
-                    )
-                continue
-            
-            # Stratégie 2: Fichiers dans le torrent
-            matched, match_reason = self.match_by_torrent_files(media_path, torrent)
-            if matched:
-                matching_hashes.append(torrent_hash)
-                if self.debug and len(matching_hashes) <= 10:
-                    logger.info(
-                        "torrent_matched",
-                        hash=torrent_hash[:8],
-                        reason=match_reason,
-                        torrent_name=torrent.get("name", "")[:50]
-                    )
-                continue
-            
-            # Stratégie 3: Nom du torrent
-            matched, match_reason = self.match_by_torrent_name(media_path, media_title, torrent)
-            if matched:
-                matching_hashes.append(torrent_hash)
-                if self.debug and len(matching_hashes) <= 10:
-                    logger.info(
-                        "torrent_matched",
-                        hash=torrent_hash[:8],
-                        reason=match_reason,
-                        torrent_name=torrent.get("name", "")[:50]
-                    )
-                continue
-            
-            # Stratégie 4: Année + titre
-            matched, match_reason = self.match_by_year_and_title(media_path, media_title, torrent)
-            if matched:
-                matching_hashes.append(torrent_hash)
-                if self.debug and len(matching_hashes) <= 10:
-                    logger.info(
-                        "torrent_matched",
-                        hash=torrent_hash[:8],
-                        reason=match_reason,
-                        torrent_name=torrent.get("name", "")[:50]
-                    )
+            if not matched:
+                matched, match_reason = self.match_by_torrent_files(media_path, torrent)
+            if not matched:
+                matched, match_reason = self.match_by_torrent_name(media_path, media_title, torrent)
+            if not matched:
+                matched, match_reason = self.match_by_year_and_title(media_path, media_title, torrent)
+            if not matched:
+                matched, match_reason = self.match_by_path_parts(media_path, torrent)
+            if not matched:
                 continue
             
-            # Stratégie 5: Parties du chemin (dernier recours)
-            matched, match_reason = self.match_by_path_parts(media_path, torrent)
-            if matched:
-                matching_hashes.append(torrent_hash)
-                if self.debug and len(matching_hashes) <= 10:
-                    logger.info(
-                        "torrent_matched",
-                        hash=torrent_hash[:8],
-                        reason=match_reason,
-                        torrent_name=torrent.get("name", "")[:50]
-                    )
-        
-        if matching_hashes:
-            logger.info(
+            matching_hashes.append(torrent_hash)
+            match_reasons[match_reason] = match_reasons.get(match_reason, 0) + 1
+            if self.debug and len(matching_hashes) <= 10:
+                logger.info(
+                    "torrent_matched",
+                    hash=torrent_hash[:8],
+                    reason=match_reason,
+                    torrent_name=torrent.get("name", "")[:50]
+                )
+        
+        self.last_match_reasons = match_reasons
+        if self.debug:
+            logger.debug(
                 "torrent_matching_complete",
-                media_path=media_path_norm[:100],
+                media_path=self.normalize_path(media_path)[:100],
                 matches=len(matching_hashes),
                 total_torrents=len(all_torrents)
             )
-        elif self.debug:
-            logger.debug(
-                "torrent_matching_no_match",
-                media_path=media_path_norm[:100],
-                media_title=media_title
-            )
         
         return matching_hashes
-
@@ -0,0 +1,166 @@
+"""Agrégation columnar de l'historique de visionnage (NumPy).
+
+Les lignes d'historique (clé média, date, utilisateur) sont accumulées en colonnes puis
+agrégées en une passe vectorisée: dernière date de visionnage, nombre de lectures et
+dernier utilisateur par clé. Le résultat est identique aux watch maps construites ligne
+par ligne (en cas d'égalité de date, la première ligne rencontrée l'emporte).
+
+Dans la même passe, un index multi-utilisateurs (utilisateurs internés, bitmask par média)
+permet de répondre en O(1) à "l'utilisateur X a-t-il vu le média Y".
+"""
+from datetime import datetime
+from typing import Any, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from app.core.models import MediaItem
+
+K = TypeVar("K", bound=Hashable)
+
+
+class UserWatchIndex:
+    """Index utilisateur → médias vus: un bit par utilisateur interné, un bitmask par média.
+
+    Les clés sont des tuples (namespace, clé de watch map): ("movie", tmdb_id),
+    ("series", tvdb_id), ("episode", (tvdb_id, saison, épisode)).
+    """
+
+    def __init__(self):
+        self._user_ids: Dict[str, int] = {}
+        self.users: List[str] = []
+        self._masks: Dict[Tuple[str, Hashable], int] = {}
+
+    def __len__(self) -> int:
+        return len(self._masks)
+
+    def add(self, key: Tuple[str, Hashable], user: Optional[str]) -> None:
+        """Enregistre qu'un utilisateur a vu un média (noms comparés sans casse)."""
+        if not user:
+            return
+        name = user.lower()
+        user_id = self._user_ids.get(name)
+        if user_id is None:
+            user_id = len(self.users)
+            self._user_ids[name] = user_id
+            self.users.append(user)
+        self._masks[key] = self._masks.get(key, 0) | (1 << user_id)
+
+    def has_watched(self, user: Optional[str], key: Optional[Tuple[str, Hashable]]) -> bool:
+        """L'utilisateur a-t-il vu le média ?"""
+        if not user or key is None:
+            return False
+        user_id = self._user_ids.get(user.lower())
+        if user_id is None:
+            return False
+        return bool((self._masks.get(key, 0) >> user_id) & 1)
+
+    def watchers(self, key: Tuple[str, Hashable]) -> List[str]:
+        """Utilisateurs ayant vu le média."""
+        mask = self._masks.get(key, 0)
+        return [user for user_id, user in enumerate(self.users) if (mask >> user_id) & 1]
+
+
+def watch_index_key(media_item: MediaItem) -> Optional[Tuple[str, Hashable]]:
+    """Clé d'un MediaItem dans le UserWatchIndex (None si IDs manquants)."""
+    if media_item.type == "movie":
+        return ("movie", media_item.tmdb_id) if media_item.tmdb_id else None
+    if not media_item.tvdb_id:
+        return None
+    if media_item.type == "series":
+        return ("series", media_item.tvdb_id)
+    season = media_item.metadata.get("season_number")
+    episode = media_item.metadata.get("episode_number")
+    if media_item.type == "episode" and season is not None and episode is not None:
+        return ("episode", (media_item.tvdb_id, int(season), int(episode)))
+    return None
+
+
+class WatchHistoryColumns(Generic[K]):
+    """Colonnes d'historique (clé internée, timestamp, ligne) à agréger par clé.
+
+    Args:
+        user_index: Index multi-utilisateurs alimenté dans la même passe (optionnel)
+        namespace: Namespace des clés dans l'index ("movie", "series", "episode")
+    """
+
+    def __init__(self, user_index: Optional[UserWatchIndex] = None, namespace: str = ""):
+        self.user_index = user_index
+        self.namespace = namespace
+        self._key_ids: Dict[K, int] = {}
+        self.keys: List[K] = []
+        self._first_rows: List[int] = []
+        self._key_column: List[int] = []
+        self._timestamps: List[float] = []
+        self._dates: List[Optional[datetime]] = []
+        self._users: List[Optional[str]] = []
+        self._rating_keys: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self._key_column)
+
+    def append(
+        self,
+        key: K,
+        watched_at: Optional[datetime],
+        user: Optional[str],
+        rating_key: Optional[str] = None,
+    ) -> None:
+        """Ajoute une lecture (date None = lecture non datée, rating_key Plex optionnel)."""
+        row = len(self._key_column)
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = len(self.keys)
+            self._key_ids[key] = key_id
+            self.keys.append(key)
+            self._first_rows.append(row)
+        self._key_column.append(key_id)
+        self._timestamps.append(watched_at.timestamp() if watched_at else np.nan)
+        self._dates.append(watched_at)
+        self._users.append(user)
+        self._rating_keys.append(rating_key)
+        if self.user_index is not None:
+            self.user_index.add((self.namespace, key), user)
+
+    def aggregate(self, count_undated: bool = True) -> Dict[K, Dict[str, Any]]:
+        """Calcule les watch stats par clé.
+
+        Args:
+            count_undated: Si False, seules les lectures datées sont comptées, plus la première
+                lecture de la clé si elle n'est pas datée (comportement historique des maps
+                films/épisodes)
+        """
+        if not self.keys:
+            return {}
+
+        n_keys = len(self.keys)
+        key_column = np.asarray(self._key_column, dtype=np.int64)
+        timestamps = np.asarray(self._timestamps, dtype=np.float64)
+        first_rows = np.asarray(self._first_rows, dtype=np.int64)
+        dated = ~np.isnan(timestamps)
+
+        if count_undated:
+            view_counts = np.bincount(key_column, minlength=n_keys)
+        else:
+            view_counts = np.bincount(key_column[dated], minlength=n_keys) + (~dated[first_rows])
+
+        # Ligne gagnante: date la plus récente, première ligne en cas d'égalité;
+        # à défaut de lecture datée, la première ligne de la clé
+        winners = first_rows.copy()
+        dated_rows = np.flatnonzero(dated)
+        if dated_rows.size:
+            dated_keys = key_column[dated_rows]
+            order = np.lexsort((dated_rows, -timestamps[dated_rows], dated_keys))
+            sorted_keys = dated_keys[order]
+            group_starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            winners[sorted_keys[group_starts]] = dated_rows[order[group_starts]]
+
+        result: Dict[K, Dict[str, Any]] = {}
+        for key, row, view_count in zip(self.keys, winners.tolist(), view_counts.tolist()):
+            result[key] = {
+                "last_watched_at": self._dates[row],
+                "view_count": view_count,
+                "last_user": self._users[row],
+                "rating_key": self._rating_keys[row],
+                "never_watched": False,
+            }
+        return result
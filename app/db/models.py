@@ -1,5 +1,5 @@
 """SQLAlchemy models for database."""
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -13,12 +13,13 @@ class Plan(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    status = Column(String, default="DRAFT", nullable=False)  # DRAFT, APPLIED, CANCELLED
+    status = Column(String, default="DRAFT", nullable=False)  # BUILDING (scan par paquets en cours), DRAFT, APPLIED, CANCELLED
     summary_json = Column(JSON, default=dict)  # {movies_count, series_count, episodes_count, total_size_bytes}
 
     # Relationships
     items = relationship("PlanItem", back_populates="plan", cascade="all, delete-orphan")
     runs = relationship("Run", back_populates="plan")
+    profile = relationship("ScanProfile", back_populates="plan", uselist=False)
 
 
 class PlanItem(Base):
@@ -97,3 +98,60 @@ class Protection(Base):
     path = Column(String, nullable=True)
     reason = Column(String, nullable=True)  # Raison de la protection
 
+
+
+class TorrentMatchCacheEntry(Base):
+    """Cache persistant des associations média ↔ torrent entre scans.
+
+    Clé (media_path, torrent_hash). Les lignes de registre utilisent une clé vide :
+    - torrent_hash == "" : média évalué (fingerprint du média, date de la dernière évaluation)
+    - media_path == "" : torrent connu (fingerprint du torrent, date du dernier changement)
+    - sinon : association positive (fingerprint torrent + média au moment du match)
+    """
+    __tablename__ = "torrent_match_cache"
+    __table_args__ = (UniqueConstraint("media_path", "torrent_hash", name="uq_torrent_match_cache_pair"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    media_path = Column(String, nullable=False, index=True)
+    torrent_hash = Column(String, nullable=False, index=True)
+    fingerprint = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ScanVerdict(Base):
+    """Verdict (règles + garde-fous) d'un média au dernier scan, réutilisé par les scans incrémentaux.
+
+    Le verdict est reporté tel quel tant que le fingerprint des entrées du média et le hash du
+    contexte d'évaluation (règles, exclusions, protections) sont inchangés et que `expires_at`
+    (prochain franchissement d'un seuil en jours) n'est pas atteint.
+    """
+    __tablename__ = "scan_verdicts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_key = Column(String, nullable=False, unique=True, index=True)  # movie:<radarr_id>, episode:<sonarr_episode_id>...
+    fingerprint = Column(String, nullable=False)
+    context_hash = Column(String, nullable=False)
+    is_candidate = Column(Boolean, default=False, nullable=False)
+    rule = Column(String, nullable=True)
+    protected_reason = Column(String, nullable=True)
+    expires_at = Column(DateTime, nullable=True)  # UTC, None = ne dépend pas du temps
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ScanProfile(Base):
+    """Profil de performance d'un scan (app.core.scan_profile), un par scan, réussi ou non.
+
+    profile_json: {stages (durée par étape), upstream (appels, octets reçus, retries, échecs par
+    service), caches (taux de hit), peak_rss_bytes, ...}
+    """
+    __tablename__ = "scan_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    plan_id = Column(Integer, ForeignKey("plans.id"), nullable=True, index=True)  # None si le scan a échoué
+    scan_id = Column(String, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    status = Column(String, nullable=False)  # completed, error
+    duration_ms = Column(Integer, nullable=False)
+    profile_json = Column(JSON, default=dict)
+
+    plan = relationship("Plan", back_populates="profile")
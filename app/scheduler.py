@@ -6,7 +6,7 @@ from datetime import datetime
 import logging
 
 from app.config import get_config
-from app.core.planner import Planner
+from app.core.scan_coordinator import scan_coordinator
 
 logger = logging.getLogger(__name__)
 
@@ -58,11 +58,13 @@ def start_scheduler():
 
 
 async def run_scheduled_scan():
-    """Exécute un scan planifié."""
+    """Exécute un scan planifié (sauté si un scan est déjà en cours)."""
+    if scan_coordinator.active_scan_id is not None:
+        logger.info(f"Scan {scan_coordinator.active_scan_id} already running, skipping scheduled scan")
+        return
     logger.info("Running scheduled scan")
     try:
-        planner = Planner()
-        plan_id = await planner.generate_plan()
+        plan_id = await scan_coordinator.run_scheduled_scan()
         logger.info(f"Scheduled scan completed, plan_id: {plan_id}")
     except Exception as e:
         logger.error(f"Error in scheduled scan: {str(e)}")
@@ -0,0 +1,161 @@
+"""Extraction en masse depuis les bases SQLite de Radarr/Sonarr (montées en lecture seule).
+
+Quelques requêtes SQL remplacent les appels API (notamment un appel /episode par série côté
+Sonarr). Les dicts produits ont la même forme que les réponses de l'API v3 consommées par le
+planner (clés camelCase, tags en IDs, dates ISO, statistics.sizeOnDisk).
+"""
+import json
+import sqlite3
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set
+
+from app.utils.sqlite_readonly import connect_readonly
+
+
+def _iso_utc(value: Any) -> Optional[str]:
+    """Date stockée par Radarr/Sonarr ("2023-01-02 03:04:05.1234567Z") → ISO API ("2023-01-02T03:04:05Z")."""
+    if not value:
+        return None
+    text = str(value).replace(" ", "T")
+    return text[:19] + "Z" if len(text) >= 19 else text
+
+
+def _tag_ids(value: Any) -> List[int]:
+    """Colonne Tags (JSON "[1, 2]") → liste d'IDs."""
+    if not value:
+        return []
+    try:
+        tags = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return [tag for tag in tags if isinstance(tag, int)] if isinstance(tags, list) else []
+
+
+def _columns(connection: sqlite3.Connection, table: str) -> Set[str]:
+    return {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+
+
+def _tag_labels(connection: sqlite3.Connection) -> Dict[int, str]:
+    return {row["Id"]: row["Label"] for row in connection.execute("SELECT Id, Label FROM Tags")}
+
+
+class RadarrDatabase:
+    """Lecture des films depuis radarr.db."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.tag_labels: Dict[int, str] = {}
+
+    def get_movies(self) -> List[Dict[str, Any]]:
+        """Tous les films, au format de GET /api/v3/movie."""
+        with connect_readonly(self.db_path) as connection:
+            self.tag_labels = _tag_labels(connection)
+            sizes = {
+                row["MovieId"]: row["Size"] or 0
+                for row in connection.execute("SELECT MovieId, SUM(Size) AS Size FROM MovieFiles GROUP BY MovieId")
+            }
+            if "MovieMetadataId" in _columns(connection, "Movies"):
+                # Radarr v4+: titre/année/IDs dans MovieMetadata
+                rows = connection.execute("""
+                    SELECT m.Id, m.Path, m.Monitored, m.Added, m.Tags,
+                           mm.Title, mm.Year, mm.TmdbId, mm.ImdbId
+                    FROM Movies m
+                    JOIN MovieMetadata mm ON mm.Id = m.MovieMetadataId
+                """).fetchall()
+            else:
+                rows = connection.execute("""
+                    SELECT Id, Path, Monitored, Added, Tags, Title, Year, TmdbId, ImdbId
+                    FROM Movies
+                """).fetchall()
+
+        movies = []
+        for row in rows:
+            size_on_disk = sizes.get(row["Id"], 0)
+            movies.append({
+                "id": row["Id"],
+                "title": row["Title"],
+                "year": row["Year"],
+                "tmdbId": row["TmdbId"],
+                "imdbId": row["ImdbId"],
+                "path": row["Path"],
+                "monitored": bool(row["Monitored"]),
+                "added": _iso_utc(row["Added"]),
+                "tags": _tag_ids(row["Tags"]),
+                "sizeOnDisk": size_on_disk,
+                "statistics": {"sizeOnDisk": size_on_disk},
+            })
+        return movies
+
+
+class SonarrDatabase:
+    """Lecture des séries, épisodes et fichiers d'épisodes depuis sonarr.db."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.tag_labels: Dict[int, str] = {}
+
+    def get_series(self) -> List[Dict[str, Any]]:
+        """Toutes les séries, au format de GET /api/v3/series."""
+        with connect_readonly(self.db_path) as connection:
+            self.tag_labels = _tag_labels(connection)
+            tmdb_column = "TmdbId" if "TmdbId" in _columns(connection, "Series") else "NULL"
+            sizes = {
+                row["SeriesId"]: row["Size"] or 0
+                for row in connection.execute("SELECT SeriesId, SUM(Size) AS Size FROM EpisodeFiles GROUP BY SeriesId")
+            }
+            rows = connection.execute(f"""
+                SELECT Id, Title, Year, TvdbId, {tmdb_column} AS TmdbId, ImdbId, Path, Monitored, Added, Tags
+                FROM Series
+            """).fetchall()
+
+        return [{
+            "id": row["Id"],
+            "title": row["Title"],
+            "year": row["Year"],
+            "tvdbId": row["TvdbId"],
+            "tmdbId": row["TmdbId"],
+            "imdbId": row["ImdbId"],
+            "path": row["Path"],
+            "monitored": bool(row["Monitored"]),
+            "added": _iso_utc(row["Added"]),
+            "tags": _tag_ids(row["Tags"]),
+            "statistics": {"sizeOnDisk": sizes.get(row["Id"], 0)},
+        } for row in rows]
+
+    def get_episodes_by_series(self) -> Dict[int, List[Dict[str, Any]]]:
+        """Tous les épisodes (avec leur fichier), groupés par série, au format de GET /api/v3/episode."""
+        with connect_readonly(self.db_path) as connection:
+            rows = connection.execute("""
+                SELECT e.Id, e.SeriesId, e.SeasonNumber, e.EpisodeNumber, e.Title, e.Monitored,
+                       e.EpisodeFileId, e.AirDateUtc,
+                       f.RelativePath, f.Size, f.DateAdded, s.Path AS SeriesPath
+                FROM Episodes e
+                JOIN Series s ON s.Id = e.SeriesId
+                LEFT JOIN EpisodeFiles f ON f.Id = e.EpisodeFileId AND e.EpisodeFileId > 0
+                ORDER BY e.SeriesId, e.SeasonNumber, e.EpisodeNumber
+            """).fetchall()
+
+        episodes: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            has_file = bool(row["EpisodeFileId"]) and row["RelativePath"] is not None
+            episode = {
+                "id": row["Id"],
+                "seriesId": row["SeriesId"],
+                "seasonNumber": row["SeasonNumber"],
+                "episodeNumber": row["EpisodeNumber"],
+                "title": row["Title"],
+                "monitored": bool(row["Monitored"]),
+                "airDateUtc": _iso_utc(row["AirDateUtc"]),
+                "hasFile": has_file,
+                "episodeFileId": row["EpisodeFileId"] or 0,
+            }
+            if has_file:
+                episode["episodeFile"] = {
+                    "id": row["EpisodeFileId"],
+                    "relativePath": row["RelativePath"],
+                    "path": f"{row['SeriesPath'].rstrip('/')}/{row['RelativePath']}" if row["SeriesPath"] else None,
+                    "size": row["Size"] or 0,
+                    "dateAdded": _iso_utc(row["DateAdded"]),
+                }
+            episodes[row["SeriesId"]].append(episode)
+        return dict(episodes)
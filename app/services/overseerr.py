@@ -1,12 +1,52 @@
 """Overseerr API client."""
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 from datetime import datetime, timedelta
 
 from app.config import get_config
 from app.core.models import MediaItem
+from app.core.watch_stats import UserWatchIndex, watch_index_key
 from app.utils.http_client import get_http_client
 
 
+class OverseerrRequestIndex:
+    """Demandes Overseerr indexées par (type, tmdbId) et tvdbId, construit une fois par scan.
+
+    Les films ne correspondent qu'aux demandes "movie" (TMDb ID), les séries et épisodes aux
+    demandes "tv" (TVDb ou TMDb ID). Comme pour un parcours de la liste, la dernière demande
+    correspondante l'emporte.
+    """
+
+    def __init__(self, requests: List[Dict[str, Any]]):
+        # Valeurs: (position dans la liste, demande)
+        self._by_tmdb: Dict[Tuple[str, int], Tuple[int, Dict[str, Any]]] = {}
+        self._by_tvdb: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+        for position, request in enumerate(requests):
+            media_type = request.get("type")
+            media = request.get("media") or {}
+            if media_type not in ("movie", "tv"):
+                continue
+            if media.get("tmdbId"):
+                self._by_tmdb[(media_type, media["tmdbId"])] = (position, request)
+            if media_type == "tv" and media.get("tvdbId"):
+                self._by_tvdb[media["tvdbId"]] = (position, request)
+
+    def __len__(self) -> int:
+        return len(self._by_tmdb) + len(self._by_tvdb)
+
+    def lookup(self, media_item: MediaItem) -> Optional[Dict[str, Any]]:
+        """Dernière demande correspondant au média, None si aucune."""
+        if media_item.type == "movie":
+            match = self._by_tmdb.get(("movie", media_item.tmdb_id)) if media_item.tmdb_id else None
+            return match[1] if match else None
+
+        matches = []
+        if media_item.tvdb_id and media_item.tvdb_id in self._by_tvdb:
+            matches.append(self._by_tvdb[media_item.tvdb_id])
+        if media_item.tmdb_id and ("tv", media_item.tmdb_id) in self._by_tmdb:
+            matches.append(self._by_tmdb[("tv", media_item.tmdb_id)])
+        return max(matches, key=lambda match: match[0])[1] if matches else None
+
+
 class OverseerrService:
     """Service pour interagir avec Overseerr."""
 
@@ -62,23 +102,32 @@ class OverseerrService:
         data = response.json()
         return data.get("results", [])
 
-    def enrich_media_item(self, media_item: MediaItem, overseerr_requests: List[Dict[str, Any]]) -> None:
-        """Enrichit un MediaItem avec les données Overseerr."""
-        # Find matching request
-        for request in overseerr_requests:
-            media_type = request.get("type")
-            media_id = None
-
-            if media_type == "movie":
-                media_id = request.get("media", {}).get("tmdbId")
-                if media_item.tmdb_id and media_id == media_item.tmdb_id:
-                    self._apply_request_to_item(media_item, request)
-            elif media_type == "tv":
-                tvdb_id = request.get("media", {}).get("tvdbId")
-                tmdb_id = request.get("media", {}).get("tmdbId")
-                if (media_item.tvdb_id and tvdb_id == media_item.tvdb_id) or \
-                   (media_item.tmdb_id and tmdb_id == media_item.tmdb_id):
-                    self._apply_request_to_item(media_item, request)
+    def enrich_media_item(
+        self,
+        media_item: MediaItem,
+        overseerr_requests: Union[List[Dict[str, Any]], "OverseerrRequestIndex"],
+    ) -> None:
+        """Enrichit un MediaItem avec les données Overseerr (la dernière demande correspondante l'emporte).
+
+        Args:
+            media_item: Média à enrichir
+            overseerr_requests: Index construit une fois par scan (ou liste brute, indexée à la volée)
+        """
+        if not isinstance(overseerr_requests, OverseerrRequestIndex):
+            overseerr_requests = OverseerrRequestIndex(overseerr_requests)
+        request = overseerr_requests.lookup(media_item)
+        if request is not None:
+            self._apply_request_to_item(media_item, request)
+
+    @staticmethod
+    def inherit_request_state(episode_item: MediaItem, series_item: MediaItem) -> None:
+        """Reporte sur un épisode l'état Overseerr de sa série (les demandes portent sur la série)."""
+        episode_item.overseerr_request_id = series_item.overseerr_request_id
+        episode_item.overseerr_status = series_item.overseerr_status
+        episode_item.overseerr_requested_by = series_item.overseerr_requested_by
+        episode_item.overseerr_requested_at = series_item.overseerr_requested_at
+        if "overseerr_requester_names" in series_item.metadata:
+            episode_item.metadata["overseerr_requester_names"] = series_item.metadata["overseerr_requester_names"]
 
     def _apply_request_to_item(self, media_item: MediaItem, request: Dict[str, Any]) -> None:
         """Applique les données d'une request Overseerr à un MediaItem."""
@@ -87,6 +136,13 @@ class OverseerrService:
         status = request.get("status", "")
         media_item.overseerr_status = str(status).lower() if status else ""
         media_item.overseerr_requested_by = request.get("requestedBy", {}).get("username") if request.get("requestedBy") else None
+        # Noms du demandeur tels que Tautulli peut les connaître (username Plex en priorité)
+        requested_by = request.get("requestedBy") or {}
+        requester_names = []
+        for name in (requested_by.get("plexUsername"), requested_by.get("username"), requested_by.get("displayName")):
+            if name and name not in requester_names:
+                requester_names.append(name)
+        media_item.metadata["overseerr_requester_names"] = requester_names
 
         # Parse requested date
         if request.get("createdAt"):
@@ -97,11 +153,31 @@ class OverseerrService:
             except (ValueError, AttributeError):
                 pass
 
-    def is_protected(self, media_item: MediaItem) -> tuple[bool, Optional[str]]:
-        """Vérifie si un média est protégé par Overseerr."""
-        # Si le média a un request_id Overseerr, il provient d'Overseerr -> PROTÉGER TOUJOURS
+    def requester_has_watched(self, media_item: MediaItem, watch_index: UserWatchIndex) -> bool:
+        """Le demandeur Overseerr du média l'a-t-il vu (d'après l'index Tautulli) ?"""
+        key = watch_index_key(media_item)
+        names = media_item.metadata.get("overseerr_requester_names") or [media_item.overseerr_requested_by]
+        return any(watch_index.has_watched(name, key) for name in names)
+
+    def is_protected(
+        self,
+        media_item: MediaItem,
+        watch_index: Optional[UserWatchIndex] = None,
+    ) -> tuple[bool, Optional[str]]:
+        """Vérifie si un média est protégé par Overseerr.
+
+        Args:
+            media_item: Média à vérifier
+            watch_index: Index utilisateur → médias vus (requis pour requested_by_must_have_watched)
+        """
         if media_item.overseerr_request_id:
-            return True, f"Overseerr request (ID: {media_item.overseerr_request_id})"
+            if self.requested_by_must_have_watched and watch_index is not None:
+                # Protégé tant que le demandeur ne l'a pas vu, puis vérifications normales (statut, âge)
+                if not self.requester_has_watched(media_item, watch_index):
+                    return True, f"Overseerr requester has not watched yet ({media_item.overseerr_requested_by or 'unknown'})"
+            else:
+                # Si le média a un request_id Overseerr, il provient d'Overseerr -> PROTÉGER TOUJOURS
+                return True, f"Overseerr request (ID: {media_item.overseerr_request_id})"
         
         # Fallback: vérifier le status si pas de request_id mais status présent
         if not media_item.overseerr_status:
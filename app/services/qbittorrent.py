@@ -2,11 +2,15 @@
 from qbittorrentapi import Client
 from typing import List, Dict, Any, Optional
 from pathlib import Path
+import time
 import structlog
 
 from app.config import get_config
 from app.core.models import MediaItem
 from app.core.torrent_matcher import TorrentMatcher
+from app.core.match_cache import TorrentMatchCache
+from app.core.match_explain import ScanMatchExplanations
+from app.utils.upstream_stats import record_upstream_call
 
 logger = structlog.get_logger(__name__)
 
@@ -24,7 +28,12 @@ class QBittorrentService:
         self.protect_categories = config.qbittorrent.protect_categories
         self.match_mode = config.qbittorrent.match_mode
         self._client: Optional[Client] = None
-        self._torrent_matcher = TorrentMatcher(debug=True)  # Enable debug for better matching
+        # Logs par paire uniquement si le tracing est explicitement activé (coûteux sur gros scans)
+        self._torrent_matcher = TorrentMatcher(debug=config.qbittorrent.match_trace)
+        # Cache persistant des matchs, attaché par le planner pour la durée d'un scan
+        self.match_cache: Optional[TorrentMatchCache] = None
+        # Explications de matching du scan courant, attachées par le planner
+        self.explanations: Optional[ScanMatchExplanations] = None
 
     def _get_client(self) -> Client:
         """Get or create qBittorrent client."""
@@ -46,6 +55,8 @@ class QBittorrentService:
         try:
             client = self._get_client()
             torrents = client.torrents_info()
+            # qbittorrentapi n'expose pas la taille des réponses: seuls les appels sont comptés
+            record_upstream_call("qbittorrent")
             result = []
             logger.info(f"Fetching {len(torrents)} torrents from qBittorrent...")
 
@@ -54,6 +65,7 @@ class QBittorrentService:
                 torrent_files = []
                 try:
                     files = client.torrents_files(torrent_hash=torrent.hash)
+                    record_upstream_call("qbittorrent")
                     if files:
                         # Les fichiers peuvent être des dicts, des objets, ou des NamedTuples
                         for f in files:
@@ -79,6 +91,7 @@ class QBittorrentService:
                                 file_name = file_name.replace("\\", "/")
                                 torrent_files.append(file_name)
                 except Exception as e:
+                    record_upstream_call("qbittorrent", failed=True)
                     logger.debug(f"Error fetching torrent files for {torrent.hash[:8]}: {str(e)}")
                 
                 # Essayer d'obtenir content_path depuis différentes sources
@@ -185,13 +198,77 @@ class QBittorrentService:
         if not media_path:
             return []
 
-        # Utiliser le nouveau matcher
-        matching_hashes = self._torrent_matcher.find_matching_torrents(
-            media_path=media_path,
-            all_torrents=all_torrents,
+        started = time.perf_counter()
+        cached = 0
+        candidates = len(all_torrents)
+        # Réutiliser les matchs des scans précédents si le cache couvre cette liste de torrents
+        if self.match_cache is not None and all_torrents is self.match_cache.torrents:
+            matching_hashes = self.match_cache.find_matching_torrents(
+                self._torrent_matcher,
+                media_path=media_path,
+                media_title=media_title
+            )
+            cached = self.match_cache.last_reused
+            candidates = self.match_cache.last_candidates
+        else:
+            # Utiliser le nouveau matcher
+            matching_hashes = self._torrent_matcher.find_matching_torrents(
+                media_path=media_path,
+                all_torrents=all_torrents,
+                media_title=media_title
+            )
+
+        if self.explanations is not None:
+            self.explanations.record(
+                media_path,
+                media_title,
+                "cached" if cached or candidates < len(all_torrents) else "full",
+                candidates,
+                len(matching_hashes),
+                self._torrent_matcher.last_match_reasons,
+                (time.perf_counter() - started) * 1000,
+                cached=cached,
+            )
+
+        return matching_hashes
+
+    def find_torrents_for_episode(
+        self,
+        media_path: Optional[str],
+        season_number: Optional[int],
+        episode_number: Optional[int],
+        series_torrents: List[Dict[str, Any]],
+        media_title: Optional[str] = None
+    ) -> List[str]:
+        """Trouve les torrents d'un épisode parmi les torrents déjà associés à sa série.
+
+        Args:
+            media_path: Chemin du fichier de l'épisode (requis pour un season pack, qui doit le contenir)
+            season_number: Numéro de saison
+            episode_number: Numéro d'épisode
+            series_torrents: Torrents candidats (ceux matchés sur le dossier de la série)
+            media_title: Titre de l'épisode (optionnel)
+        """
+        if not series_torrents:
+            return []
+        started = time.perf_counter()
+        matching_hashes = self._torrent_matcher.find_episode_torrents(
+            media_path,
+            season_number,
+            episode_number,
+            series_torrents,
             media_title=media_title
         )
-
+        if self.explanations is not None:
+            self.explanations.record(
+                media_path,
+                media_title,
+                "episode",
+                len(series_torrents),
+                len(matching_hashes),
+                self._torrent_matcher.last_match_reasons,
+                (time.perf_counter() - started) * 1000,
+            )
         return matching_hashes
 
     async def delete_torrents(self, hashes: List[str], delete_files: bool = True) -> bool:
@@ -1,11 +1,16 @@
 """Radarr API client."""
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
 from pathlib import Path
+import asyncio
+import structlog
 
 from app.config import get_config
-from app.core.models import MediaItem
+from app.core.models import MediaItem, intern_strings
+from app.services.arr_db import RadarrDatabase
 from app.utils.http_client import get_http_client
 
+logger = structlog.get_logger(__name__)
+
 
 class RadarrService:
     """Service pour interagir avec Radarr."""
@@ -18,6 +23,7 @@ class RadarrService:
         self.api_key = config.radarr.api_key
         self.protected_tags = config.radarr.protected_tags
         self.delete_method = config.radarr.delete_method
+        self.db_path = config.radarr.db_path
         self._tag_cache: Dict[int, str] = {}  # Cache pour mapper tag ID -> label
 
     def _get_headers(self) -> Dict[str, str]:
@@ -65,7 +71,18 @@ class RadarrService:
             return {}
 
     async def get_movies(self) -> List[Dict[str, Any]]:
-        """Récupère tous les films depuis Radarr."""
+        """Récupère tous les films depuis Radarr (base SQLite si db_path configuré, sinon API)."""
+        if self.db_path:
+            try:
+                database = RadarrDatabase(self.db_path)
+                movies = await asyncio.to_thread(database.get_movies)
+                if database.tag_labels:
+                    self._tag_cache = database.tag_labels
+                logger.info("radarr_movies_from_database", count=len(movies))
+                return movies
+            except Exception as e:
+                logger.warning("radarr_database_failed_fallback_api", db_path=self.db_path, error=str(e))
+
         http_client = get_http_client()
         response = await http_client.get_async(
             f"{self.base_url}/api/v3/movie",
@@ -75,6 +92,27 @@ class RadarrService:
         )
         return response.json()
 
+    async def get_movies_by_tmdb_ids(self, tmdb_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Films Radarr de ces IDs TMDb (un appel /movie?tmdbId= par film; filtre local en mode db_path)."""
+        tmdb_ids = set(tmdb_ids)
+        if self.db_path:
+            return [movie for movie in await self.get_movies() if movie.get("tmdbId") in tmdb_ids]
+
+        http_client = get_http_client()
+
+        async def fetch(tmdb_id: int) -> List[Dict[str, Any]]:
+            response = await http_client.get_async(
+                f"{self.base_url}/api/v3/movie",
+                service_name="radarr",
+                headers=self._get_headers(),
+                params={"tmdbId": tmdb_id},
+                timeout=30.0
+            )
+            return response.json()
+
+        results = await asyncio.gather(*(fetch(tmdb_id) for tmdb_id in sorted(tmdb_ids)))
+        return [movie for movies in results for movie in movies]
+
     def get_movies_sync(self) -> List[Dict[str, Any]]:
         """Récupère tous les films depuis Radarr (synchronous)."""
         http_client = get_http_client()
@@ -112,12 +150,12 @@ class RadarrService:
             tag_ids = radarr_movie.get("tags", [])
             tag_labels_map = self._get_tag_labels_sync()
             # Convertir les IDs en labels, ou garder l'ID si le label n'est pas trouvé
-            media_item.tags = [
+            media_item.tags = intern_strings([
                 tag_labels_map.get(tag_id, str(tag_id)) 
                 if isinstance(tag_id, int) 
                 else (tag_id.get("label", "") if isinstance(tag_id, dict) else str(tag_id))
                 for tag_id in tag_ids
-            ]
+            ])
         # Size on disk depuis Radarr (prioritaire)
         if radarr_movie.get("sizeOnDisk"):
             media_item.size_bytes = radarr_movie.get("sizeOnDisk", 0)
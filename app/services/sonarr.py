@@ -1,10 +1,15 @@
 """Sonarr API client."""
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
+import asyncio
+import structlog
 
 from app.config import get_config
-from app.core.models import MediaItem
+from app.core.models import MediaItem, intern_strings
+from app.services.arr_db import SonarrDatabase
 from app.utils.http_client import get_http_client
 
+logger = structlog.get_logger(__name__)
+
 
 class SonarrService:
     """Service pour interagir avec Sonarr."""
@@ -17,6 +22,10 @@ class SonarrService:
         self.api_key = config.sonarr.api_key
         self.protected_tags = config.sonarr.protected_tags
         self._tag_cache: Dict[int, str] = {}  # Cache pour mapper tag ID -> label
+        self.db_path = config.sonarr.db_path
+        # Épisodes de toutes les séries lus en une requête depuis la base (mode db_path)
+        self._db_episodes: Optional[Dict[int, List[Dict[str, Any]]]] = None
+        self._db_episodes_failed = False
 
     def _get_headers(self) -> Dict[str, str]:
         """Get API headers."""
@@ -60,8 +69,35 @@ class SonarrService:
         except Exception as e:
             return {}
 
+    def _get_db_episodes(self, series_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Épisodes d'une série depuis la base (chargée en masse au premier appel), None si indisponible."""
+        if not self.db_path or self._db_episodes_failed:
+            return None
+        if self._db_episodes is None:
+            try:
+                self._db_episodes = SonarrDatabase(self.db_path).get_episodes_by_series()
+                logger.info("sonarr_episodes_from_database",
+                           series=len(self._db_episodes),
+                           episodes=sum(len(episodes) for episodes in self._db_episodes.values()))
+            except Exception as e:
+                logger.warning("sonarr_database_failed_fallback_api", db_path=self.db_path, error=str(e))
+                self._db_episodes_failed = True
+                return None
+        return self._db_episodes.get(series_id, [])
+
     async def get_series(self) -> List[Dict[str, Any]]:
-        """Récupère toutes les séries depuis Sonarr."""
+        """Récupère toutes les séries depuis Sonarr (base SQLite si db_path configuré, sinon API)."""
+        if self.db_path:
+            try:
+                database = SonarrDatabase(self.db_path)
+                series = await asyncio.to_thread(database.get_series)
+                if database.tag_labels:
+                    self._tag_cache = database.tag_labels
+                logger.info("sonarr_series_from_database", count=len(series))
+                return series
+            except Exception as e:
+                logger.warning("sonarr_database_failed_fallback_api", db_path=self.db_path, error=str(e))
+
         http_client = get_http_client()
         response = await http_client.get_async(
             f"{self.base_url}/api/v3/series",
@@ -71,6 +107,27 @@ class SonarrService:
         )
         return response.json()
 
+    async def get_series_by_tvdb_ids(self, tvdb_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Séries Sonarr de ces IDs TVDb (un appel /series?tvdbId= par série; filtre local en mode db_path)."""
+        tvdb_ids = set(tvdb_ids)
+        if self.db_path:
+            return [series for series in await self.get_series() if series.get("tvdbId") in tvdb_ids]
+
+        http_client = get_http_client()
+
+        async def fetch(tvdb_id: int) -> List[Dict[str, Any]]:
+            response = await http_client.get_async(
+                f"{self.base_url}/api/v3/series",
+                service_name="sonarr",
+                headers=self._get_headers(),
+                params={"tvdbId": tvdb_id},
+                timeout=30.0
+            )
+            return response.json()
+
+        results = await asyncio.gather(*(fetch(tvdb_id) for tvdb_id in sorted(tvdb_ids)))
+        return [series for matches in results for series in matches]
+
     def get_series_sync(self) -> List[Dict[str, Any]]:
         """Récupère toutes les séries depuis Sonarr (synchronous)."""
         http_client = get_http_client()
@@ -84,12 +141,17 @@ class SonarrService:
 
     async def get_episodes(self, series_id: int) -> List[Dict[str, Any]]:
         """Récupère les épisodes d'une série."""
+        episodes = await asyncio.to_thread(self._get_db_episodes, series_id)
+        if episodes is not None:
+            return episodes
+
         http_client = get_http_client()
         response = await http_client.get_async(
             f"{self.base_url}/api/v3/episode",
             service_name="sonarr",
             headers=self._get_headers(),
-            params={"seriesId": series_id},
+            # includeEpisodeFile: taille et chemin du fichier (matching des season packs)
+            params={"seriesId": series_id, "includeEpisodeFile": "true"},
             timeout=30.0
         )
         return response.json()
@@ -127,12 +189,16 @@ class SonarrService:
 
     def get_episodes_sync(self, series_id: int) -> List[Dict[str, Any]]:
         """Récupère les épisodes d'une série (synchronous)."""
+        episodes = self._get_db_episodes(series_id)
+        if episodes is not None:
+            return episodes
+
         http_client = get_http_client()
         response = http_client.get_sync(
             f"{self.base_url}/api/v3/episode",
             service_name="sonarr",
             headers=self._get_headers(),
-            params={"seriesId": series_id},
+            params={"seriesId": series_id, "includeEpisodeFile": "true"},
             timeout=30.0
         )
         return response.json()
@@ -148,12 +214,12 @@ class SonarrService:
             tag_ids = sonarr_series.get("tags", [])
             tag_labels_map = self._get_tag_labels_sync()
             # Convertir les IDs en labels, ou garder l'ID si le label n'est pas trouvé
-            media_item.tags = [
+            media_item.tags = intern_strings([
                 tag_labels_map.get(tag_id, str(tag_id)) 
                 if isinstance(tag_id, int) 
                 else (tag_id.get("label", "") if isinstance(tag_id, dict) else str(tag_id))
                 for tag_id in tag_ids
-            ]
+            ])
         # Size on disk depuis Sonarr statistics
         if sonarr_series.get("statistics"):
             stats = sonarr_series.get("statistics", {})
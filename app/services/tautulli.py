@@ -4,11 +4,65 @@ from datetime import datetime
 import structlog
 
 from app.config import get_config
+from app.core.guid_parser import parse_guid
 from app.core.models import MediaItem
+from app.core.watch_stats import UserWatchIndex, WatchHistoryColumns
 from app.utils.http_client import get_http_client
+from app.utils.sqlite_readonly import connect_readonly
 
 logger = structlog.get_logger(__name__)
 
+# Taille des pages get_library_media_info
+_LIBRARY_PAGE_SIZE = 1000
+
+# Détails de bibliothèque réutilisés d'un scan à l'autre (process API), par URL Tautulli:
+# - IDs externes résolus via get_metadata (agents plex://), le rating_key d'un média étant stable
+# - lectures par épisode d'une série, redemandées seulement si ses agrégats ont changé
+_library_ids_cache: Dict[Tuple[str, str], Tuple[Optional[int], Optional[int]]] = {}
+_library_episodes_cache: Dict[Tuple[str, str], Tuple[Tuple[Any, Any], Dict[Tuple[int, int], Dict[str, Any]]]] = {}
+
+# Agrégats de lectures par (média, utilisateur) depuis la base Tautulli (mode "database").
+# Colonnes nues avec MAX(): SQLite les prend sur la ligne de la lecture la plus récente.
+_DB_MOVIE_SQL = """
+    SELECT h.rating_key AS rating_key, m.guid AS guid, h.user AS user,
+           MAX(h.started) AS last_played, COUNT(*) AS plays
+    FROM session_history h
+    JOIN session_history_metadata m ON m.id = h.id
+    WHERE h.media_type = 'movie'
+    GROUP BY h.rating_key, h.user
+"""
+_DB_EPISODE_SQL = """
+    SELECT h.grandparent_rating_key AS grandparent_rating_key, h.rating_key AS rating_key,
+           {grandparent_guid} AS grandparent_guid, m.guid AS guid,
+           m.parent_media_index AS season_num, m.media_index AS episode_num, h.user AS user,
+           MAX(h.started) AS last_played, COUNT(*) AS plays
+    FROM session_history h
+    JOIN session_history_metadata m ON m.id = h.id
+    WHERE h.media_type = 'episode'
+    GROUP BY h.grandparent_rating_key, m.parent_media_index, m.media_index, h.user
+"""
+
+
+def parse_history_date(date_value: Any) -> Optional[datetime]:
+    """Parse la date d'une entrée d'historique (timestamp Unix ou chaîne ISO)."""
+    if not date_value:
+        return None
+    try:
+        if isinstance(date_value, (int, float)):
+            return datetime.fromtimestamp(date_value)
+        if isinstance(date_value, str):
+            try:
+                return datetime.fromisoformat(date_value.replace("Z", "+00:00"))
+            except ValueError:
+                # Fallback: timestamp sous forme de chaîne
+                try:
+                    return datetime.fromtimestamp(float(date_value))
+                except (ValueError, OSError):
+                    return None
+    except (ValueError, OSError, TypeError) as e:
+        logger.debug("date_parsing_failed", date_value=date_value, error=str(e))
+    return None
+
 
 class TautulliService:
     """Service pour interagir avec Tautulli - Source de vérité pour watch history."""
@@ -19,21 +73,48 @@ class TautulliService:
             raise ValueError("Tautulli configuration not found or disabled")
         self.base_url = config.tautulli.url.rstrip("/")
         self.api_key = config.tautulli.api_key
+        self.watch_data_source = config.tautulli.watch_data_source
+        self.db_path = config.tautulli.db_path
+        # Index utilisateur → médias vus, alimenté par les watch maps construites depuis l'historique
+        # (None si les watch maps viennent des agrégats de bibliothèque, qui n'ont pas d'utilisateurs)
+        self.user_watch_index: Optional[UserWatchIndex] = UserWatchIndex()
 
     def _get_params(self) -> Dict[str, Any]:
         """Get base API parameters."""
         return {"apikey": self.api_key}
 
-    async def get_history(self, rating_key: Optional[str] = None, user: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Récupère l'historique de visionnage depuis Tautulli."""
+    async def get_history(
+        self,
+        rating_key: Optional[str] = None,
+        user: Optional[str] = None,
+        grandparent_rating_key: Optional[str] = None,
+        after: Optional[str] = None,
+        start: int = 0,
+        length: int = 10000,
+    ) -> List[Dict[str, Any]]:
+        """Récupère l'historique de visionnage depuis Tautulli.
+
+        Args:
+            rating_key: Limite à un film/épisode
+            user: Limite à un utilisateur
+            grandparent_rating_key: Limite aux épisodes d'une série
+            after: Limite aux lectures à partir de cette date ("YYYY-MM-DD")
+            start: Position de la première ligne (pagination)
+            length: Nombre maximum de lignes retournées
+        """
         http_client = get_http_client()
         params = self._get_params()
         params["cmd"] = "get_history"
-        params["length"] = 10000  # Get a lot of history
+        params["start"] = start
+        params["length"] = length
         if rating_key:
             params["rating_key"] = rating_key
         if user:
             params["user"] = user
+        if grandparent_rating_key:
+            params["grandparent_rating_key"] = grandparent_rating_key
+        if after:
+            params["after"] = after
 
         response = await http_client.get_async(
             f"{self.base_url}/api/v2",
@@ -42,7 +123,12 @@ class TautulliService:
             timeout=60.0
         )
         data = response.json()
-        return data.get("response", {}).get("data", {}).get("data", [])
+        result = data.get("response", {}).get("data", {})
+        if isinstance(result, list):
+            return result
+        if isinstance(result, dict) and isinstance(result.get("data"), list):
+            return result["data"]
+        return []
 
     def get_history_sync(self, rating_key: Optional[str] = None, user: Optional[str] = None) -> List[Dict[str, Any]]:
         """Récupère l'historique de visionnage depuis Tautulli (synchronous)."""
@@ -95,32 +181,11 @@ class TautulliService:
         Formats supportés:
         - "com.plexapp.agents.thetvdb://121361?lang=en" (série)
         - "com.plexapp.agents.thetvdb://121361/6/1?lang=en" (épisode)
-        - "thetvdb://121361"
+        - "thetvdb://121361", "tvdb://121361"
         """
-        if not isinstance(guid_str, str) or "tvdb" not in guid_str.lower():
+        if not isinstance(guid_str, str):
             return None
-        
-        try:
-            # Format: "com.plexapp.agents.thetvdb://121361?lang=en" ou "com.plexapp.agents.thetvdb://121361/6/1?lang=en"
-            # On veut extraire 121361 (le TVDb ID de la série)
-            # Après "://", prendre la partie avant le premier "/" ou "?"
-            if "://" in guid_str:
-                after_protocol = guid_str.split("://")[-1]
-                # Enlever les paramètres de query (?lang=en)
-                after_protocol = after_protocol.split("?")[0]
-                # Prendre la première partie avant "/" (saison/épisode)
-                tvdb_id_str = after_protocol.split("/")[0]
-                return int(tvdb_id_str)
-            else:
-                # Format alternatif: "thetvdb:121361"
-                parts = guid_str.split(":")
-                if len(parts) >= 2:
-                    tvdb_id_str = parts[-1].split("/")[0].split("?")[0]
-                    return int(tvdb_id_str)
-        except (ValueError, IndexError, AttributeError) as e:
-            logger.debug("tvdb_id_extraction_failed", guid=guid_str, error=str(e))
-        
-        return None
+        return parse_guid(guid_str).tvdb_id
 
     def _extract_tvdb_id_from_entry(self, entry: Dict[str, Any], for_series: bool = False) -> Optional[int]:
         """Extrait le TVDb ID depuis une entrée d'historique Tautulli.
@@ -200,28 +265,9 @@ class TautulliService:
         - "tmdb://12345"
         - "tmdb:12345"
         """
-        if not isinstance(guid_str, str) or "tmdb" not in guid_str.lower():
+        if not isinstance(guid_str, str):
             return None
-        
-        try:
-            # Format: "com.plexapp.agents.themoviedb://12345?lang=en" ou "tmdb://12345"
-            if "://" in guid_str:
-                after_protocol = guid_str.split("://")[-1]
-                # Enlever les paramètres de query
-                after_protocol = after_protocol.split("?")[0]
-                # Prendre la première partie (pas de saison/épisode pour les films)
-                tmdb_id_str = after_protocol.split("/")[0]
-                return int(tmdb_id_str)
-            else:
-                # Format alternatif: "tmdb:12345"
-                parts = guid_str.split(":")
-                if len(parts) >= 2:
-                    tmdb_id_str = parts[-1].split("/")[0].split("?")[0]
-                    return int(tmdb_id_str)
-        except (ValueError, IndexError, AttributeError) as e:
-            logger.debug("tmdb_id_extraction_failed", guid=guid_str, error=str(e))
-        
-        return None
+        return parse_guid(guid_str).tmdb_id
 
     def _extract_tmdb_id_from_entry(self, entry: Dict[str, Any]) -> Optional[int]:
         """Extrait le TMDb ID depuis une entrée d'historique Tautulli.
@@ -291,9 +337,317 @@ class TautulliService:
             logger.debug("get_metadata_error", rating_key=rating_key, error=str(e))
             return None
 
-    def get_movie_watch_map(self) -> Dict[int, Dict[str, Any]]:
+    def get_libraries_sync(self) -> List[Dict[str, Any]]:
+        """Récupère la liste des bibliothèques Tautulli (synchronous)."""
+        http_client = get_http_client()
+        params = self._get_params()
+        params["cmd"] = "get_libraries"
+
+        response = http_client.get_sync(
+            f"{self.base_url}/api/v2",
+            service_name="tautulli",
+            params=params,
+            timeout=30.0
+        )
+        data = response.json().get("response", {}).get("data", [])
+        return data if isinstance(data, list) else []
+
+    def iter_library_media_info(
+        self,
+        section_id: Optional[str] = None,
+        rating_key: Optional[str] = None,
+    ):
+        """Parcourt get_library_media_info page par page (synchronous).
+
+        Args:
+            section_id: Bibliothèque à parcourir (films ou séries)
+            rating_key: Enfants d'un média (saisons d'une série, épisodes d'une saison)
+
+        Yields:
+            Lignes avec rating_key, media_index, guid, last_played et play_count
+        """
+        http_client = get_http_client()
+        start = 0
+        while True:
+            params = self._get_params()
+            params["cmd"] = "get_library_media_info"
+            params["start"] = start
+            params["length"] = _LIBRARY_PAGE_SIZE
+            if section_id:
+                params["section_id"] = section_id
+            if rating_key:
+                params["rating_key"] = rating_key
+
+            response = http_client.get_sync(
+                f"{self.base_url}/api/v2",
+                service_name="tautulli",
+                params=params,
+                timeout=60.0
+            )
+            result = response.json().get("response", {}).get("data", {}) or {}
+            rows = result.get("data", []) if isinstance(result, dict) else []
+            yield from rows
+
+            start += len(rows)
+            total = result.get("recordsFiltered", 0) if isinstance(result, dict) else 0
+            if not rows or len(rows) < _LIBRARY_PAGE_SIZE or start >= int(total or 0):
+                break
+
+    def _get_external_ids(self, row: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+        """(tmdb_id, tvdb_id) d'un média de bibliothèque (GUID de la ligne, sinon get_metadata)."""
+        parsed = parse_guid(row.get("guid") or "")
+        tmdb_id, tvdb_id = parsed.tmdb_id, parsed.tvdb_id
+        if tmdb_id or tvdb_id or not row.get("rating_key"):
+            return tmdb_id, tvdb_id
+
+        # Nouveaux agents Plex (plex://...): IDs externes uniquement dans les métadonnées
+        cache_key = (self.base_url, str(row["rating_key"]))
+        if cache_key in _library_ids_cache:
+            return _library_ids_cache[cache_key]
+        metadata = self._get_metadata_sync(str(row["rating_key"]))
+        for guid in (metadata or {}).get("guids", []) or []:
+            guid_str = guid.get("id", "") if isinstance(guid, dict) else guid
+            if not isinstance(guid_str, str):
+                continue
+            parsed = parse_guid(guid_str)
+            tmdb_id = tmdb_id or parsed.tmdb_id
+            tvdb_id = tvdb_id or parsed.tvdb_id
+        if metadata is not None:  # Erreur d'appel: redemandé au prochain scan
+            _library_ids_cache[cache_key] = (tmdb_id, tvdb_id)
+        return tmdb_id, tvdb_id
+
+    @staticmethod
+    def _library_watch_stats(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Watch stats d'une ligne get_library_media_info (None si jamais lu)."""
+        try:
+            play_count = int(row.get("play_count") or 0)
+        except (ValueError, TypeError):
+            play_count = 0
+        if play_count <= 0:
+            return None
+        return {
+            "last_watched_at": parse_history_date(row.get("last_played")),
+            "view_count": play_count,
+            "last_user": None,  # Les agrégats de bibliothèque ne portent pas l'utilisateur
+            "never_watched": False,
+            "rating_key": str(row["rating_key"]) if row.get("rating_key") else None,
+        }
+
+    @staticmethod
+    def _merge_watch_stats(watch_map: Dict[Any, Dict[str, Any]], key: Any, stats: Dict[str, Any]) -> None:
+        """Fusionne les stats d'un média présent plusieurs fois (plusieurs bibliothèques/versions)."""
+        existing = watch_map.get(key)
+        if existing is None:
+            watch_map[key] = stats
+            return
+        existing["view_count"] += stats["view_count"]
+        if stats["last_watched_at"] and (not existing["last_watched_at"] or
+                                         stats["last_watched_at"] > existing["last_watched_at"]):
+            existing["last_watched_at"] = stats["last_watched_at"]
+            existing["last_user"] = stats["last_user"]
+            existing["rating_key"] = stats["rating_key"]
+
+    def _library_show_episodes(self, show_rating_key: str) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """Lectures par (saison, épisode) d'une série: saisons lues, puis leurs épisodes lus."""
+        episodes: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for season_row in self.iter_library_media_info(rating_key=show_rating_key):
+            if not self._library_watch_stats(season_row) or season_row.get("media_index") in (None, ""):
+                continue
+            season_num = int(season_row["media_index"])
+            for episode_row in self.iter_library_media_info(rating_key=str(season_row["rating_key"])):
+                episode_stats = self._library_watch_stats(episode_row)
+                if not episode_stats or episode_row.get("media_index") in (None, ""):
+                    continue
+                self._merge_watch_stats(episodes, (season_num, int(episode_row["media_index"])), episode_stats)
+        return episodes
+
+    def get_library_watch_maps(self) -> Tuple[
+        Dict[int, Dict[str, Any]],
+        Dict[Tuple[int, int, int], Dict[str, Any]],
+        Dict[int, Dict[str, Any]],
+    ]:
+        """Construit les watch maps films/épisodes/séries depuis les agrégats de bibliothèque.
+
+        Seuls les médias lus (play_count > 0) sont détaillés: saisons et épisodes ne sont
+        parcourus que pour les séries/saisons lues, et seulement si les agrégats de la série
+        (play_count, last_played) ont changé depuis le scan précédent; get_metadata n'est
+        appelé qu'une fois par média sans GUID exploitable. En régime établi, un scan se
+        limite aux pages des bibliothèques et aux séries lues depuis le scan précédent (le
+        premier scan du process détaille toutes les séries lues).
+
+        Returns:
+            (movie_watch_map, episode_watch_map, series_watch_map), mêmes formats que
+            get_movie_watch_map/get_episode_watch_map/get_series_watch_map
+        """
+        logger.info("fetching_library_watch_maps")
+        movie_map: Dict[int, Dict[str, Any]] = {}
+        episode_map: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+        series_map: Dict[int, Dict[str, Any]] = {}
+        shows_fetched = shows_reused = 0
+
+        for library in self.get_libraries_sync():
+            section_type = str(library.get("section_type", "")).lower()
+            section_id = library.get("section_id")
+            if not section_id or section_type not in ("movie", "show"):
+                continue
+
+            for row in self.iter_library_media_info(section_id=str(section_id)):
+                stats = self._library_watch_stats(row)
+                if not stats:
+                    continue
+                tmdb_id, tvdb_id = self._get_external_ids(row)
+
+                if section_type == "movie":
+                    if tmdb_id:
+                        self._merge_watch_stats(movie_map, tmdb_id, stats)
+                    continue
+
+                if not tvdb_id:
+                    continue
+                self._merge_watch_stats(series_map, tvdb_id, stats)
+                show_key = (self.base_url, str(row["rating_key"]))
+                signature = (row.get("play_count"), row.get("last_played"))
+                cached = _library_episodes_cache.get(show_key)
+                if cached is not None and cached[0] == signature:
+                    episodes = cached[1]
+                    shows_reused += 1
+                else:
+                    episodes = self._library_show_episodes(str(row["rating_key"]))
+                    _library_episodes_cache[show_key] = (signature, episodes)
+                    shows_fetched += 1
+                for (season_num, episode_num), episode_stats in episodes.items():
+                    # Copie: les stats fusionnées ne doivent pas modifier le cache
+                    self._merge_watch_stats(episode_map, (tvdb_id, season_num, episode_num), dict(episode_stats))
+
+        logger.info("library_watch_maps_fetched",
+                   movies=len(movie_map),
+                   episodes=len(episode_map),
+                   series=len(series_map),
+                   shows_fetched=shows_fetched,
+                   shows_reused=shows_reused)
+        return movie_map, episode_map, series_map
+
+    def get_database_watch_maps(self) -> Tuple[
+        Dict[int, Dict[str, Any]],
+        Dict[Tuple[int, int, int], Dict[str, Any]],
+        Dict[int, Dict[str, Any]],
+    ]:
+        """Construit les watch maps depuis la base SQLite de Tautulli, ouverte en lecture seule.
+
+        Les lectures sont agrégées en SQL par (média, utilisateur): le Python ne voit qu'une
+        ligne par couple, ce qui alimente aussi l'index multi-utilisateurs. get_metadata n'est
+        appelé que pour les médias dont le GUID ne porte pas d'ID TMDb/TVDb (agents plex://).
+
+        Returns:
+            (movie_watch_map, episode_watch_map, series_watch_map), mêmes formats que
+            get_movie_watch_map/get_episode_watch_map/get_series_watch_map
+        """
+        if not self.db_path:
+            raise ValueError("tautulli.db_path is required for watch_data_source 'database'")
+
+        logger.info("fetching_database_watch_maps", db_path=self.db_path)
+        with connect_readonly(self.db_path) as connection:
+            metadata_columns = {row["name"] for row in connection.execute("PRAGMA table_info(session_history_metadata)")}
+            movie_rows = connection.execute(_DB_MOVIE_SQL).fetchall()
+            episode_rows = connection.execute(_DB_EPISODE_SQL.format(
+                grandparent_guid="m.grandparent_guid" if "grandparent_guid" in metadata_columns else "NULL"
+            )).fetchall()
+
+        def add_play(watch_map: Dict[Any, Dict[str, Any]], namespace: str, key: Any, row, rating_key: Any) -> None:
+            self._merge_watch_stats(watch_map, key, {
+                "last_watched_at": parse_history_date(row["last_played"]),
+                "view_count": int(row["plays"]),
+                "last_user": row["user"],
+                "never_watched": False,
+                "rating_key": str(rating_key) if rating_key else None,
+            })
+            if self.user_watch_index is not None:
+                self.user_watch_index.add((namespace, key), row["user"])
+
+        movie_map: Dict[int, Dict[str, Any]] = {}
+        tmdb_by_rating_key: Dict[Any, Optional[int]] = {}
+        for row in movie_rows:
+            rating_key = row["rating_key"]
+            if rating_key not in tmdb_by_rating_key:
+                tmdb_by_rating_key[rating_key] = self._get_external_ids(
+                    {"guid": row["guid"], "rating_key": rating_key}
+                )[0]
+            tmdb_id = tmdb_by_rating_key[rating_key]
+            if tmdb_id:
+                add_play(movie_map, "movie", tmdb_id, row, rating_key)
+
+        episode_map: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+        series_map: Dict[int, Dict[str, Any]] = {}
+        tvdb_by_series_key: Dict[Any, Optional[int]] = {}
+        for row in episode_rows:
+            series_key = row["grandparent_rating_key"]
+            if series_key not in tvdb_by_series_key:
+                # GUID de la série, sinon GUID legacy de l'épisode (thetvdb://SERIE/S/E), sinon get_metadata
+                tvdb_id = parse_guid(row["grandparent_guid"] or "").tvdb_id or parse_guid(row["guid"] or "").tvdb_id
+                if not tvdb_id:
+                    tvdb_id = self._get_external_ids({"guid": None, "rating_key": series_key})[1]
+                tvdb_by_series_key[series_key] = tvdb_id
+            tvdb_id = tvdb_by_series_key[series_key]
+            if not tvdb_id:
+                continue
+
+            add_play(series_map, "series", tvdb_id, row, series_key)
+            if row["season_num"] is None or row["episode_num"] is None:
+                continue
+            try:
+                key = (tvdb_id, int(row["season_num"]), int(row["episode_num"]))
+            except (ValueError, TypeError):
+                continue
+            add_play(episode_map, "episode", key, row, row["rating_key"])
+
+        logger.info("database_watch_maps_fetched",
+                   movies=len(movie_map),
+                   episodes=len(episode_map),
+                   series=len(series_map),
+                   movie_rows=len(movie_rows),
+                   episode_rows=len(episode_rows))
+        return movie_map, episode_map, series_map
+
+    def get_watch_maps(self) -> Tuple[
+        Dict[int, Dict[str, Any]],
+        Dict[Tuple[int, int, int], Dict[str, Any]],
+        Dict[int, Dict[str, Any]],
+    ]:
+        """Construit les watch maps films/épisodes/séries selon `watch_data_source`.
+
+        "database": base SQLite de Tautulli en lecture seule, avec repli sur l'historique.
+        "library": agrégats get_library_media_info, avec repli sur l'historique en cas d'erreur.
+        "history": historique brut, récupéré une seule fois pour les trois maps.
+        """
+        if self.watch_data_source == "database":
+            try:
+                return self.get_database_watch_maps()
+            except Exception as e:
+                logger.warning("database_watch_maps_failed_fallback_history", error=str(e), exc_info=True)
+                # L'index a pu être partiellement rempli: on repart d'un index vide
+                self.user_watch_index = UserWatchIndex()
+
+        if self.watch_data_source == "library":
+            try:
+                maps = self.get_library_watch_maps()
+                self.user_watch_index = None
+                return maps
+            except Exception as e:
+                logger.warning("library_watch_maps_failed_fallback_history", error=str(e), exc_info=True)
+
+        history = self.get_history_sync()
+        return (
+            self.get_movie_watch_map(history),
+            self.get_episode_watch_map(history),
+            self.get_series_watch_map(history),
+        )
+
+    def get_movie_watch_map(self, history: Optional[List[Dict[str, Any]]] = None) -> Dict[int, Dict[str, Any]]:
         """Récupère un mapping TMDb ID → watch stats pour tous les films.
         
+        Args:
+            history: Historique déjà récupéré (évite un nouvel appel get_history)
+        
         Returns:
             Dict avec clé = tmdb_id (int), valeur = {
                 "last_watched_at": datetime,
@@ -303,10 +657,11 @@ class TautulliService:
             }
         """
         logger.info("fetching_movie_watch_map")
-        history = self.get_history_sync()
+        if history is None:
+            history = self.get_history_sync()
         logger.info("history_retrieved", count=len(history))
         
-        watch_map: Dict[int, Dict[str, Any]] = {}
+        columns: WatchHistoryColumns[int] = WatchHistoryColumns(self.user_watch_index, "movie")
         skipped_no_tmdb = 0
         # Cache pour éviter de multiples appels get_metadata pour le même rating_key
         rating_key_to_tmdb_cache: Dict[str, Optional[int]] = {}
@@ -353,58 +708,11 @@ class TautulliService:
                                guids=entry.get("guids", []))
                 continue
             
-            # Date de visionnage - gérer timestamps Unix et ISO strings
-            date_value = entry.get("date")
-            last_watched_at = None
-            if date_value:
-                try:
-                    # Si c'est un timestamp Unix (int ou float)
-                    if isinstance(date_value, (int, float)):
-                        last_watched_at = datetime.fromtimestamp(date_value)
-                    # Si c'est une chaîne ISO
-                    elif isinstance(date_value, str):
-                        # Essayer d'abord le format ISO
-                        try:
-                            last_watched_at = datetime.fromisoformat(date_value.replace("Z", "+00:00"))
-                        except ValueError:
-                            # Fallback: essayer de parser comme timestamp string
-                            try:
-                                last_watched_at = datetime.fromtimestamp(float(date_value))
-                            except (ValueError, OSError):
-                                pass
-                except (ValueError, OSError, TypeError) as e:
-                    logger.debug("date_parsing_failed", date_value=date_value, error=str(e))
-            
-            # User
-            last_user = entry.get("user", None)
-            
-            # Si on a déjà une entrée pour ce TMDb ID, garder la plus récente
-            if tmdb_id in watch_map:
-                existing_date = watch_map[tmdb_id].get("last_watched_at")
-                if existing_date and last_watched_at:
-                    if last_watched_at > existing_date:
-                        watch_map[tmdb_id] = {
-                            "last_watched_at": last_watched_at,
-                            "view_count": watch_map[tmdb_id].get("view_count", 0) + 1,
-                            "last_user": last_user,
-                            "never_watched": False
-                        }
-                    else:
-                        watch_map[tmdb_id]["view_count"] = watch_map[tmdb_id].get("view_count", 0) + 1
-                elif last_watched_at:
-                    watch_map[tmdb_id] = {
-                        "last_watched_at": last_watched_at,
-                        "view_count": watch_map[tmdb_id].get("view_count", 0) + 1,
-                        "last_user": last_user,
-                        "never_watched": False
-                    }
-            else:
-                watch_map[tmdb_id] = {
-                    "last_watched_at": last_watched_at,
-                    "view_count": 1,
-                    "last_user": last_user,
-                    "never_watched": False
-                }
+            columns.append(tmdb_id, parse_history_date(entry.get("date")), entry.get("user", None),
+                           entry.get("rating_key"))
+        
+        # Les lectures non datées ne sont comptées que si elles sont la première lecture du film
+        watch_map = columns.aggregate(count_undated=False)
         
         logger.info("movie_watch_map_fetched", 
                    count=len(watch_map), 
@@ -412,9 +720,15 @@ class TautulliService:
                    total_history=len(history))
         return watch_map
 
-    def get_episode_watch_map(self) -> Dict[Tuple[int, int, int], Dict[str, Any]]:
+    def get_episode_watch_map(
+        self,
+        history: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[Tuple[int, int, int], Dict[str, Any]]:
         """Récupère un mapping (TVDb ID, season, episode) → watch stats pour tous les épisodes.
         
+        Args:
+            history: Historique déjà récupéré (évite un nouvel appel get_history)
+        
         Returns:
             Dict avec clé = (tvdb_id, season, episode), valeur = {
                 "last_watched_at": datetime,
@@ -424,9 +738,10 @@ class TautulliService:
             }
         """
         logger.info("fetching_episode_watch_map")
-        history = self.get_history_sync()
+        if history is None:
+            history = self.get_history_sync()
         
-        watch_map: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+        columns: WatchHistoryColumns[Tuple[int, int, int]] = WatchHistoryColumns(self.user_watch_index, "episode")
         
         for entry in history:
             media_type = entry.get("media_type", "").lower()
@@ -460,64 +775,24 @@ class TautulliService:
             
             key = (tvdb_id, season_num, episode_num)
             
-            # Date de visionnage - gérer timestamps Unix et ISO strings
-            date_value = entry.get("date")
-            last_watched_at = None
-            if date_value:
-                try:
-                    if isinstance(date_value, (int, float)):
-                        last_watched_at = datetime.fromtimestamp(date_value)
-                    elif isinstance(date_value, str):
-                        try:
-                            last_watched_at = datetime.fromisoformat(date_value.replace("Z", "+00:00"))
-                        except ValueError:
-                            try:
-                                last_watched_at = datetime.fromtimestamp(float(date_value))
-                            except (ValueError, OSError):
-                                pass
-                except (ValueError, OSError, TypeError) as e:
-                    logger.debug("date_parsing_failed_episode", date_value=date_value, error=str(e))
-            
-            # User
-            last_user = entry.get("user", None)
-            
-            # Si on a déjà une entrée, garder la plus récente
-            if key in watch_map:
-                existing_date = watch_map[key].get("last_watched_at")
-                if existing_date and last_watched_at:
-                    if last_watched_at > existing_date:
-                        watch_map[key] = {
-                            "last_watched_at": last_watched_at,
-                            "view_count": watch_map[key].get("view_count", 0) + 1,
-                            "last_user": last_user,
-                            "never_watched": False
-                        }
-                    else:
-                        watch_map[key]["view_count"] = watch_map[key].get("view_count", 0) + 1
-                elif last_watched_at:
-                    watch_map[key] = {
-                        "last_watched_at": last_watched_at,
-                        "view_count": watch_map[key].get("view_count", 0) + 1,
-                        "last_user": last_user,
-                        "never_watched": False
-                    }
-            else:
-                watch_map[key] = {
-                    "last_watched_at": last_watched_at,
-                    "view_count": 1,
-                    "last_user": last_user,
-                    "never_watched": False
-                }
+            columns.append(key, parse_history_date(entry.get("date")), entry.get("user", None),
+                           entry.get("rating_key"))
+        
+        # Les lectures non datées ne sont comptées que si elles sont la première lecture de l'épisode
+        watch_map = columns.aggregate(count_undated=False)
         
         logger.info("episode_watch_map_fetched", count=len(watch_map))
         return watch_map
 
-    def get_series_watch_map(self) -> Dict[int, Dict[str, Any]]:
+    def get_series_watch_map(self, history: Optional[List[Dict[str, Any]]] = None) -> Dict[int, Dict[str, Any]]:
         """Récupère un mapping TVDb ID → watch stats pour les séries (dernier épisode vu).
         
         Cette méthode construit la map directement depuis l'historique en utilisant grandparent_guid
         pour obtenir le TVDb ID de la série, ce qui est plus fiable que de reconstruire depuis les épisodes.
         
+        Args:
+            history: Historique déjà récupéré (évite un nouvel appel get_history)
+        
         Returns:
             Dict avec clé = tvdb_id (int), valeur = {
                 "last_watched_at": datetime,
@@ -527,9 +802,10 @@ class TautulliService:
             }
         """
         logger.info("fetching_series_watch_map")
-        history = self.get_history_sync()
+        if history is None:
+            history = self.get_history_sync()
         
-        series_map: Dict[int, Dict[str, Any]] = {}
+        columns: WatchHistoryColumns[int] = WatchHistoryColumns(self.user_watch_index, "series")
         skipped_no_tvdb = 0
         
         for entry in history:
@@ -551,46 +827,11 @@ class TautulliService:
                                grandparent_guid=entry.get("grandparent_guid"))
                 continue
             
-            # Date de visionnage
-            date_value = entry.get("date")
-            last_watched_at = None
-            if date_value:
-                try:
-                    if isinstance(date_value, (int, float)):
-                        last_watched_at = datetime.fromtimestamp(date_value)
-                    elif isinstance(date_value, str):
-                        try:
-                            last_watched_at = datetime.fromisoformat(date_value.replace("Z", "+00:00"))
-                        except ValueError:
-                            try:
-                                last_watched_at = datetime.fromtimestamp(float(date_value))
-                            except (ValueError, OSError):
-                                pass
-                except (ValueError, OSError, TypeError) as e:
-                    logger.debug("date_parsing_failed_series", date_value=date_value, error=str(e))
-            
-            # User
-            last_user = entry.get("user", None)
-            
-            # Si on a déjà une entrée pour cette série, accumuler les stats
-            if tvdb_id in series_map:
-                # Accumuler le view_count (chaque épisode vu = +1)
-                series_map[tvdb_id]["view_count"] += 1
-                
-                # Garder la date la plus récente
-                if last_watched_at:
-                    existing_date = series_map[tvdb_id]["last_watched_at"]
-                    if not existing_date or last_watched_at > existing_date:
-                        series_map[tvdb_id]["last_watched_at"] = last_watched_at
-                        series_map[tvdb_id]["last_user"] = last_user
-            else:
-                # Première entrée pour cette série
-                series_map[tvdb_id] = {
-                    "last_watched_at": last_watched_at,
-                    "view_count": 1,
-                    "last_user": last_user,
-                    "never_watched": False
-                }
+            columns.append(tvdb_id, parse_history_date(entry.get("date")), entry.get("user", None),
+                           entry.get("grandparent_rating_key"))
+        
+        # Chaque épisode vu compte, daté ou non
+        series_map = columns.aggregate(count_undated=True)
         
         logger.info("series_watch_map_fetched",
                    count=len(series_map),
@@ -11,9 +11,19 @@ from tenacity import (
 import structlog
 from datetime import datetime, timedelta
 
+from app.utils.upstream_stats import record_upstream_call, record_upstream_retry
+
 logger = structlog.get_logger(__name__)
 
 
+def _record_retry(retry_state: RetryCallState):
+    """Compte un retry tenacity dans les statistiques du scan en cours."""
+    service_name = retry_state.kwargs.get("service_name")
+    if service_name is None and len(retry_state.args) > 2:
+        service_name = retry_state.args[2]
+    record_upstream_retry(service_name or "unknown")
+
+
 class CircuitBreaker:
     """Simple circuit breaker to avoid hammering down services."""
     
@@ -99,7 +109,8 @@ class RobustHTTPClient:
     @retry(
         stop=stop_after_attempt(4),  # 1 initial + 3 retries
         wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((httpx.HTTPError, httpx.TimeoutException))
+        retry=retry_if_exception_type((httpx.HTTPError, httpx.TimeoutException)),
+        before_sleep=_record_retry
     )
     async def get_async(
         self,
@@ -121,9 +132,11 @@ class RobustHTTPClient:
                 response = await client.get(url, headers=headers, params=params)
                 response.raise_for_status()
                 cb.call_succeeded()
+                record_upstream_call(service_name, len(response.content))
                 return response
         except (httpx.HTTPError, httpx.TimeoutException) as e:
             cb.call_failed()
+            record_upstream_call(service_name, failed=True)
             logger.error(
                 "http_request_failed",
                 service=service_name,
@@ -136,7 +149,8 @@ class RobustHTTPClient:
     @retry(
         stop=stop_after_attempt(4),
         wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((httpx.HTTPError, httpx.TimeoutException))
+        retry=retry_if_exception_type((httpx.HTTPError, httpx.TimeoutException)),
+        before_sleep=_record_retry
     )
     async def delete_async(
         self,
@@ -158,9 +172,11 @@ class RobustHTTPClient:
                 response = await client.delete(url, headers=headers, params=params)
                 response.raise_for_status()
                 cb.call_succeeded()
+                record_upstream_call(service_name, len(response.content))
                 return response
         except (httpx.HTTPError, httpx.TimeoutException) as e:
             cb.call_failed()
+            record_upstream_call(service_name, failed=True)
             logger.error(
                 "http_delete_failed",
                 service=service_name,
@@ -192,9 +208,12 @@ class RobustHTTPClient:
                     response = client.get(url, headers=headers, params=params)
                     response.raise_for_status()
                     cb.call_succeeded()
+                    record_upstream_call(service_name, len(response.content))
                     return response
             except (httpx.HTTPError, httpx.TimeoutException) as e:
+                record_upstream_call(service_name, failed=True)
                 if attempt < max_attempts:
+                    record_upstream_retry(service_name)
                     wait_time = min(self.retry_backoff_base ** (attempt - 1), 10)
                     logger.warning(
                         "http_retry_attempt_sync",
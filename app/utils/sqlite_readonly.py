@@ -0,0 +1,33 @@
+"""Accès en lecture seule aux bases SQLite d'autres applications (Tautulli, Radarr, Sonarr)."""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+import sqlite3
+import urllib.parse
+
+
+@contextmanager
+def connect_readonly(db_path: str, immutable: bool = False) -> Iterator[sqlite3.Connection]:
+    """Ouvre une base SQLite en lecture seule (URI `mode=ro`) et la ferme en sortie.
+
+    Args:
+        db_path: Chemin du fichier .db (typiquement un montage read-only)
+        immutable: Ignore les verrous/journal WAL (montage read-only d'une base en mode WAL
+            dont les fichiers -wal/-shm ne sont pas accessibles)
+
+    Raises:
+        FileNotFoundError: Si le fichier n'existe pas (mode=ro ne crée jamais de base)
+    """
+    path = Path(db_path)
+    if not path.is_file():
+        raise FileNotFoundError(f"SQLite database not found: {db_path}")
+
+    uri = f"file:{urllib.parse.quote(str(path.resolve()))}?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+    connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    try:
+        yield connection
+    finally:
+        connection.close()
@@ -0,0 +1,69 @@
+"""Compteurs d'appels aux services amont (Radarr, Sonarr, Tautulli, qBittorrent...) d'un scan.
+
+Le planner active un collecteur pour la durée du scan (collect_upstream_stats); les appels
+faits dans ce contexte (y compris dans les threads des étapes, asyncio.to_thread propageant
+les contextvars) y sont comptés. Hors scan (appels de l'API), rien n'est enregistré.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+
+class UpstreamStats:
+    """Appels, octets reçus, retries et échecs par service."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._services: Dict[str, Dict[str, int]] = {}
+
+    def _counters(self, service: str) -> Dict[str, int]:
+        counters = self._services.get(service)
+        if counters is None:
+            counters = self._services[service] = {"calls": 0, "bytes_received": 0, "retries": 0, "failures": 0}
+        return counters
+
+    def record_call(self, service: str, bytes_received: int = 0, failed: bool = False) -> None:
+        with self._lock:
+            counters = self._counters(service)
+            counters["calls"] += 1
+            counters["bytes_received"] += bytes_received
+            if failed:
+                counters["failures"] += 1
+
+    def record_retry(self, service: str) -> None:
+        with self._lock:
+            self._counters(service)["retries"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            services = {name: dict(counters) for name, counters in sorted(self._services.items())}
+        totals = {key: sum(counters[key] for counters in services.values())
+                  for key in ("calls", "bytes_received", "retries", "failures")}
+        return {"services": services, "totals": totals}
+
+
+_current: ContextVar[Optional[UpstreamStats]] = ContextVar("upstream_stats", default=None)
+
+
+@contextmanager
+def collect_upstream_stats(stats: Optional[UpstreamStats] = None) -> Iterator[UpstreamStats]:
+    """Active un collecteur pour les appels faits dans ce contexte."""
+    stats = stats or UpstreamStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def record_upstream_call(service: str, bytes_received: int = 0, failed: bool = False) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.record_call(service, bytes_received, failed)
+
+
+def record_upstream_retry(service: str) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.record_retry(service)